@@ -5,9 +5,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import numpy as np
 import math
 import matplotlib.image as mpimg
-from utils.functional_extended import add_properties_to_nodes, add_properties_to_edges, print_nodes, print_edges, print_distance_matrix, print_travel_matrix, print_cars_spawned_each_minute, print_cars, change_capacity, switch_x_y, iterate_A_star, change_population
-from utils.simulate_extended import simulate_A_star, determine_optimal_route, simulate_A_mod
+from utils.functional_extended import add_properties_to_nodes, add_properties_to_edges, print_nodes, print_edges, print_distance_matrix, print_travel_matrix, print_cars_spawned_each_minute, print_cars, change_capacity, switch_x_y, change_population, determine_optimal_route
+from utils.simulate_extended import simulate_A_star, simulate_A_mod
 from utils.modified_A_star import run_A_mod, update_future_edges
+from utils.car_store import create_spawn_index
 from real_data.parse_edges import parse_highway_data
 
 # Parameters for BPR function
@@ -215,6 +216,9 @@ for minute in range(num_minutes):
             cars.append(car)
             car_id += 1
 
+# Bucket the cars by the minute they spawn, so the simulation only visits the cars spawning in each minute
+spawn_index = create_spawn_index(cars, num_minutes)
+
 # Reloading the image and setting up dimensions
 bg_image = mpimg.imread('./Images/netherlands/blank_netherlands_adjusted.png')
 
@@ -223,5 +227,5 @@ bg_image = mpimg.imread('./Images/netherlands/blank_netherlands_adjusted.png')
 lat_min, lat_max = 50.75, 53.55  # Approx latitude range of the Netherlands
 lon_min, lon_max = 3.36, 7.22    # Approx longitude range of the Netherlands
 
-# Simulate the A* algorithm
-cars_A_star, edges_A_star = simulate_A_star(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, bg_image=bg_image, lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max)
\ No newline at end of file
+# Simulate the A* algorithm; the results are also saved as a CSV file, which plot_in_histograms (see utils/plotting_extended.py) reads
+cars_A_star, edges_A_star = simulate_A_star(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, bg_image=bg_image, lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max, spawn_index=spawn_index, results_filename="A_star_simulation_results.csv", results_path="A_star_simulation_results")
\ No newline at end of file
@@ -4,9 +4,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import numpy as np
 import math
-from utils.functional_extended import add_properties_to_nodes, add_properties_to_edges, print_nodes, print_edges, print_distance_matrix, print_travel_matrix, print_cars_spawned_each_minute, print_cars, change_capacity, iterate_A_star
-from utils.simulate_extended import simulate_A_star, determine_optimal_route, simulate_A_mod
+from utils.functional_extended import add_properties_to_nodes, add_properties_to_edges, print_nodes, print_edges, print_distance_matrix, print_travel_matrix, print_cars_spawned_each_minute, print_cars, change_capacity, determine_optimal_route
+from utils.simulate_extended import simulate_A_star, simulate_A_mod
 from utils.modified_A_star import run_A_mod, update_future_edges
+from utils.car_store import create_spawn_index
 from real_data.parse_edges import parse_highway_data
 
 # Parameters for BPR function
@@ -123,8 +124,11 @@ for minute in range(num_minutes):
             cars.append(car)
             car_id += 1
 
-# Simulate the A* algorithm
-cars_A_star, edges_A_star = simulate_A_star(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant)
+# Bucket the cars by the minute they spawn, so the simulation only visits the cars spawning in each minute
+spawn_index = create_spawn_index(cars, num_minutes)
+
+# Simulate the A* algorithm; the results are also saved as a CSV file, which plot_in_histograms (see utils/plotting_extended.py) reads
+cars_A_star, edges_A_star = simulate_A_star(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, spawn_index=spawn_index, results_filename="A_star_simulation_results.csv", results_path="A_star_simulation_results")
 
 # Test the modified A* algorithm
 # test_car = {
@@ -144,4 +148,4 @@ cars_A_star, edges_A_star = simulate_A_star(nodes, edges, cars, alpha, beta, sig
 # }
 
 # Simulate the modified A* algorithm
-# cars_A_mod, edges_A_mod, future_edges_A_mod = simulate_A_mod(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant)
+# cars_A_mod, edges_A_mod, future_edges_A_mod = simulate_A_mod(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, spawn_index=spawn_index, results_filename="A_star_mod_simulation_results.csv", results_path="A_star_mod_simulation_results")
@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import numpy as np
+import pytest
+from utils.functional_extended import add_properties_to_nodes, add_properties_to_edges
+from utils.graph import compile_graph, nodes_of_edges
+
+# Length of the simulations of the tests, in minutes
+NUM_MINUTES = 200
+
+# A small road network like the one of models/extended_model.py: two routes from City 1 to City 2 (through A or B) that meet at C
+@pytest.fixture
+def network():
+    nodes = {
+        "City 1": {"coordinates": (0, 0), "population": 1000},
+        "A": {"coordinates": (2, 2), "population": None},
+        "B": {"coordinates": (2, -2), "population": None},
+        "C": {"coordinates": (4, 0), "population": None},
+        "City 2": {"coordinates": (8, 0), "population": 1000}
+    }
+    edges = {
+        "City 1 → A": {"length": 30000, "speed_limit": 100, "lanes": 2},
+        "City 1 → B": {"length": 35000, "speed_limit": 100, "lanes": 2},
+        "A → C": {"length": 40000, "speed_limit": 100, "lanes": 2},
+        "B → C": {"length": 40000, "speed_limit": 100, "lanes": 2},
+        "C → City 2": {"length": 60000, "speed_limit": 100, "lanes": 1},
+        "City 2 → City 1": {"length": 100000, "speed_limit": 100, "lanes": 2}
+    }
+    distance_matrix = {}
+    for node_A, properties_A in nodes.items():
+        for node_B, properties_B in nodes.items():
+            distance_matrix[node_A + " → " + node_B] = math.dist(properties_A["coordinates"], properties_B["coordinates"])
+
+    add_properties_to_nodes(nodes, edges)
+    add_properties_to_edges(edges, 4.5, 55, NUM_MINUTES)
+    return nodes, edges, distance_matrix
+
+# The compiled graph of the network
+@pytest.fixture
+def graph(network):
+    nodes, edges, _ = network
+    return compile_graph(nodes, edges)
+
+# Cars like those of the model scripts: for the first 30 minutes, 40 cars a minute from City 1 to City 2 (more than the routes through A and B
+# can take at free flow) and 5 cars a minute back
+@pytest.fixture
+def cars():
+    cars = []
+    for minute in range(30):
+        for origin, destination, num_cars in (("City 1", "City 2", 40), ("City 2", "City 1", 5)):
+            for _ in range(num_cars):
+                cars.append({"id": len(cars), "origin": origin, "destination": destination, "optimal path": None, "optimal travel time": None, "trajectory": None, "time spawned": minute,
+                             "time arrived": None, "active": False, "location": None, "time entered last edge": None, "finished edge": False, "next edge": None})
+    return cars
+
+# A random road network of num_nodes nodes with edges between random pairs of nodes, each with a random tt_0
+def random_graph(num_nodes=30, num_edges=120, seed=0):
+    generator = np.random.default_rng(seed)
+    edges = {}
+    while len(edges) < num_edges:
+        a, b = generator.choice(num_nodes, 2, replace=False)
+        edges[f"N{a} → N{b}"] = {"length": 1000, "lanes": 1, "tt_0": float(generator.uniform(1, 10)), "capacity": 10}
+    return compile_graph(nodes_of_edges(edges), edges)
+
+# The lowest travel time from the origin to every node, by relaxing all edges until nothing changes (Bellman-Ford)
+def lowest_travel_times(graph, origin, edge_costs):
+    travel_times = [math.inf] * len(graph["adjacency"])
+    travel_times[origin] = 0
+    for _ in range(len(travel_times)):
+        for node, adjacent in enumerate(graph["adjacency"]):
+            for neighbor, edge in adjacent:
+                travel_times[neighbor] = min(travel_times[neighbor], travel_times[node] + edge_costs[edge])
+    return travel_times
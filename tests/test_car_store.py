@@ -0,0 +1,12 @@
+import numpy as np
+from utils.car_store import create_spawn_index, cars_spawning
+
+# The spawn index gives the cars of each minute in order of their id, also for minutes without cars
+def test_spawn_index_buckets_cars_by_minute():
+    time_spawned = [3, 0, 3, 1, 0, 5]
+    cars = [{"time spawned": minute} for minute in time_spawned]
+    spawn_index = create_spawn_index(cars, 6)
+
+    for minute in range(6):
+        assert cars_spawning(spawn_index, minute).tolist() == [car for car, spawned in enumerate(time_spawned) if spawned == minute]
+    assert len(np.concatenate([cars_spawning(spawn_index, minute) for minute in range(6)])) == len(cars)
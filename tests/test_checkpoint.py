@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from conftest import NUM_MINUTES
+from utils.checkpoint import flatten_arrays, unflatten_arrays
+from utils.simulate_extended import simulate_A_star, simulate_A_mod
+from utils.rng import create_rng
+
+# Arrays of different lengths (or None) are stored one after another and come back the same
+def test_flatten_arrays_round_trip():
+    arrays = [[1, 2, 3], None, [], [4]]
+    values, offsets, present = flatten_arrays(arrays, int)
+    assert [None if array is None else array.tolist() for array in unflatten_arrays(values, offsets, present)] == arrays
+
+# Checks that two runs gave the same results: the cars and the time series of the edges (nan, e.g. the optimal travel time of the modified A* algorithm, equals nan)
+def check_same_results(cars, edges, other_cars, other_edges):
+    for key in ("time arrived", "location", "optimal travel time"):
+        np.testing.assert_array_equal(cars.car_store[key], other_cars.car_store[key])
+    for edge, properties in edges.items():
+        np.testing.assert_array_equal(properties["cars on edge"], other_edges[edge]["cars on edge"])
+        np.testing.assert_array_equal(properties["travel time"], other_edges[edge]["travel time"])
+
+# A run continued from a checkpoint gives the same results as a run without interruption
+def test_simulate_A_star_resumes(network, cars, tmp_path):
+    nodes, edges, distance_matrix = network
+    def run(num_minutes, **kwargs):
+        return simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, num_minutes, distance_matrix, 1, rng=create_rng(11), animate=False, **kwargs)
+
+    path = str(tmp_path / "checkpoint.npz")
+    run(80, checkpoint_every=40, checkpoint_path=path)
+    check_same_results(*run(NUM_MINUTES), *run(NUM_MINUTES, resume_from=path))
+
+# The same for the modified A* algorithm, with the predictions in the edge store or in the reservation table
+@pytest.mark.parametrize("future_backend", ["edge store", "reservation table"])
+def test_simulate_A_mod_resumes(network, cars, tmp_path, future_backend):
+    nodes, edges, distance_matrix = network
+    def run(num_minutes, **kwargs):
+        new_cars, new_edges, _ = simulate_A_mod(nodes, edges, cars, 0.15, 4, 0.1, num_minutes, distance_matrix, 1, rng=create_rng(12), future_backend=future_backend, **kwargs)
+        return new_cars, new_edges
+
+    path = str(tmp_path / "checkpoint.npz")
+    run(80, checkpoint_every=40, checkpoint_path=path)
+    uninterrupted, resumed = run(NUM_MINUTES), run(NUM_MINUTES, resume_from=path)
+    check_same_results(*uninterrupted, *resumed)
+    assert [car["trajectory"] for car in uninterrupted[0]] == [car["trajectory"] for car in resumed[0]]
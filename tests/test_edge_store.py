@@ -0,0 +1,34 @@
+import numpy as np
+from conftest import NUM_MINUTES
+from utils.edge_store import create_edge_store, attach_edge_store, edge_store_of, copy_edges
+
+# The time series of the edges are views of the rows of the edge store: writing a minute of an edge writes the array
+def test_time_series_are_rows_of_the_edge_store(network):
+    _, edges, _ = network
+    edge_store = edge_store_of(edges)
+    assert edge_store["cars on edge"].shape == edge_store["travel time"].shape == (len(edges), NUM_MINUTES + 100000)
+    assert (edge_store["travel time"][:, 0] == [properties["tt_0"] for properties in edges.values()]).all()
+
+    edges["A → C"]["cars on edge"][7] += 3
+    assert edge_store["cars on edge"][list(edges).index("A → C"), 7] == 3
+
+# Copies of the edges get their own arrays; time series that are lists are converted to an edge store while copying
+def test_copy_edges(network):
+    _, edges, _ = network
+    new_edges = copy_edges(edges)
+    new_edges["A → C"]["cars on edge"][7] = 5
+    assert edges["A → C"]["cars on edge"][7] == 0
+    assert edge_store_of(new_edges)["cars on edge"] is not edge_store_of(edges)["cars on edge"]
+
+    list_edges = {edge: dict(properties, **{"cars on edge": [0, 1, 2], "travel time": [1.0, 2.0, 3.0]}) for edge, properties in edges.items()}
+    assert edge_store_of(list_edges) is None
+    assert edge_store_of(copy_edges(list_edges))["cars on edge"].tolist() == [[0, 1, 2]] * len(edges)
+
+# The edge store can be attached to edges in order of the edges dictionary
+def test_attach_edge_store():
+    edges = {"A → B": {}, "B → C": {}}
+    edge_store = create_edge_store([1.0, 2.0], 4, count_dtype=np.int16, travel_time_dtype=np.float32)
+    attach_edge_store(edges, edge_store)
+    assert edges["B → C"]["travel time"].tolist() == [2.0] * 4
+    assert edges["B → C"]["cars on edge"].dtype == np.int16
+    assert edge_store_of(edges)["travel time"] is edge_store["travel time"]
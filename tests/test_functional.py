@@ -0,0 +1,37 @@
+import numpy as np
+from conftest import NUM_MINUTES
+from utils.functional import travel_time_bpr, travel_time_bpr_vectorized, bpr_noise
+from utils.simulate_extended import simulate_A_star
+
+# Without noise, the vectorized BPR function gives the travel times of travel_time_bpr (up to rounding) for all edges at once
+def test_bpr_vectorized_matches_scalar():
+    generator = np.random.default_rng(0)
+    tt_0 = generator.uniform(1, 30, 1000)
+    N_e = generator.integers(0, 200, 1000)
+    C_e = generator.integers(0, 100, 1000)
+
+    travel_time = travel_time_bpr_vectorized(tt_0, N_e, C_e, 0.15, 4, np.zeros(1000))
+
+    expected = [travel_time_bpr(tt_0[edge], N_e[edge], C_e[edge], 0.15, 4, 0) for edge in range(1000)]
+    np.testing.assert_allclose(travel_time, expected, rtol=1e-12)
+
+# Edges without capacity get an infinite travel time and negative travel times are set to 0
+def test_bpr_vectorized_without_capacity_and_negative_noise():
+    travel_time = travel_time_bpr_vectorized([2.0, 2.0], [5, 0], [0, 10], 0.15, 4, [0.0, -5.0])
+    assert travel_time[0] == np.inf
+    assert travel_time[1] == 0
+
+# Edges without capacity get no noise, and the noise has one column per minute
+def test_bpr_noise_shape():
+    noise = bpr_noise(np.array([0, 3, 5]), 0.5, num_minutes=4)
+    assert noise.shape == (3, 4)
+    assert not noise[0].any()
+
+# Each minute the simulation stores the BPR travel time of every edge for the number of cars on it (without noise, those of travel_time_bpr)
+def test_simulation_stores_bpr_travel_times(network, cars):
+    nodes, edges, distance_matrix = network
+    _, new_edges = simulate_A_star(nodes, edges, cars, 0.15, 4, 0, NUM_MINUTES, distance_matrix, 1, animate=False)
+    for properties in new_edges.values():
+        expected = [travel_time_bpr(properties["tt_0"], cars_on_edge, properties["capacity"], 0.15, 4, 0) for cars_on_edge in properties["cars on edge"][:NUM_MINUTES]]
+        np.testing.assert_allclose(properties["travel time"][:NUM_MINUTES], expected, rtol=1e-12)
+    assert max(properties["cars on edge"][:NUM_MINUTES].max() for properties in new_edges.values()) > 0
@@ -0,0 +1,78 @@
+import math
+import numpy as np
+from conftest import random_graph, lowest_travel_times
+from utils.functional_extended import a_star_edge_costs, find_optimal_route, determine_optimal_route, shortest_path_tree, route_from_tree
+
+# The travel time of a path of node ids
+def path_travel_time(graph, path, edge_costs):
+    return sum(edge_costs[graph["edge lookup"][(a, b)]] for a, b in zip(path, path[1:]))
+
+# Without a heuristic, A* finds the lowest travel time between every pair of nodes, and None for pairs that are not connected
+def test_find_optimal_route_is_optimal():
+    graph = random_graph()
+    edge_costs = graph["tt_0"].tolist()
+    num_nodes = len(graph["adjacency"])
+    for origin in range(num_nodes):
+        expected = lowest_travel_times(graph, origin, edge_costs)
+        for destination in range(num_nodes):
+            path, travel_time = find_optimal_route(graph, origin, destination, edge_costs, [0] * num_nodes)
+            if math.isinf(expected[destination]):
+                assert path is None and travel_time is None
+                continue
+            assert path[0] == origin and path[-1] == destination
+            assert travel_time == path_travel_time(graph, path, edge_costs)
+            assert math.isclose(travel_time, expected[destination])
+
+# determine_optimal_route works on the dictionaries of the model scripts and avoids an edge that is full
+def test_determine_optimal_route_avoids_full_edges(network):
+    nodes, edges, distance_matrix = network
+    car = {"origin": "City 1", "destination": "C"}
+    path, travel_time = determine_optimal_route(car, nodes, edges, 0, 0, distance_matrix)
+    assert path == ["City 1", "A", "C"]
+    assert math.isclose(travel_time, 18 + 24)
+
+    edges["City 1 → A"]["cars on edge"][0] = edges["City 1 → A"]["capacity"]
+    path, travel_time = determine_optimal_route(car, nodes, edges, 0, 0, distance_matrix)
+    assert path == ["City 1", "B", "C"]
+    assert math.isclose(travel_time, 21 + 24)
+
+# The shortest path tree towards a destination gives the lowest travel time from every node, and the routes that follow from it are as fast as those of A*
+def test_shortest_path_tree_matches_A_star():
+    graph = random_graph(seed=1)
+    edge_costs = graph["tt_0"].tolist()
+    num_nodes = len(graph["adjacency"])
+    expected_travel_times = np.array([lowest_travel_times(graph, origin, edge_costs) for origin in range(num_nodes)])
+    for destination in range(num_nodes):
+        travel_time_to_destination, successor = shortest_path_tree(graph, destination, edge_costs)
+        np.testing.assert_allclose(travel_time_to_destination, expected_travel_times[:, destination])
+        for origin in range(num_nodes):
+            path, travel_time = route_from_tree(graph, successor, origin, destination, edge_costs)
+            expected_path, expected_travel_time = find_optimal_route(graph, origin, destination, edge_costs, [0] * num_nodes)
+            if expected_path is None:
+                assert path is None
+            else:
+                assert path[0] == origin and path[-1] == destination
+                assert math.isclose(travel_time, expected_travel_time)
+
+# With edge costs that change from one routing call to the next (congestion and full edges), the routes of the shortest path trees stay as fast as those of A*
+def test_shortest_path_tree_with_changing_edge_costs():
+    graph = random_graph(seed=2)
+    num_nodes = len(graph["adjacency"])
+    generator = np.random.default_rng(3)
+    previous_paths = None
+    for _ in range(5):
+        cars_on_edge = generator.integers(0, 12, len(graph["edge names"]))
+        edge_costs = a_star_edge_costs(graph, cars_on_edge, graph["tt_0"] * generator.uniform(1, 3, len(graph["edge names"]))).tolist()
+        paths = []
+        for destination in range(0, num_nodes, 3):
+            successor = shortest_path_tree(graph, destination, edge_costs)[1]
+            for origin in range(num_nodes):
+                path, travel_time = route_from_tree(graph, successor, origin, destination, edge_costs)
+                expected_path, expected_travel_time = find_optimal_route(graph, origin, destination, edge_costs, [0] * num_nodes)
+                assert (path is None) == (expected_path is None)
+                if path is not None:
+                    assert math.isclose(travel_time, expected_travel_time)
+                    assert math.isclose(travel_time, path_travel_time(graph, path, edge_costs))
+                paths.append(path)
+        assert paths != previous_paths # the edge costs change the routes
+        previous_paths = paths
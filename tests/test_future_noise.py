@@ -0,0 +1,35 @@
+from conftest import NUM_MINUTES
+from utils.future_noise import create_future_noise, noise_at, noise_slice, discard_noise
+from utils.simulate_extended import simulate_A_mod
+from utils.rng import create_rng
+
+# A slice of the noise across blocks is the noise of each of its minutes, and with rng the noise does not depend on the order the blocks are drawn in
+def test_noise_slice_matches_noise_at():
+    noise = create_future_noise(0.5, create_rng(7), block_size=8)
+    values = noise_slice(noise, 2, 5, 30)
+    assert len(values) == 25
+    assert (values == [noise_at(noise, 2, minute) for minute in range(5, 30)]).all()
+
+    reversed_order = create_future_noise(0.5, create_rng(7), block_size=8)
+    noise_at(reversed_order, 2, 29)
+    assert (noise_slice(reversed_order, 2, 5, 30) == values).all()
+    assert not (noise_slice(noise, 3, 5, 30) == values).any()
+
+# The blocks of minutes that have passed are discarded; the other blocks keep their noise
+def test_discard_noise():
+    noise = create_future_noise(0.5, create_rng(7), block_size=8)
+    before = noise_slice(noise, 0, 0, 24)
+    discard_noise(noise, 17)
+    assert sorted(noise["noise"]) == [(0, 2)]
+    assert (noise_slice(noise, 0, 16, 24) == before[16:]).all()
+
+# With fixed noise and speculation_tolerance=0, planning with a pool of worker processes gives the same results as planning the cars one by one
+def test_fixed_noise_with_workers_matches_serial(network, cars):
+    nodes, edges, distance_matrix = network
+    def run(**kwargs):
+        return simulate_A_mod(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, rng=create_rng(8), future_noise="fixed", **kwargs)
+
+    (serial, serial_edges, _), (parallel, parallel_edges, _) = run(), run(num_workers=2, speculation_tolerance=0)
+    assert (serial.car_store["time arrived"] == parallel.car_store["time arrived"]).all()
+    assert [car["trajectory"] for car in serial] == [car["trajectory"] for car in parallel]
+    assert all((serial_edges[edge]["cars on edge"] == parallel_edges[edge]["cars on edge"]).all() for edge in edges)
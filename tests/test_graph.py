@@ -0,0 +1,37 @@
+import numpy as np
+from utils.graph import compile_graph, compile_distance_matrix, route_from_path, route_from_node_ids, node_names_of, nodes_of_edges
+
+# The CSR arrays give the outgoing and incoming edges of each node, in the order of the edges dictionary
+def test_csr_adjacency_matches_edges(network, graph):
+    nodes, edges, _ = network
+    node_ids = graph["node ids"]
+    for node in nodes:
+        n = node_ids[node]
+        out_edges = graph["out edges"][graph["indptr"][n]:graph["indptr"][n + 1]].tolist()
+        in_edges = graph["in edges"][graph["in indptr"][n]:graph["in indptr"][n + 1]].tolist()
+        assert [graph["edge names"][edge] for edge in out_edges] == [edge for edge in edges if edge.split(" → ")[0] == node]
+        assert [graph["edge names"][edge] for edge in in_edges] == [edge for edge in edges if edge.split(" → ")[1] == node]
+        assert graph["adjacency"][n] == [(node_ids[graph["edge names"][edge].split(" → ")[1]], edge) for edge in out_edges]
+        assert [node_ids[neighbor] for neighbor in nodes[node]["neighboring nodes"]] == graph["neighbors"][graph["indptr"][n]:graph["indptr"][n + 1]].tolist()
+
+    for edge, properties in edges.items():
+        e = graph["edge ids"][edge]
+        assert graph["edge lookup"][tuple(node_ids[node] for node in edge.split(" → "))] == e
+        assert graph["tt_0"][e] == properties["tt_0"] and graph["capacity"][e] == properties["capacity"]
+
+# Paths of node names or ids convert to routes of edge ids and back
+def test_routes_and_paths(graph):
+    path = ["City 1", "B", "C", "City 2"]
+    route = route_from_path(graph, path)
+    assert [graph["edge names"][edge] for edge in route] == ["City 1 → B", "B → C", "C → City 2"]
+    assert route_from_node_ids(graph, [graph["node ids"][node] for node in path]).tolist() == route.tolist()
+    assert node_names_of(graph, [graph["node ids"][node] for node in path]) == path
+
+# Nodes that only appear in the edges get ids in the order they first appear, and the distance matrix becomes an array by node id
+def test_nodes_of_edges_and_distance_matrix(network):
+    _, edges, distance_matrix = network
+    graph = compile_graph(nodes_of_edges(edges), edges)
+    assert graph["node names"] == ["City 1", "A", "B", "C", "City 2"]
+    distances = compile_distance_matrix(graph, distance_matrix)
+    assert distances[graph["node ids"]["City 1"], graph["node ids"]["C"]] == distance_matrix["City 1 → C"]
+    assert np.allclose(distances, distances.T)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from utils.horizon import create_horizon, advance_horizon, attach_horizon, check_horizon_length
+from utils.edge_store import copy_edge_properties
+
+# The rows of the window are read and written by minute like the rows of the edge store, also when the window wraps around the end of its arrays
+def test_window_rows_wrap_around(network, graph):
+    _, edges, _ = network
+    future_edges = copy_edge_properties(edges)
+    horizon = create_horizon(graph["tt_0"], 10)
+    attach_horizon(future_edges, horizon)
+    row = future_edges["City 1 → A"]["cars on edge"]
+
+    row[2:8] = 1
+    advance_horizon(horizon, 6)
+    assert row[6:8].tolist() == [1, 1]
+    assert row[8:16].tolist() == [0] * 8 # the slots of the minutes that passed were reset
+
+    row[14:16] += 3
+    row[9] = 5
+    assert row[6:16].tolist() == [1, 1, 0, 5, 0, 0, 0, 0, 3, 3]
+    assert future_edges["City 1 → A"]["travel time"][15] == graph["tt_0"][0]
+
+# Reading and writing outside the window raise the same IndexError
+def test_outside_the_window_raises(network, graph):
+    _, edges, _ = network
+    future_edges = copy_edge_properties(edges)
+    horizon = create_horizon(graph["tt_0"], 10)
+    attach_horizon(future_edges, horizon)
+    advance_horizon(horizon, 5)
+    row = future_edges["City 1 → A"]["travel time"]
+
+    for minute in (4, 15):
+        with pytest.raises(IndexError, match="outside the future horizon"):
+            row[minute]
+        with pytest.raises(IndexError, match="outside the future horizon"):
+            row[minute] = 1.0
+    with pytest.raises(IndexError, match="outside the future horizon"):
+        row[12:16]
+
+# The window has to be longer than the longest trip of the cars at free flow
+def test_check_horizon_length(graph):
+    origin, destination = np.array([graph["node ids"]["City 1"]]), np.array([graph["node ids"]["City 2"]])
+    longest_trip = 18 + 24 + 36 # City 1 → A → C → City 2 at free flow
+    with pytest.raises(ValueError):
+        check_horizon_length(graph, origin, destination, longest_trip)
+    check_horizon_length(graph, origin, destination, longest_trip + 1)
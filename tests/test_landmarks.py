@@ -0,0 +1,33 @@
+import math
+import numpy as np
+from conftest import random_graph, lowest_travel_times
+from utils.landmarks import compute_landmarks, landmark_heuristic, free_flow_travel_times
+from utils.functional_extended import find_optimal_route
+
+# The free-flow travel times from a node (and to it, over the incoming edges) are the lowest travel times at tt_0
+def test_free_flow_travel_times():
+    graph = random_graph(seed=2)
+    edge_costs = graph["tt_0"].tolist()
+    expected = np.array([lowest_travel_times(graph, origin, edge_costs) for origin in range(len(graph["adjacency"]))])
+    np.testing.assert_allclose(free_flow_travel_times(graph, 3), expected[3])
+    np.testing.assert_allclose(free_flow_travel_times(graph, 3, reverse=True), expected[:, 3])
+
+# The landmark heuristic never overestimates the free-flow travel time to the destination, so A* with it still finds the fastest routes
+def test_landmark_heuristic_is_admissible():
+    graph = random_graph(seed=2)
+    edge_costs = graph["tt_0"].tolist()
+    num_nodes = len(graph["adjacency"])
+    landmarks = compute_landmarks(graph, num_landmarks=4)
+    assert len(set(landmarks["landmarks"])) == 4
+
+    for destination in range(num_nodes):
+        heuristic = landmark_heuristic(landmarks, destination)
+        to_destination = free_flow_travel_times(graph, destination, reverse=True)
+        assert heuristic[destination] == 0
+        assert all(h <= t + 1e-9 for h, t in zip(heuristic, to_destination))
+        for origin in range(num_nodes):
+            expected_path, expected_travel_time = find_optimal_route(graph, origin, destination, edge_costs, [0] * num_nodes)
+            path, travel_time = find_optimal_route(graph, origin, destination, edge_costs, heuristic)
+            assert (path is None) == (expected_path is None)
+            if path is not None:
+                assert math.isclose(travel_time, expected_travel_time)
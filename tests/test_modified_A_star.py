@@ -0,0 +1,73 @@
+import math
+import numpy as np
+import pytest
+from utils.functional_extended import add_properties_to_edges
+from utils.graph import compile_graph, nodes_of_edges
+from utils.modified_A_star import find_optimal_trajectory, retime_trajectory, trajectory_moved, run_A_mod, book_trajectory
+
+# The travel times of the future edges as rows indexed by edge id
+def travel_times(graph, edges):
+    return [edges[edge]["travel time"] for edge in graph["edge names"]]
+
+# On an empty network the trajectory follows the fastest route at free flow, passing each node at the sum of the tt_0 of the edges before it
+def test_trajectory_at_free_flow(network, graph):
+    _, edges, _ = network
+    ids = graph["node ids"]
+    trajectory = find_optimal_trajectory(graph, ids["City 1"], ids["City 2"], 5, travel_times(graph, edges), [0] * len(ids))
+    assert [node for node, _ in trajectory] == [ids["City 1"], ids["A"], ids["C"], ids["City 2"]]
+    assert np.allclose([time for _, time in trajectory], [5, 5 + 18, 5 + 18 + 24, 5 + 18 + 24 + 36])
+
+# The travel time of an edge is the one at the minute the car enters it: congestion on A → C when the car would get there moves the car to B,
+# while congestion at another minute does not
+def test_trajectory_depends_on_the_time_an_edge_is_entered(network, graph):
+    nodes, edges, distance_matrix = network
+    car = {"origin": "City 1", "destination": "City 2", "time spawned": 0}
+
+    edges["A → C"]["travel time"][30] = 100
+    assert [node for node, _ in run_A_mod(nodes, edges, car, 0, distance_matrix, 200)] == ["City 1", "A", "C", "City 2"]
+
+    edges["A → C"]["travel time"][18] = 100
+    trajectory = run_A_mod(nodes, edges, car, 0, distance_matrix, 200)
+    assert [node for node, _ in trajectory] == ["City 1", "B", "C", "City 2"]
+    assert math.isclose(trajectory[-1][1], 21 + 24 + 36)
+
+# Planning or booking a trajectory beyond the minutes of the predicted travel times raises an IndexError, and no edge is booked for only part of its minutes
+def test_beyond_the_horizon_raises():
+    edges = {"A → B": {"length": 10000, "speed_limit": 60, "lanes": 1}, "B → C": {"length": 10000, "speed_limit": 60, "lanes": 1}}
+    add_properties_to_edges(edges, 4.5, 55, 5, horizon=25)
+    graph = compile_graph(nodes_of_edges(edges), edges)
+    cars_on_edge = [edges[edge]["cars on edge"] for edge in graph["edge names"]]
+    travel_time = travel_times(graph, edges)
+
+    with pytest.raises(IndexError, match="beyond the minutes covered"):
+        find_optimal_trajectory(graph, 0, 2, 20, travel_time, [0, 0, 0])
+
+    trajectory = find_optimal_trajectory(graph, 0, 2, 14, travel_time, [0, 0, 0]) # the car reaches C at minute 34, beyond the horizon
+    with pytest.raises(IndexError, match="beyond the minutes covered"):
+        book_trajectory(graph, cars_on_edge, travel_time, trajectory, 0.15, 4, 0.1)
+    assert cars_on_edge[1].sum() == 0
+
+# A speculatively planned trajectory has moved when the travel time of any of its edges has changed by more than the tolerance,
+# also when a later edge makes up the time or when the car would arrive earlier
+def test_trajectory_moved(network, graph):
+    _, edges, _ = network
+    ids, edge_ids = graph["node ids"], graph["edge ids"]
+    trajectory = find_optimal_trajectory(graph, ids["City 1"], ids["City 2"], 0, travel_times(graph, edges), [0] * len(ids))
+    assert retime_trajectory(graph, travel_times(graph, edges), trajectory) == trajectory
+    assert not trajectory_moved(trajectory, trajectory, 0)
+
+    # The car enters A → C at minute 18; 3 minutes slower there, it enters C → City 2 at minute 45, where it is 3 minutes faster
+    travel_time = [row.copy() for row in travel_times(graph, edges)]
+    travel_time[edge_ids["A → C"]][18] += 3
+    travel_time[edge_ids["C → City 2"]][45] -= 3
+    retimed = retime_trajectory(graph, travel_time, trajectory)
+    assert retimed[-1][1] == trajectory[-1][1]
+    assert trajectory_moved(trajectory, retimed, 0.5)
+    assert not trajectory_moved(trajectory, retimed, 3)
+
+    # 4 minutes faster on A → C, the car arrives 4 minutes earlier
+    travel_time = [row.copy() for row in travel_times(graph, edges)]
+    travel_time[edge_ids["A → C"]][18] -= 4
+    retimed = retime_trajectory(graph, travel_time, trajectory)
+    assert retimed[-1][1] == trajectory[-1][1] - 4
+    assert trajectory_moved(trajectory, retimed, 0.5)
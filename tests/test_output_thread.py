@@ -0,0 +1,48 @@
+import threading
+import time
+import pytest
+from utils.output_thread import create_output_thread, submit, close_output_thread
+
+# The tasks are called in the order they were handed off, in the output thread; without an output thread they are called right away
+def test_tasks_run_in_order():
+    calls = []
+    def record(value):
+        calls.append((value, threading.current_thread().name))
+
+    output = create_output_thread(max_size=2)
+    for value in range(20):
+        submit(output, record, value)
+    close_output_thread(output)
+    assert calls == [(value, "simulation output") for value in range(20)]
+
+    submit(None, record, 20)
+    assert calls[-1] == (20, threading.current_thread().name)
+
+# An error in the output thread is raised when the thread is closed, and the tasks after it are skipped
+def test_error_is_raised_on_close():
+    calls = []
+    def fail():
+        raise OSError("disk full")
+
+    output = create_output_thread()
+    submit(output, fail)
+    submit(output, calls.append, 1)
+    with pytest.raises(OSError, match="disk full"):
+        close_output_thread(output)
+    assert calls == []
+
+# An error in the output thread is raised the next time a task is handed off
+def test_error_is_raised_on_submit():
+    def fail():
+        raise OSError("disk full")
+
+    output = create_output_thread()
+    submit(output, fail)
+    for _ in range(500): # wait until the output thread has called fail
+        if output["error"] is not None:
+            break
+        time.sleep(0.01)
+    with pytest.raises(OSError, match="disk full"):
+        submit(output, print, "never")
+    with pytest.raises(OSError):
+        close_output_thread(output)
@@ -0,0 +1,45 @@
+import numpy as np
+from conftest import NUM_MINUTES, random_graph
+from utils.parallel_routing import create_routing_pool, route_in_pool, close_routing_pool
+from utils.functional_extended import find_optimal_route
+from utils.simulate_extended import simulate_A_star
+from utils.rng import create_rng
+
+# The pool finds the same routes as routing the pairs one by one, with both routing backends, also when the edge costs change between calls
+def test_route_in_pool_matches_serial_routing():
+    graph = random_graph()
+    num_nodes = len(graph["node names"])
+    generator = np.random.default_rng(1)
+    heuristics = np.zeros((num_nodes, num_nodes)) # no heuristic, so A* finds the routes with the lowest travel time
+    od_pairs = [(origin, destination) for origin in range(0, num_nodes, 3) for destination in range(1, num_nodes, 4) if origin != destination]
+
+    for routing in ("A*", "shortest path tree"):
+        routing_pool = create_routing_pool(graph, heuristics, 2, routing)
+        try:
+            previous_routes = None
+            for _ in range(3):
+                edge_costs = generator.uniform(1, 10, len(graph["edge names"]))
+                routes = route_in_pool(routing_pool, edge_costs, od_pairs)
+
+                assert set(routes) == set(od_pairs)
+                for origin, destination in od_pairs:
+                    path, travel_time = find_optimal_route(graph, origin, destination, edge_costs.tolist(), heuristics[destination].tolist())
+                    assert routes[(origin, destination)][0] == path
+                    assert np.isclose(routes[(origin, destination)][1], travel_time)
+                assert routes != previous_routes # the workers route with the edge costs of this call
+                previous_routes = routes
+        finally:
+            close_routing_pool(routing_pool)
+
+# simulate_A_star gives the same results with a pool of worker processes as without
+# (the cars are routed when they spawn, before the number of cars and travel times of the minute are stored, so in this short run every minute is routed
+# with the same edge costs; test_route_in_pool_matches_serial_routing routes with changing edge costs)
+def test_simulate_A_star_with_workers(network, cars):
+    nodes, edges, distance_matrix = network
+    def run(**kwargs):
+        return simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, rng=create_rng(6), animate=False, **kwargs)
+
+    (serial, serial_edges), (parallel, parallel_edges) = run(), run(num_workers=2)
+    assert (serial.car_store["time arrived"] == parallel.car_store["time arrived"]).all()
+    assert all((a == b).all() for a, b in zip(serial.car_store["route"], parallel.car_store["route"]))
+    assert all((serial_edges[edge]["cars on edge"] == parallel_edges[edge]["cars on edge"]).all() for edge in edges)
@@ -0,0 +1,79 @@
+import os
+from functools import partial
+from statistics import NormalDist
+import numpy as np
+import pytest
+from conftest import NUM_MINUTES
+from utils import replications
+from utils.replications import create_aggregator, add_summary, sample_variance, half_width, run_replications, resample_demand, replicate_A_star
+from utils.rng import create_rng
+
+# The running mean and variance of the aggregator are those of all summaries, for numbers and arrays
+def test_aggregator_matches_numpy():
+    values = np.random.default_rng(0).normal(10, 3, (50, 4))
+    aggregator = create_aggregator()
+    for row in values:
+        add_summary(aggregator, {"number": row[0], "array": row})
+
+    assert np.isclose(aggregator["mean"]["number"], values[:, 0].mean())
+    assert np.allclose(aggregator["mean"]["array"], values.mean(axis=0))
+    assert np.allclose(sample_variance(aggregator, "array"), values.var(axis=0, ddof=1))
+
+    quantile = replications.stats.t.ppf(0.975, 49) if replications.stats is not None else NormalDist().inv_cdf(0.975)
+    assert np.allclose(half_width(aggregator, "array"), quantile * values.std(axis=0, ddof=1) / np.sqrt(50))
+
+# With fewer than 2 replications the variance is unknown and the confidence interval is infinitely wide
+def test_aggregator_of_one_replication():
+    aggregator = create_aggregator()
+    add_summary(aggregator, {"number": 1.0})
+    assert np.isnan(sample_variance(aggregator, "number"))
+    assert np.isinf(half_width(aggregator, "number"))
+
+def replicate_normal(seed):
+    return {"value": float(np.random.default_rng(seed).normal(0, 1))}
+
+# The replications stop when the target half-width is reached (after min_replications) or after max_replications, with the same results with workers
+def test_run_replications_stops():
+    aggregator = run_replications(replicate_normal, {"value": 100}, min_replications=3)
+    assert aggregator["count"] == 3
+
+    aggregator = run_replications(replicate_normal, {"value": 1e-6}, max_replications=8)
+    assert aggregator["count"] == 8
+    assert np.isclose(aggregator["mean"]["value"], np.mean([replicate_normal(seed)["value"] for seed in range(8)]))
+
+    parallel = run_replications(replicate_normal, {"value": 1e-6}, num_workers=2, max_replications=8)
+    assert parallel["count"] == 8 and parallel["mean"]["value"] == aggregator["mean"]["value"]
+
+# Each seed writes a file, so the test can see which replications were run by the workers
+def replicate_normal_to_file(seed, directory):
+    open(os.path.join(directory, str(seed)), "w").close()
+    return replicate_normal(seed)
+
+# With workers, the replications are run in batches and no new batch is started once the target half-width is reached
+def test_run_replications_in_batches(tmp_path):
+    aggregator = run_replications(partial(replicate_normal_to_file, directory=str(tmp_path)), {"value": 100}, num_workers=2, min_replications=3, batch_size=2)
+    assert aggregator["count"] == 3
+    assert sorted(int(name) for name in os.listdir(tmp_path)) == [0, 1, 2, 3]
+
+# Replications that do not depend on the seed raise an error instead of reporting a confidence interval of width 0
+def test_identical_replications_raise():
+    with pytest.raises(ValueError, match="same results"):
+        run_replications(lambda seed: {"value": 1.0}, max_replications=3)
+
+# The new demand keeps the (origin, destination, minute) of the cars and only changes how many cars each of them has
+def test_resample_demand(cars):
+    new_cars = resample_demand(cars, create_rng(9))
+    assert [car["id"] for car in new_cars] == list(range(len(new_cars)))
+    assert {(car["origin"], car["destination"], car["time spawned"]) for car in new_cars} <= {(car["origin"], car["destination"], car["time spawned"]) for car in cars}
+    assert new_cars != resample_demand(cars, create_rng(10))
+
+# A replication of simulate_A_star summarizes the run with the given cars, or with the demand of its seed with demand="resample"
+def test_replicate_A_star(network, cars):
+    nodes, edges, distance_matrix = network
+    summary = replicate_A_star(0, nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1)
+    assert summary["arrivals"] == len(cars)
+    assert summary["mean travel time"] >= 60 # no car is faster than at free flow: 18 + 24 + 36 minutes from City 1 to City 2, 60 minutes back
+    assert summary["congestion"].shape == (len(edges),)
+
+    resampled = replicate_A_star(0, nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, demand="resample")
+    assert resampled["arrivals"] == len(resample_demand(cars, create_rng(0)))
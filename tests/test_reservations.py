@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from utils.reservations import create_reservation_table, reserve, reserved_cars, advance_reservations, predicted_travel_time, reserved_cars_array
+
+# The Fenwick trees give the same number of cars at each minute as adding each reservation to an array of minutes, also after the window has moved on and wrapped around
+def test_reserved_cars_match_brute_force(graph):
+    num_edges = len(graph["edge names"])
+    table = create_reservation_table(graph, 50, 0.15, 4, 0)
+    expected = np.zeros((num_edges, 200), dtype=int)
+    generator = np.random.default_rng(1)
+
+    for time in range(0, 120, 10):
+        advance_reservations(table, time)
+        for _ in range(30):
+            edge = int(generator.integers(num_edges))
+            start = time + int(generator.integers(0, 30))
+            end = start + int(generator.integers(1, 19))
+            reserve(table, edge, start, end)
+            expected[edge, start:end] += 1
+
+        for edge in range(num_edges):
+            assert [reserved_cars(table, edge, minute) for minute in range(time, time + 50)] == expected[edge, time:time + 50].tolist()
+        counts = reserved_cars_array(table)
+        np.testing.assert_array_equal(counts, expected[:, time:time + counts.shape[1]])
+
+# Without reserved cars the travel time is tt_0, with reserved cars it follows the BPR function (without noise for sigma=0)
+def test_predicted_travel_time(graph):
+    table = create_reservation_table(graph, 50, 0.15, 4, 0)
+    reserve(table, 0, 5, 10)
+    tt_0, capacity = graph["tt_0"][0], graph["capacity"][0]
+    assert predicted_travel_time(table, 0, 4) == tt_0
+    assert predicted_travel_time(table, 0, 5) == pytest.approx(tt_0 * (1 + 0.15 * (1 / capacity) ** 4))
+
+# Reading and reserving outside the window raise the same IndexError
+def test_outside_the_window_raises(graph):
+    table = create_reservation_table(graph, 50, 0.15, 4, 0)
+    advance_reservations(table, 10)
+    for minute in (9, 60):
+        with pytest.raises(IndexError, match="outside the horizon"):
+            predicted_travel_time(table, 0, minute)
+    with pytest.raises(IndexError, match="outside the horizon"):
+        reserve(table, 0, 55, 60)
+    with pytest.raises(IndexError, match="outside the horizon"):
+        reserve(table, 0, 5, 15)
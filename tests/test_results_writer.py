@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from conftest import NUM_MINUTES
+from utils.results_writer import create_results_writer, write_car, write_unfinished, close_results_writer, read_results
+from utils.simulate_extended import simulate_A_star, simulate_A_mod
+from utils.rng import create_rng
+
+# The edges between the nodes of a path
+def graph_edges(graph, path):
+    return [graph["edge lookup"][(int(source), int(target))] for source, target in zip(path[:-1], path[1:])]
+
+# The results read back match the car store: one record for each car, in the order the cars arrived, with the cars that did not arrive at the end
+def check_results_match(results, car_store, graph):
+    order = results["car id"]
+    assert sorted(order.tolist()) == car_store["id"].tolist()
+    assert (results["time arrived"] == car_store["time arrived"][order]).all()
+    arrived = results["time arrived"] >= 0
+    assert (np.diff(results["time arrived"][arrived]) >= 0).all() and arrived[:arrived.sum()].all()
+    np.testing.assert_array_equal(results["optimal travel time"], car_store["optimal travel time"][order])
+    for record, car in enumerate(order.tolist()):
+        path = results["path"][results["path offsets"][record]:results["path offsets"][record + 1]]
+        assert path.tolist() == [car_store["origin"][car]] + graph["edge target"][car_store["route"][car]].tolist()
+        free_flow_path = results["free-flow path"][results["free-flow path offsets"][record]:results["free-flow path offsets"][record + 1]]
+        assert np.isclose(results["free-flow travel time"][record], graph["tt_0"][graph_edges(graph, free_flow_path)].sum())
+
+# The results are written in chunks (with a chunk of fewer cars at the end) and read back the same; an unfinished car is written at the end
+@pytest.mark.parametrize("format", ["npz", "parquet"])
+def test_results_round_trip(network, graph, cars, tmp_path, format):
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+    nodes, edges, distance_matrix = network
+    new_cars, _ = simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, rng=create_rng(14), animate=False)
+    car_store = new_cars.car_store
+    car_store["time arrived"][3] = -1
+
+    writer = create_results_writer(str(tmp_path / "results"), graph, chunk_size=100, format=format)
+    for car in np.argsort(car_store["time arrived"], kind="stable").tolist():
+        if car_store["time arrived"][car] >= 0:
+            write_car(writer, car_store, car)
+    write_unfinished(writer, car_store)
+    close_results_writer(writer)
+
+    results = read_results(str(tmp_path / "results"))
+    check_results_match(results, car_store, graph)
+    assert results["car id"][-1] == 3
+
+# The engines write the results of all cars while they run
+@pytest.mark.parametrize("engine", [simulate_A_star, simulate_A_mod])
+def test_engines_write_results(network, graph, cars, tmp_path, engine):
+    nodes, edges, distance_matrix = network
+    kwargs = {"animate": False} if engine is simulate_A_star else {}
+    new_cars = engine(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, rng=create_rng(15), results_path=str(tmp_path / "results"), results_format="npz", **kwargs)[0]
+
+    results = read_results(str(tmp_path / "results"))
+    check_results_match(results, new_cars.car_store, graph)
+    if engine is simulate_A_mod:
+        assert len(results["trajectory times"]) == len(results["path"])
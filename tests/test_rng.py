@@ -0,0 +1,37 @@
+import numpy as np
+from utils.rng import create_rng, normal, choice, keyed_standard_normal, skip_to, rng_state, restore_rng
+
+# Drawing from one stream does not change the numbers of another stream
+def test_streams_are_independent():
+    rng, other = create_rng(1), create_rng(1)
+    normal(other, "bpr noise", 0, 1, 1000)
+    assert (normal(rng, "demand", 0, 1, 10) == normal(other, "demand", 0, 1, 10)).all()
+    assert not (normal(create_rng(1), "demand", 0, 1, 10) == normal(create_rng(2), "demand", 0, 1, 10)).any()
+
+# The numbers of a stream do not depend on how they are drawn (across block boundaries), and skip_to continues a stream where another run is
+def test_draws_do_not_depend_on_blocks():
+    all_at_once = normal(create_rng(3, block_size=16), "bpr noise", 0, 1, 100)
+    rng = create_rng(3, block_size=16)
+    one_by_one = np.array([normal(rng, "bpr noise", 0, 1) for _ in range(100)])
+    assert (all_at_once == one_by_one).all()
+
+    skipped = create_rng(3, block_size=16)
+    skip_to(skipped, "bpr noise", "normal", 37)
+    assert (normal(skipped, "bpr noise", 0, 1, 63) == all_at_once[37:]).all()
+
+# A restored rng continues every stream where the saved one was
+def test_restore_rng():
+    rng = create_rng(4)
+    normal(rng, "bpr noise", 0, 1, 10)
+    choice(rng, "route choice", ["a", "b"], [0.5, 0.5])
+    restored = restore_rng(rng_state(rng))
+    assert normal(restored, "bpr noise", 0, 1) == normal(rng, "bpr noise", 0, 1)
+    assert [choice(restored, "route choice", ["a", "b", "c"], [0.2, 0.3, 0.5]) for _ in range(20)] == [choice(rng, "route choice", ["a", "b", "c"], [0.2, 0.3, 0.5]) for _ in range(20)]
+
+# Keyed numbers only depend on the seed, the stream and the key
+def test_keyed_standard_normal():
+    rng = create_rng(5)
+    first = keyed_standard_normal(rng, "future edge noise", (3, 0), 8)
+    normal(rng, "future edge noise", 0, 1, 100)
+    assert (keyed_standard_normal(rng, "future edge noise", (3, 0), 8) == first).all()
+    assert not (keyed_standard_normal(rng, "future edge noise", (3, 1), 8) == first).any()
@@ -0,0 +1,69 @@
+import numpy as np
+from conftest import NUM_MINUTES, random_graph
+from utils.functional_extended import find_optimal_route
+from utils.route_cache import create_route_cache, network_state, lookup_route, store_route, hit_rate
+from utils.simulate_extended import simulate_A_star
+from utils.rng import create_rng
+
+# The least recently used route is removed when the cache is full; looking a route up makes it the most recently used
+def test_least_recently_used_route_is_removed():
+    route_cache = create_route_cache(max_size=2)
+    store_route(route_cache, 0, 1, 7, [0], 1.0)
+    store_route(route_cache, 0, 2, 7, [1], 2.0)
+    assert lookup_route(route_cache, 0, 1, 7) == ([0], 1.0)
+    store_route(route_cache, 0, 3, 7, [2], 3.0)
+
+    assert lookup_route(route_cache, 0, 2, 7) is None
+    assert lookup_route(route_cache, 0, 1, 7) == ([0], 1.0)
+    assert lookup_route(route_cache, 0, 3, 7) == ([2], 3.0)
+    assert (route_cache["hits"], route_cache["misses"]) == (3, 1)
+    assert hit_rate(route_cache) == 0.75
+
+# The network state only changes when the edge costs change by more than the tolerance (they are rounded down to multiples of it)
+def test_network_state_tolerance():
+    exact = create_route_cache()
+    assert network_state(exact, [1.0, 2.0]) == network_state(exact, [1.0, 2.0])
+    assert network_state(exact, [1.0, 2.0]) != network_state(exact, [1.0, 2.01])
+
+    rounded = create_route_cache(tolerance=0.5)
+    assert network_state(rounded, [1.0, 2.0]) == network_state(rounded, [1.1, 2.4])
+    assert network_state(rounded, [1.0, 2.0]) != network_state(rounded, [1.0, 2.5])
+
+# Routing with the cache while the edge costs change: a changed network misses the cache and gets its own route, and a network that
+# looks like an earlier one gets the route of that network back
+def test_route_cache_with_changing_edge_costs():
+    graph = random_graph(seed=4)
+    num_nodes = len(graph["adjacency"])
+    generator = np.random.default_rng(5)
+    costs_of_minute = [(graph["tt_0"] * generator.uniform(1, 3, len(graph["edge names"]))).tolist() for _ in range(3)]
+    route_cache = create_route_cache()
+
+    def route(origin, destination, edge_costs):
+        state = network_state(route_cache, edge_costs)
+        cached = lookup_route(route_cache, origin, destination, state)
+        if cached is None:
+            cached = find_optimal_route(graph, origin, destination, edge_costs, [0] * num_nodes)
+            store_route(route_cache, origin, destination, state, *cached)
+        return cached
+
+    routes = [[route(0, destination, edge_costs) for destination in range(1, num_nodes)] for edge_costs in costs_of_minute]
+    assert (route_cache["hits"], route_cache["misses"]) == (0, 3 * (num_nodes - 1))
+    assert routes[0] != routes[1] != routes[2]
+
+    for edge_costs, expected in zip(reversed(costs_of_minute), reversed(routes)):
+        assert [route(0, destination, edge_costs) for destination in range(1, num_nodes)] == expected
+        assert expected == [find_optimal_route(graph, 0, destination, edge_costs, [0] * num_nodes) for destination in range(1, num_nodes)]
+    assert route_cache["hits"] == 3 * (num_nodes - 1)
+
+# A* with a route cache gives the same results as without one when the network state has to be exactly the same
+# (the cars are routed when they spawn, before the number of cars and travel times of the minute are stored, so in this short run every minute is routed
+# with the same edge costs; test_route_cache_with_changing_edge_costs routes with changing edge costs)
+def test_simulate_A_star_with_route_cache(network, cars):
+    nodes, edges, distance_matrix = network
+    def run(**kwargs):
+        return simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, rng=create_rng(3), animate=False, **kwargs)[0].car_store
+
+    route_cache = create_route_cache()
+    without_cache, with_cache = run(), run(route_cache=route_cache)
+    assert (without_cache["time arrived"] == with_cache["time arrived"]).all()
+    assert route_cache["hits"] > 0
@@ -0,0 +1,34 @@
+import pytest
+from conftest import NUM_MINUTES
+from utils.scenarios import simulate_scenarios, scale_capacity
+from utils.simulate_extended import simulate_A_star, simulate_A_mod
+from utils.replications import summarize_A_star
+from utils.rng import create_rng
+
+# Only the capacity of the given edges is scaled, on a copy of the edges
+def test_scale_capacity(network):
+    _, edges, _ = network
+    new_edges = scale_capacity(edges, 0.5, ["C → City 2"])
+    assert new_edges["C → City 2"]["capacity"] == edges["C → City 2"]["capacity"] // 2
+    assert new_edges["A → C"]["capacity"] == edges["A → C"]["capacity"]
+    assert new_edges["C → City 2"]["cars on edge"] is not edges["C → City 2"]["cars on edge"]
+
+# A scenario without changes gives the same results as a run without a warm-up checkpoint; a scenario with half the capacity
+# is slower for the cars that spawn after the warm-up
+@pytest.mark.parametrize("engine", [simulate_A_star, simulate_A_mod])
+def test_scenario_without_changes_matches_plain_run(network, cars, tmp_path, engine):
+    nodes, edges, distance_matrix = network
+    kwargs = {"animate": False} if engine is simulate_A_star else {}
+    plain = summarize_A_star(*engine(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, rng=create_rng(13), **kwargs)[:2], NUM_MINUTES)
+
+    unchanged, changed = simulate_scenarios(engine, nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, 10, [{}, {"edges": scale_capacity(edges, 0.5)}],
+                                            snapshot_path=str(tmp_path / "warmup.npz"), summarize=lambda *results: summarize_A_star(*results[:2], NUM_MINUTES), rng=create_rng(13))
+    assert unchanged["mean travel time"] == plain["mean travel time"]
+    assert (unchanged["congestion"] == plain["congestion"]).all()
+    assert changed["mean travel time"] > plain["mean travel time"]
+
+# The full results of the scenarios need summarize with more than one worker
+def test_workers_need_summarize(network, cars, tmp_path):
+    nodes, edges, distance_matrix = network
+    with pytest.raises(ValueError, match="summarize"):
+        simulate_scenarios(simulate_A_star, nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, 40, [{}, {}], num_workers=2, snapshot_path=str(tmp_path / "warmup.npz"))
@@ -0,0 +1,18 @@
+from utils.scheduler import create_scheduler, schedule_car, cars_due
+
+# Cars come out in the minute they are scheduled for, in order of their id, including cars scheduled for the current minute while iterating
+def test_cars_due_in_order():
+    scheduler = create_scheduler()
+    for minute, car in ((3, 7), (1, 4), (1, 2), (5, 1)):
+        schedule_car(scheduler, minute, car)
+
+    assert list(cars_due(scheduler, 0)) == []
+    due = []
+    for car in cars_due(scheduler, 1):
+        due.append(car)
+        if car == 2:
+            schedule_car(scheduler, 1, 9)
+            schedule_car(scheduler, 2, 8)
+    assert due == [2, 4, 9]
+    assert list(cars_due(scheduler, 3)) == [8, 7] # a car due in a minute that was skipped comes out in the next one
+    assert scheduler == [(5, 1)]
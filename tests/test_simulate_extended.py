@@ -0,0 +1,86 @@
+import math
+import numpy as np
+from conftest import NUM_MINUTES
+from utils.simulate_extended import simulate_A_star, simulate_A_mod
+from utils.car_store import create_spawn_index
+from utils.landmarks import compute_landmarks
+from utils.rng import create_rng
+
+# The free-flow travel time of each car along the route it took
+def free_flow_travel_times(car_store, graph):
+    return np.array([graph["tt_0"][route].sum() for route in car_store["route"]])
+
+# Checks that hold for the results of both engines: every car arrives, no faster than at free flow, and no edge ever has more cars than its capacity
+def check_results(new_cars, new_edges, graph):
+    car_store = new_cars.car_store
+    assert (car_store["time arrived"] >= 0).all()
+    assert (car_store["time arrived"] - car_store["time spawned"] >= np.floor(free_flow_travel_times(car_store, graph))).all()
+    for edge, properties in new_edges.items():
+        assert (properties["cars on edge"][:NUM_MINUTES] <= properties["capacity"]).all()
+
+# A short run of simulate_A_star with the default settings
+def test_simulate_A_star(network, graph, cars, tmp_path):
+    nodes, edges, distance_matrix = network
+    new_cars, new_edges = simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, spawn_index=create_spawn_index(cars, NUM_MINUTES), animate=False, results_path=str(tmp_path / "results"))
+    check_results(new_cars, new_edges, graph)
+
+    # The cars are exported like the car dictionaries of the model scripts, and the original cars and edges are not changed
+    car = new_cars[0]
+    assert car["optimal path"][0] == "City 1" and car["optimal path"][-1] == "City 2"
+    assert car["time arrived"] - car["time spawned"] >= math.floor(car["optimal travel time"])
+    assert cars[0]["time arrived"] is None
+    assert not any(properties["cars on edge"].any() for properties in edges.values())
+
+# A short run of simulate_A_mod with the default settings
+def test_simulate_A_mod(network, graph, cars, tmp_path):
+    nodes, edges, distance_matrix = network
+    new_cars, new_edges, future_edges = simulate_A_mod(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, spawn_index=create_spawn_index(cars, NUM_MINUTES), results_path=str(tmp_path / "results"))
+    check_results(new_cars, new_edges, graph)
+
+    # Each car follows the trajectory it was planned, which starts at its origin when it spawns; the future edges have all cars booked
+    car = new_cars[0]
+    assert car["trajectory"][0] == ("City 1", car["time spawned"])
+    assert car["trajectory"][-1][0] == "City 2"
+    assert sum(properties["cars on edge"].sum() for properties in future_edges.values()) > 0
+
+# Only the cars that need attention are handled; a car whose origin is its destination has an empty route and stays at its origin without arriving
+def test_car_at_its_destination_stays(network):
+    nodes, edges, distance_matrix = network
+    cars = [{"id": 0, "origin": "City 1", "destination": "City 1", "time spawned": 2}, {"id": 1, "origin": "City 1", "destination": "A", "time spawned": 2}]
+    new_cars, _ = simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, 30, distance_matrix, 1, animate=False)
+    assert new_cars[0]["active"] and new_cars[0]["time arrived"] is None and new_cars[0]["location"] == "City 1"
+    assert new_cars[1]["time arrived"] == 2 + 18 + 1 # tt_0 of City 1 → A is 18 minutes; the car arrives the minute after it finishes the edge
+
+# A car can only enter an edge with fewer cars than its capacity, counting all cars on the edge; the cars that wait enter when cars leave the edge
+def test_edge_never_exceeds_its_capacity(network):
+    nodes, edges, distance_matrix = network
+    edges["City 1 → A"]["capacity"] = 5
+    cars = [{"id": car, "origin": "City 1", "destination": "A", "time spawned": 0} for car in range(12)]
+    new_cars, new_edges = simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, 80, distance_matrix, 1, animate=False)
+    assert new_edges["City 1 → A"]["cars on edge"][:80].max() == 5
+    assert [car["time arrived"] for car in new_cars] == [19] * 5 + [37] * 5 + [55] * 2 # every 18 minutes (tt_0 of City 1 → A) five cars leave the edge
+
+# The cars of an (origin, destination) pair that spawn in the same minute are routed once and share the route and its travel time
+def test_cars_of_a_minute_share_their_route(network, cars):
+    nodes, edges, distance_matrix = network
+    new_cars, _ = simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, animate=False)
+    car_store = new_cars.car_store
+
+    routes_of_pair = {}
+    for car in range(len(cars)):
+        key = (int(car_store["origin"][car]), int(car_store["destination"][car]), int(car_store["time spawned"][car]))
+        routes_of_pair.setdefault(key, set()).add((tuple(car_store["route"][car].tolist()), float(car_store["optimal travel time"][car])))
+    assert len(routes_of_pair) == 2 * 30
+    assert all(len(routes) == 1 for routes in routes_of_pair.values())
+
+# Routing with shortest path trees gives the same results as A* with the landmark heuristic, which does not overestimate the travel time
+# (the cars are routed when they spawn, before the number of cars and travel times of the minute are stored, so in this short run every minute is routed
+# with the same edge costs; test_shortest_path_tree_with_changing_edge_costs in test_functional_extended.py routes with changing edge costs)
+def test_shortest_path_tree_routing_matches_A_star(network, graph, cars):
+    nodes, edges, distance_matrix = network
+    def run(**kwargs):
+        return simulate_A_star(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, rng=create_rng(5), animate=False, **kwargs)[0].car_store
+
+    a_star, trees = run(landmarks=compute_landmarks(graph)), run(routing="shortest path tree")
+    assert (a_star["time arrived"] == trees["time arrived"]).all()
+    assert all((a == b).all() for a, b in zip(a_star["route"], trees["route"]))
@@ -0,0 +1,23 @@
+import numpy as np
+from utils.sweep import run_sweep
+
+# A run that only draws from np.random, so the result shows which random numbers it used
+def draw(cars, edges, scale):
+    return float(np.random.normal()) * scale
+
+# Without a seed, the runs in worker processes share one drawn seed (common random numbers), and the returned seed repeats them
+def test_parallel_sweep_uses_common_random_numbers():
+    scenarios = [dict(scale=1), dict(scale=2), dict(scale=3)]
+    results, seed = run_sweep(draw, [], {}, (), scenarios, num_workers=2)
+    assert seed is not None
+    np.testing.assert_allclose(results, [results[0], 2 * results[0], 3 * results[0]])
+
+    repeated, _ = run_sweep(draw, [], {}, (), scenarios, num_workers=2, seed=seed)
+    assert repeated == results
+
+# With a seed, the runs one after another give the same results as the runs in worker processes
+def test_serial_sweep_matches_parallel_sweep():
+    scenarios = [dict(scale=1), dict(scale=2)]
+    serial, _ = run_sweep(draw, [], {}, (), scenarios, seed=7)
+    parallel, _ = run_sweep(draw, [], {}, (), scenarios, num_workers=2, seed=7)
+    assert serial == parallel
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from conftest import NUM_MINUTES
+from utils.trajectory_archive import create_trajectory_archive, append_trajectory, trajectory_of, flush_trajectory_archive, open_trajectory_archive, cars_between, close_trajectory_archive
+from utils.simulate_extended import simulate_A_mod
+from utils.rng import create_rng
+
+# Trajectories added to a full archive make it larger, and are read back (with the cars of each pair) after the archive is opened again
+def test_append_and_reopen(tmp_path):
+    path = str(tmp_path / "archive")
+    archive = create_trajectory_archive(path, 4, capacity=2)
+    append_trajectory(archive, 2, 0, 3, [0, 1, 3], [0.0, 1.5, 4.0])
+    append_trajectory(archive, 0, 0, 3, [0, 3], [1.0, 2.0])
+    append_trajectory(archive, 1, 3, 0, [3, 0], [2.0, 9.0])
+    assert len(archive["records"]) >= 7
+    close_trajectory_archive(archive)
+
+    archive = open_trajectory_archive(path)
+    assert trajectory_of(archive, 2)["node"].tolist() == [0, 1, 3]
+    assert trajectory_of(archive, 2)["time"].tolist() == [0.0, 1.5, 4.0]
+    assert trajectory_of(archive, 3) is None
+    assert cars_between(archive, 0, 3).tolist() == [0, 2]
+    assert cars_between(archive, 3, 0).tolist() == [1]
+    assert len(cars_between(archive, 1, 3)) == 0
+    close_trajectory_archive(archive)
+
+# Trajectories can be added to an archive after its index is written and it is opened again, e.g. when continuing from a checkpoint
+def test_append_after_flush(tmp_path):
+    path = str(tmp_path / "archive")
+    archive = create_trajectory_archive(path, 2)
+    append_trajectory(archive, 0, 0, 1, [0, 1], [0.0, 1.0])
+    flush_trajectory_archive(archive)
+    close_trajectory_archive(archive)
+
+    archive = open_trajectory_archive(path, mode="r+")
+    append_trajectory(archive, 1, 1, 0, [1, 0], [3.0, 4.0])
+    close_trajectory_archive(archive)
+    assert cars_between(open_trajectory_archive(path), 1, 0).tolist() == [1]
+
+# The trajectories in the archive of simulate_A_mod are the trajectories of the cars of the same run without an archive,
+# also when the run continues from a checkpoint
+def test_simulate_A_mod_archive(network, graph, cars, tmp_path):
+    nodes, edges, distance_matrix = network
+    def run(num_minutes, **kwargs):
+        return simulate_A_mod(nodes, edges, cars, 0.15, 4, 0.1, num_minutes, distance_matrix, 1, rng=create_rng(16), **kwargs)[0]
+
+    without_archive = run(NUM_MINUTES)
+    checkpoint_path = str(tmp_path / "checkpoint.npz")
+    for path, kwargs in ((tmp_path / "archive", {}), (tmp_path / "resumed archive", {"resume_from": checkpoint_path})):
+        if kwargs:
+            run(80, trajectory_archive=str(path), checkpoint_every=40, checkpoint_path=checkpoint_path)
+        with_archive = run(NUM_MINUTES, trajectory_archive=str(path), **kwargs)
+        assert (with_archive.car_store["time arrived"] == without_archive.car_store["time arrived"]).all()
+
+        archive = open_trajectory_archive(str(path))
+        for car in range(len(cars)):
+            records = trajectory_of(archive, car)
+            trajectory = [(graph["node names"][node], time) for node, time in zip(records["node"].tolist(), records["time"].tolist())]
+            assert np.allclose([time for _, time in trajectory], [time for _, time in without_archive[car]["trajectory"]])
+            assert [node for node, _ in trajectory] == [node for node, _ in without_archive[car]["trajectory"]]
+        assert len(cars_between(archive, graph["node ids"]["City 1"], graph["node ids"]["City 2"])) == 30 * 40
+        close_trajectory_archive(archive)
+
+# A run with an archive cannot continue from a checkpoint that was saved without one
+def test_resume_with_archive_needs_archive_in_checkpoint(network, cars, tmp_path):
+    nodes, edges, distance_matrix = network
+    checkpoint_path = str(tmp_path / "checkpoint.npz")
+    simulate_A_mod(nodes, edges, cars, 0.15, 4, 0.1, 40, distance_matrix, 1, rng=create_rng(17), checkpoint_every=40, checkpoint_path=checkpoint_path)
+    with pytest.raises(ValueError, match="without a trajectory archive"):
+        simulate_A_mod(nodes, edges, cars, 0.15, 4, 0.1, NUM_MINUTES, distance_matrix, 1, rng=create_rng(17), resume_from=checkpoint_path, trajectory_archive=str(tmp_path / "archive"))
@@ -0,0 +1,129 @@
+import numpy as np
+
+# Columnar storage of the cars in the simulation: instead of one dictionary per car, every car property is one NumPy array indexed by car id.
+# Nodes and edges are referred to by their id in the compiled graph (see utils/graph.py).
+# The route of a car is an array of edge ids and the "cursor" of a car is the position in its route of the next edge it still has to enter.
+
+# Create the car store from the list of car dictionaries built in the model scripts
+def create_car_store(cars, graph):
+    node_ids = graph["node ids"]
+    num_cars = len(cars)
+
+    car_store = {
+        "graph": graph,
+        "id": np.array([car["id"] for car in cars], dtype=np.int64),
+        "origin": np.array([node_ids[car["origin"]] for car in cars], dtype=np.int32),
+        "destination": np.array([node_ids[car["destination"]] for car in cars], dtype=np.int32),
+        "time spawned": np.array([car["time spawned"] for car in cars], dtype=np.int32),
+        "time arrived": np.full(num_cars, -1, dtype=np.int32), # -1 as long as the car has not arrived
+        "active": np.zeros(num_cars, dtype=bool),
+        "location": np.full(num_cars, -1, dtype=np.int32), # edge id of the edge the car is on, -1 if the car is not on an edge
+        "time entered last edge": np.full(num_cars, -1, dtype=np.int32),
+        "finished edge": np.zeros(num_cars, dtype=bool),
+        "cursor": np.zeros(num_cars, dtype=np.int32), # position in the route of the next edge to enter
+        "route length": np.zeros(num_cars, dtype=np.int32),
+        "route": [None] * num_cars, # array of edge ids for each car that has been routed
+        "optimal travel time": np.full(num_cars, np.nan),
+        "trajectory times": [None] * num_cars # array of the times the car is planned to pass each node (only used in the modified A* simulation)
+    }
+
+    return car_store
+
+# Bucket the cars by the minute they spawn, so that each minute only the cars spawning in that minute have to be visited
+# The cars spawning at minute t are spawn_index["order"][spawn_index["offsets"][t]:spawn_index["offsets"][t + 1]] (in order of their id)
+def create_spawn_index(cars, num_minutes):
+    time_spawned = np.array([car["time spawned"] for car in cars], dtype=np.int64)
+    order = np.argsort(time_spawned, kind="stable")
+    offsets = np.searchsorted(time_spawned[order], np.arange(num_minutes + 1), side="left")
+    return {"order": order, "offsets": offsets}
+
+# Give the cars that spawn at the given minute
+def cars_spawning(spawn_index, time):
+    return spawn_index["order"][spawn_index["offsets"][time]:spawn_index["offsets"][time + 1]]
+
+# Give a car its route; the car starts on its origin, in front of the first edge of the route
+def set_route(car_store, car, route, optimal_travel_time=None, trajectory_times=None):
+    car_store["route"][car] = route
+    car_store["route length"][car] = len(route)
+    car_store["cursor"][car] = 0
+    if optimal_travel_time is not None:
+        car_store["optimal travel time"][car] = optimal_travel_time
+    car_store["trajectory times"][car] = trajectory_times
+
+# Convert the route of a car back to the list of node names it passes
+def path_of_car(car_store, car):
+    route = car_store["route"][car]
+    if route is None:
+        return None
+    graph = car_store["graph"]
+    node_names = graph["node names"]
+    path = [node_names[car_store["origin"][car]]]
+    path += [node_names[node] for node in graph["edge target"][route]]
+    return path
+
+# Export one car as a dictionary with the same keys as the car dictionaries of the model scripts
+def export_car(car_store, car):
+    node_names = car_store["graph"]["node names"]
+    edge_names = car_store["graph"]["edge names"]
+    route = car_store["route"][car]
+    trajectory_times = car_store["trajectory times"][car]
+    path = path_of_car(car_store, car)
+
+    # Cars routed by the modified A* algorithm have a trajectory instead of an optimal path
+    if trajectory_times is not None:
+        optimal_path = None
+        trajectory = [(node, float(time)) for node, time in zip(path, trajectory_times)]
+    else:
+        optimal_path = path
+        trajectory = None
+
+    optimal_travel_time = car_store["optimal travel time"][car]
+    time_arrived = car_store["time arrived"][car]
+    location = car_store["location"][car]
+    time_entered_last_edge = car_store["time entered last edge"][car]
+    cursor = car_store["cursor"][car]
+
+    if location >= 0:
+        location = edge_names[location]
+    elif car_store["active"][car]:
+        location = node_names[car_store["origin"][car]]
+    else:
+        location = None
+
+    if route is not None and car_store["active"][car] and cursor < len(route):
+        next_edge = edge_names[route[cursor]]
+    else:
+        next_edge = None
+
+    return {
+        "id": int(car_store["id"][car]),
+        "origin": node_names[car_store["origin"][car]],
+        "destination": node_names[car_store["destination"][car]],
+        "optimal path": optimal_path,
+        "optimal travel time": None if np.isnan(optimal_travel_time) else float(optimal_travel_time),
+        "trajectory": trajectory,
+        "time spawned": int(car_store["time spawned"][car]),
+        "time arrived": None if time_arrived < 0 else int(time_arrived),
+        "active": bool(car_store["active"][car]),
+        "location": location,
+        "time entered last edge": None if time_entered_last_edge < 0 else int(time_entered_last_edge),
+        "finished edge": bool(car_store["finished edge"][car]),
+        "next edge": next_edge
+    }
+
+# Read-only view of the car store that behaves like the list of car dictionaries (used by save_simulation_results and print_cars)
+class CarsView:
+    def __init__(self, car_store):
+        self.car_store = car_store
+
+    def __len__(self):
+        return len(self.car_store["id"])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [export_car(self.car_store, car) for car in range(len(self))[index]]
+        return export_car(self.car_store, range(len(self))[index])
+
+    def __iter__(self):
+        for car in range(len(self)):
+            yield export_car(self.car_store, car)
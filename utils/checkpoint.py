@@ -0,0 +1,203 @@
+import os
+import heapq
+import threading
+import numpy as np
+from utils.rng import rng_state, restore_rng
+from utils.output_thread import submit
+
+# Checkpoints of the A* simulations: the full state of a simulation at the end of a minute, written to a compressed .npz file, so that a long run
+# can be continued from the last checkpoint (resume_from in simulate_A_star and simulate_A_mod) after a crash or Ctrl-C.
+# A checkpoint holds the car store, the time series of the edges, the number of cars on each edge, the scheduler, the random number state
+# (the positions of the streams of rng, and the state of np.random), the route cache and the predictions of the modified A* algorithm.
+# Everything is stored as plain arrays (no pickled objects): the routes of the cars (of different lengths) are stored one after another with the offset of each car.
+# A run continued from a checkpoint gives exactly the same results as a run without interruption, as long as the same cars, edges and settings are used.
+# The cars that spawned up to the checkpoint are matched by their id, so a checkpoint can also be continued with other cars spawning after it,
+# or with other capacities and BPR parameters (see utils/scenarios.py).
+# Only the minutes of the time series that have been filled are stored: up to the minute of the checkpoint for the edges, up to the last booked minute for the future edges;
+# the other minutes still have the values they started with, in the interrupted run and in the run that continues from the checkpoint.
+# The file is written next to the old checkpoint first and then moved over it, so an interruption while writing does not destroy the last checkpoint.
+
+CAR_KEYS = ("id", "origin", "destination", "time spawned")
+CAR_ARRAYS = ("time arrived", "active", "location", "time entered last edge", "finished edge", "cursor", "route length", "optimal travel time")
+
+# Store a list of arrays (or None) one after another; returns the values, the offset of each array and whether each array is present
+def flatten_arrays(arrays, dtype):
+    lengths = [0 if array is None else len(array) for array in arrays]
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    present = np.array([array is not None for array in arrays], dtype=bool)
+    values = np.concatenate([np.asarray(array, dtype=dtype) for array in arrays if array is not None]) if present.any() else np.zeros(0, dtype=dtype)
+    return values, offsets, present
+
+# The list of arrays (or None) back from flatten_arrays
+def unflatten_arrays(values, offsets, present):
+    return [values[offsets[i]:offsets[i + 1]].copy() if present[i] else None for i in range(len(present))]
+
+# The state of a simulation at the end of the given minute as a dictionary of arrays
+def simulation_state(time, car_store, edge_store, occupancy, scheduler, rng=None, route_cache=None):
+    state = {"time": np.array(time)}
+
+    for key in CAR_KEYS + CAR_ARRAYS:
+        state["car/" + key] = car_store[key]
+    state["car/route"], state["car/route offsets"], state["car/routed"] = flatten_arrays(car_store["route"], np.int32)
+    state["car/trajectory times"], state["car/trajectory offsets"], state["car/has trajectory"] = flatten_arrays(car_store["trajectory times"], np.float64)
+
+    for key, array in edge_store.items():
+        state["edges/" + key] = array[:, :time + 1]
+    state["occupancy"] = np.array(occupancy, dtype=np.int64)
+    state["scheduler"] = np.array(scheduler, dtype=np.int64).reshape(-1, 2)
+
+    # np.random is saved even when rng is given, as the demand or other code can still use it
+    name, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    state["np.random/keys"] = keys
+    state["np.random/position"] = np.array([position, has_gauss])
+    state["np.random/cached gaussian"] = np.array(cached_gaussian)
+    if rng is not None:
+        saved_rng = rng_state(rng)
+        positions = list(saved_rng["positions"].items())
+        state["rng/seed"] = np.array(saved_rng["seed"])
+        state["rng/block size"] = np.array(saved_rng["block size"])
+        state["rng/streams"] = np.array([stream for (stream, _), _ in positions], dtype=str)
+        state["rng/kinds"] = np.array([kind for (_, kind), _ in positions], dtype=str)
+        state["rng/positions"] = np.array([position for _, position in positions], dtype=np.int64)
+
+    if route_cache is not None:
+        entries = list(route_cache["entries"].items())
+        state["cache/keys"] = np.array([key for key, _ in entries], dtype=np.uint64).reshape(-1, 3)
+        state["cache/routes"], state["cache/route offsets"], state["cache/has route"] = flatten_arrays([route for _, (route, _) in entries], np.int32)
+        state["cache/travel times"] = np.array([np.nan if travel_time is None else travel_time for _, (_, travel_time) in entries], dtype=np.float64)
+        state["cache/counts"] = np.array([route_cache["hits"], route_cache["misses"]])
+
+    return state
+
+# Put the state of a checkpoint back into the car store, edge store, occupancy list, scheduler and route cache of a new simulation;
+# returns the minute the checkpoint was made and the restored rng (None if the checkpoint has no rng)
+def restore_simulation_state(state, car_store, edge_store, occupancy, scheduler, route_cache=None):
+    time = int(state["time"])
+    if any(state["edges/" + key].shape[0] != array.shape[0] or state["edges/" + key].shape[1] > array.shape[1] for key, array in edge_store.items()):
+        raise ValueError("The checkpoint does not belong to these edges")
+
+    # The cars that spawned up to the checkpoint (rows of the checkpoint) and the same cars in the car store (rows of the car store)
+    checkpoint_rows = np.nonzero(state["car/time spawned"] <= time)[0]
+    car_rows = {car_id: row for row, car_id in enumerate(car_store["id"].tolist())}
+    if any(car_id not in car_rows for car_id in state["car/id"][checkpoint_rows].tolist()):
+        raise ValueError("The cars that spawned before the checkpoint are missing")
+    rows = np.array([car_rows[car_id] for car_id in state["car/id"][checkpoint_rows].tolist()], dtype=np.int64)
+    for key in CAR_KEYS[1:]:
+        if not np.array_equal(car_store[key][rows], state["car/" + key][checkpoint_rows]):
+            raise ValueError(f"The {key} of the cars that spawned before the checkpoint has changed")
+    if np.count_nonzero(car_store["time spawned"] <= time) != len(rows):
+        raise ValueError("Cars that were not in the checkpoint spawn before it")
+
+    for key in CAR_ARRAYS:
+        car_store[key][rows] = state["car/" + key][checkpoint_rows]
+    routes = unflatten_arrays(state["car/route"], state["car/route offsets"], state["car/routed"])
+    trajectory_times = unflatten_arrays(state["car/trajectory times"], state["car/trajectory offsets"], state["car/has trajectory"])
+    for checkpoint_row, row in zip(checkpoint_rows.tolist(), rows.tolist()):
+        car_store["route"][row] = routes[checkpoint_row]
+        car_store["trajectory times"][row] = trajectory_times[checkpoint_row]
+
+    for key, array in edge_store.items():
+        array[:, :state["edges/" + key].shape[1]] = state["edges/" + key]
+    occupancy[:] = state["occupancy"].tolist()
+
+    # The events of the scheduler refer to rows of the checkpoint, so they are moved to the rows of the car store and the heap is rebuilt
+    row_of = np.full(len(state["car/id"]), -1, dtype=np.int64)
+    row_of[checkpoint_rows] = rows
+    scheduler[:] = [(minute, int(row_of[car])) for minute, car in state["scheduler"].tolist()]
+    heapq.heapify(scheduler)
+
+    position, has_gauss = state["np.random/position"].tolist()
+    np.random.set_state(("MT19937", state["np.random/keys"], position, has_gauss, float(state["np.random/cached gaussian"])))
+    rng = None
+    if "rng/seed" in state:
+        positions = {(stream, kind): position for stream, kind, position in zip(state["rng/streams"].tolist(), state["rng/kinds"].tolist(), state["rng/positions"].tolist())}
+        rng = restore_rng({"seed": int(state["rng/seed"]), "block size": int(state["rng/block size"]), "positions": positions})
+
+    if route_cache is not None and "cache/keys" in state:
+        route_cache["entries"].clear()
+        routes = unflatten_arrays(state["cache/routes"], state["cache/route offsets"], state["cache/has route"])
+        for (origin, destination, network_state), route, travel_time in zip(state["cache/keys"].tolist(), routes, state["cache/travel times"].tolist()):
+            route_cache["entries"][(origin, destination, network_state)] = (route, None if np.isnan(travel_time) else travel_time)
+        route_cache["hits"], route_cache["misses"] = state["cache/counts"].tolist()
+
+    return time, rng
+
+# The blocks of fixed noise of the reservation table or of the fixed noise of utils/future_noise.py as arrays: their (edge, block) keys and their values
+def noise_arrays(noise):
+    blocks = list(noise["noise"].items())
+    return np.array([key for key, _ in blocks], dtype=np.int64).reshape(-1, 2), np.array([values for _, values in blocks], dtype=np.float64).reshape(-1, noise["block size"])
+
+# The blocks of fixed noise from their keys and values (see noise_arrays)
+def noise_blocks(keys, values):
+    return {tuple(key): block for key, block in zip(keys.tolist(), values.tolist())}
+
+# The predictions of the modified A* algorithm as a dictionary of arrays: the future edge store, the future horizon or the reservation table,
+# and the fixed noise of the predictions (see utils/future_noise.py)
+def future_state(future_edge_store=None, horizon=None, reservations=None, future_noise=None):
+    state = {}
+    if future_edge_store is not None:
+        # The minutes after the last minute with a booked car have not been changed
+        booked_minutes = np.flatnonzero(future_edge_store["cars on edge"].any(axis=0))
+        end = booked_minutes[-1] + 1 if len(booked_minutes) > 0 else 0
+        for key, array in future_edge_store.items():
+            state["future/" + key] = array[:, :end]
+    if horizon is not None:
+        state["horizon/cars on edge"] = horizon["cars on edge"]
+        state["horizon/travel time"] = horizon["travel time"]
+        state["horizon/start"] = np.array(horizon["start"])
+    if reservations is not None:
+        state["reservations/tree"] = reservations["tree"]
+        state["reservations/window"] = np.array([reservations["start"], reservations["end"]])
+        state["reservations/noise keys"], state["reservations/noise"] = noise_arrays(reservations)
+    if future_noise is not None:
+        state["future noise/keys"], state["future noise/values"] = noise_arrays(future_noise)
+    return state
+
+# Put the predictions of a checkpoint back (see future_state)
+def restore_future_state(state, future_edge_store=None, horizon=None, reservations=None, future_noise=None):
+    if future_edge_store is not None:
+        for key, array in future_edge_store.items():
+            array[:, :state["future/" + key].shape[1]] = state["future/" + key]
+    if horizon is not None:
+        horizon["cars on edge"][:] = state["horizon/cars on edge"]
+        horizon["travel time"][:] = state["horizon/travel time"]
+        horizon["start"] = int(state["horizon/start"])
+    if reservations is not None:
+        reservations["tree"][:] = state["reservations/tree"]
+        reservations["start"], reservations["end"] = state["reservations/window"].tolist()
+        reservations["noise"] = noise_blocks(state["reservations/noise keys"], state["reservations/noise"])
+    if future_noise is not None:
+        future_noise["noise"] = noise_blocks(state["future noise/keys"], state["future noise/values"])
+
+# Write a checkpoint to path (a .npz file); with an output thread (see utils/output_thread.py) the checkpoint is written in the background
+# The output thread gets a copy of the state, which can be large, so at most one checkpoint is handed off at a time: a new checkpoint waits until the previous one is written
+def save_checkpoint(path, state, output=None):
+    if output is not None:
+        if "checkpoint written" in output:
+            while not output["checkpoint written"].wait(1):
+                if output["error"] is not None:
+                    raise output["error"]
+        output["checkpoint written"] = threading.Event()
+
+        # The simulation goes on changing the arrays while the checkpoint is written, so the output thread gets copies
+        state = {key: np.array(array, copy=True) for key, array in state.items()}
+        submit(output, write_checkpoint, path, state, output["checkpoint written"])
+    else:
+        write_checkpoint(path, state)
+
+# Write the checkpoint file; written is set when it is done
+def write_checkpoint(path, state, written=None):
+    try:
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            np.savez_compressed(file, **state)
+        os.replace(temporary_path, path)
+    finally:
+        if written is not None:
+            written.set()
+
+# Read a checkpoint written by save_checkpoint
+def load_checkpoint(path):
+    with np.load(path) as checkpoint:
+        return {key: checkpoint[key] for key in checkpoint.files}
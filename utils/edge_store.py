@@ -0,0 +1,60 @@
+import copy
+import numpy as np
+
+# Time series of the edges ("cars on edge" and "travel time" at each minute) stored in two preallocated 2-D arrays of shape (number of edges, horizon),
+# one for the number of cars and one for the travel times. Row i belongs to the i-th edge of the edges dictionary, which is also its id in the compiled graph.
+# For backwards compatibility edges[edge]["cars on edge"] and edges[edge]["travel time"] are views of the rows of these arrays,
+# so they can be read and written per minute like the lists they replace, e.g. edges[edge]["cars on edge"][time] += 1.
+# Copying the edges with copy_edges copies each array in one go instead of copying every list element.
+
+TIME_SERIES = ("cars on edge", "travel time")
+
+# Create the arrays for the given number of edges; the travel time of each edge starts at its tt_0
+def create_edge_store(tt_0, horizon, count_dtype=np.int32, travel_time_dtype=np.float64):
+    tt_0 = np.asarray(tt_0, dtype=travel_time_dtype)
+    travel_time = np.empty((len(tt_0), horizon), dtype=travel_time_dtype)
+    travel_time[:] = tt_0[:, None]
+    return {
+        "cars on edge": np.zeros((len(tt_0), horizon), dtype=count_dtype),
+        "travel time": travel_time
+    }
+
+# Make the time series of each edge a view of its row of the arrays
+def attach_edge_store(edges, edge_store):
+    for i, properties in enumerate(edges.values()):
+        for key in TIME_SERIES:
+            properties[key] = edge_store[key][i]
+
+# Give the arrays behind the time series of the edges, or None if the time series are not (all) rows of one array in the order of the edges
+def edge_store_of(edges):
+    edge_store = {}
+    for key in TIME_SERIES:
+        rows = [properties[key] for properties in edges.values()]
+        array = rows[0].base if isinstance(rows[0], np.ndarray) else None
+        if not isinstance(array, np.ndarray): # e.g. rows that were pickled (sent to another process) are not views anymore
+            return None
+        if array.ndim != 2 or len(array) != len(rows):
+            return None
+        for i, row in enumerate(rows):
+            if not isinstance(row, np.ndarray) or row.base is not array or row.ctypes.data != array[i].ctypes.data or len(row) != array.shape[1]:
+                return None
+        edge_store[key] = array
+    return edge_store
+
+# Copy the edges dictionary without the time series
+def copy_edge_properties(edges):
+    return {edge: {key: copy.deepcopy(value) for key, value in properties.items() if key not in TIME_SERIES} for edge, properties in edges.items()}
+
+# Copy the edges dictionary; the arrays of the time series are copied once and the new edges get views of the copies
+# Edges whose time series are lists (or separate arrays) are converted to an edge store while copying
+def copy_edges(edges):
+    new_edges = copy_edge_properties(edges)
+
+    edge_store = edge_store_of(edges)
+    if edge_store is not None:
+        new_edge_store = {key: array.copy() for key, array in edge_store.items()}
+    else:
+        new_edge_store = {key: np.array([properties[key] for properties in edges.values()]) for key in TIME_SERIES}
+
+    attach_edge_store(new_edges, new_edge_store)
+    return new_edges
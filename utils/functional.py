@@ -1,4 +1,5 @@
 import numpy as np
+from utils.rng import normal, choice
 
 def indicator(x, y):
     return 1 if x == y else 0
@@ -49,8 +50,8 @@ def compute_edge_probability(outgoing_edges, vehicle_counts, edges, cars, all_no
     
     return normalized_probabilities
 
-# Function to choose the next edge based on the probabilities
-def choose_next_edge(location, vehicle_counts, edges, cars, all_nodes, starting_city, ending_city):
+# Function to choose the next edge based on the probabilities (with the "route choice" stream of rng if given, see utils/rng.py)
+def choose_next_edge(location, vehicle_counts, edges, cars, all_nodes, starting_city, ending_city, rng=None):
     # Find all outgoing edges from the current location
     outgoing_edges = [edge for edge in edges if edge.startswith(f"{location} →")]
     
@@ -65,16 +66,45 @@ def choose_next_edge(location, vehicle_counts, edges, cars, all_nodes, starting_
     probabilities = compute_edge_probability(outgoing_edges, vehicle_counts, edges, cars, all_nodes, starting_city, ending_city)
     
     # Choose an edge based on the computed probabilities
-    next_edge = np.random.choice(outgoing_edges, p=probabilities)
+    if rng is not None:
+        next_edge = choice(rng, "route choice", outgoing_edges, probabilities)
+    else:
+        next_edge = np.random.choice(outgoing_edges, p=probabilities)
     return next_edge
 
-def travel_time_bpr(tt_0, N_e, C_e, alpha, beta, sigma):
+# The noise is drawn from the given stream of rng if given (see utils/rng.py), otherwise from np.random
+def travel_time_bpr(tt_0, N_e, C_e, alpha, beta, sigma, rng=None, stream="bpr noise"):
     if C_e != 0:
-        travel_time = max(0, tt_0 * (1 + alpha * (N_e / C_e) ** beta) + np.random.normal(0, sigma**2)) # The max is to avoid negative travel times
+        noise = normal(rng, stream, 0, sigma**2) if rng is not None else np.random.normal(0, sigma**2)
+        travel_time = max(0, tt_0 * (1 + alpha * (N_e / C_e) ** beta) + noise) # The max is to avoid negative travel times
         return travel_time
     else:
         return float('inf')
 
+# BPR travel time of many edges (and minutes) at once: tt_0, N_e, C_e and noise are arrays of the same shape (or broadcast to it), e.g. one entry per edge
+# The noise is drawn beforehand (see bpr_noise); edges without capacity get an infinite travel time and negative travel times are set to 0, like travel_time_bpr
+# The power of NumPy can differ from the power of a Python float in the last bit, so the results match travel_time_bpr up to rounding
+def travel_time_bpr_vectorized(tt_0, N_e, C_e, alpha, beta, noise):
+    tt_0, N_e, C_e = np.asarray(tt_0, dtype=np.float64), np.asarray(N_e, dtype=np.float64), np.asarray(C_e)
+    has_capacity = C_e != 0
+    ratio = np.divide(N_e, C_e, out=np.zeros(np.broadcast(N_e, C_e).shape), where=has_capacity)
+    travel_time = np.maximum(0, tt_0 * (1 + alpha * ratio ** beta) + noise) # The max is to avoid negative travel times
+    return np.where(has_capacity, travel_time, np.inf)
+
+# Noise of the BPR function for each edge with capacity C_e (an array with one entry per edge), for one minute or for num_minutes minutes (shape (edges, num_minutes))
+# The noise is drawn in the same order as calling travel_time_bpr for each edge, minute by minute, so the simulation results do not change; edges without capacity get no noise
+# With rng (see utils/rng.py) the noise is drawn from the given stream instead of np.random
+def bpr_noise(C_e, sigma, num_minutes=None, rng=None, stream="bpr noise"):
+    has_capacity = np.asarray(C_e) != 0
+    size = (num_minutes or 1, int(has_capacity.sum()))
+    if rng is not None:
+        draws = normal(rng, stream, 0, sigma**2, size)
+    else:
+        draws = np.random.normal(0, sigma**2, size=size)
+    noise = np.zeros((len(has_capacity), size[0]))
+    noise[has_capacity] = draws.T
+    return noise[:, 0] if num_minutes is None else noise
+
 # Calculate the base travel time tt_0(e) for each edge (so we just add tt_0 and capacity to the edge dictionary as they only have to be calculated once) and the capacity of each edge
 def add_properties_to_edges(edges, l_car, d_spacing):
     for edge, properties in edges.items():
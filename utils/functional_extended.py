@@ -1,7 +1,12 @@
 import numpy as np
 import copy
 import csv
+import heapq
+import math
 from tqdm import tqdm
+from utils.graph import compile_graph, compile_distance_matrix, node_names_of
+from utils.landmarks import landmark_heuristic
+from utils.edge_store import create_edge_store, attach_edge_store
 
 # Add neighboring nodes to each node
 def add_properties_to_nodes(nodes, edges):
@@ -13,15 +18,21 @@ def add_properties_to_nodes(nodes, edges):
         nodes[node]["neighboring nodes"] = neighboring_nodes
 
 # Adding the tt_0, capacity, number of cars on the edge at each time, and (expected) travel time at each time as properties of each edge
-def add_properties_to_edges(edges, l_car, d_spacing, num_minutes):
+# The number of cars and the travel time at each time are rows of two arrays of shape (number of edges, horizon) (see utils/edge_store.py)
+# The modified A* algorithm predicts the travel times up to the end of the trips of the last cars, which can take much longer than num_minutes in traffic,
+# so the default horizon leaves a wide margin; planning or booking a trajectory beyond the horizon raises an IndexError (see utils/modified_A_star.py)
+def add_properties_to_edges(edges, l_car, d_spacing, num_minutes, horizon=None, count_dtype=np.int32, travel_time_dtype=np.float64):
     for edge, properties in edges.items():
         length = properties["length"]
         speed_limit = properties["speed_limit"]
         tt_0 = (length / speed_limit) * (60 / 1000)  # minutes
         properties["tt_0"] = tt_0
         properties["capacity"] = int(properties["lanes"] * properties["length"] / (l_car + d_spacing))
-        properties["cars on edge"] = [0 for minute in range(num_minutes + 100000)] # list of the amount of cars occupying the edge at each time
-        properties["travel time"] = [tt_0 for minute in range(num_minutes + 100000)] # list of the (expected) travel time on the edge at each time
+
+    if horizon is None:
+        horizon = num_minutes + 100000
+    edge_store = create_edge_store([properties["tt_0"] for properties in edges.values()], horizon, count_dtype, travel_time_dtype)
+    attach_edge_store(edges, edge_store) # "cars on edge": amount of cars occupying the edge at each time, "travel time": (expected) travel time on the edge at each time
 
 # Change the capacity of each edge if the total number of cars in the simulation is reduced
 def change_capacity(edges, reduction_factor):
@@ -105,110 +116,145 @@ def print_cars(cars, range):
 
 
 # Using A*-algorithm to determine the optimal path for a car
-## One iteration of A*
-def iterate_A_star(current_route, current_queue, nodes, edges, time, heuristic_constant, distance_matrix, destination):
-    current_path = current_route["path"]
-    current_travel_time = current_route["travel time"]
-    last_node_of_path = current_path[-1]
-    updated_queue = current_queue
-
-    # # Printing the iteration
-    # print("=" * 40)
-    # print(f"Iterating A* on {last_node_of_path}")
-    # print(f"{'Path:':<25} {current_path}")
-    # print(f"{'Travel time:':<25} {current_travel_time}")
-
-    # For each neighbor of the last node of the route, make a new route which is the old route plus this neighbor
-    neighboring_nodes = nodes[last_node_of_path]["neighboring nodes"] # list of the neighboring nodes of the last node of the route that is currently checked
-
-    for neighbor in neighboring_nodes:
-        new_path = current_path + [neighbor]
-        next_edge = last_node_of_path + " → " + neighbor
-
-        # Increase the cost due to travel time whenever the edge is full (so that the car would have to wait)
-        if edges[next_edge]['cars on edge'][time] >= edges[next_edge]['capacity'] - 2:
-            new_travel_time = current_travel_time + edges[next_edge]['travel time'][time] + 1000
-        else:
-            new_travel_time = current_travel_time + edges[next_edge]["travel time"][time]
-        
-        new_heuristic = heuristic_constant * distance_matrix[neighbor + " → " + destination]
-        new_total_cost = new_travel_time + new_heuristic
-
-        new_route = {
-            "path": new_path, 
-            "travel time": new_travel_time, 
-            "heuristic": new_heuristic, 
-            "total cost": new_total_cost
-            }
-
-        # # Printing the new route found
-        # print("-" * 40)
-        # print(f"Extended route from {new_path[-2]} to its neighbor {new_path[-1]}")
-        # print(f"{'New path:':<25} {new_route['path']}")
-        # print(f"{'New travel time:':<25} {new_route['travel time']}")
-        # print(f"{'New heuristic:':<25} {new_route['heuristic']}")
-        # print(f"{'New total cost:':<25} {new_route['total cost']}")
-
-        updated_queue.append(new_route)
-    
-    # Remove the current route from the queue
-    updated_queue.remove(current_route)
-
-    # Sort the queue by total cost (lowest cost first)
-    updated_queue = sorted(updated_queue, key=lambda x: x["total cost"])
-
-    # Remove routes with higher cost going to the same neighbor
-    unique_queue = []
-    seen_nodes = set()  # To track nodes that we've already added the lowest cost route for
-
-    for route in updated_queue:
-        last_node = route["path"][-1]
-        if last_node not in seen_nodes:
-            unique_queue.append(route)  # Keep only the lowest-cost route to each node
-            seen_nodes.add(last_node)
-
-    # print("-" * 40)
-    # print("-" * 40)
-    # print(f"New queue")
-    # for route in unique_queue:
-    #     print(f"{'Path:':<25} {route['path']}")
-    #     print(f"{'Travel time:':<25} {route['travel time']}")
-    #     print(f"{'Heuristic:':<25} {route['heuristic']}")
-    #     print(f"{'Total cost:':<25} {route['total cost']} \n")
-    # print("=" * 40)
-
-    return unique_queue
-
-## Iterating A* until the destination is reached
-def determine_optimal_route(car, nodes, edges, time, heuristic_constant, distance_matrix):
-    origin = car["origin"]
-    destination = car["destination"]
-    queue = []  # List of routes checked by the algorithm. Each route is a dictionary with keys:
-                # "path" (list of nodes traversed), "travel time", "heuristic" (heuristic estimate),
-                # and "total cost" (sum of travel time and heuristic)
-
-    # Initialize the starting route from the origin
-    queue.append({
-        "path": [origin], 
-        "travel time": 0, 
-        "heuristic": heuristic_constant * distance_matrix.get(origin + " → " + destination, float('inf')), 
-        "total cost": heuristic_constant * distance_matrix.get(origin + " → " + destination, float('inf'))
-    })
+# The algorithm works on the compiled graph (see utils/graph.py): nodes and edges are integer ids, the cost of each edge and the heuristic of each node are arrays
+
+## Cost of each edge used by A* at a certain time: the (expected) travel time of the edge, increased whenever the edge is full (so that the car would have to wait)
+def a_star_edge_costs(graph, cars_on_edge, travel_time):
+    return travel_time + 1000 * (cars_on_edge >= graph["capacity"] - 2)
+
+## A* on node ids, returns the optimal path as a list of node ids and its travel time
+## The queue is a binary heap of (total cost, insertion number, node); every node keeps the best travel time found so far and the node it was reached from,
+## and a node is closed once it has been taken from the queue, so the path is only reconstructed once the destination is reached
+def find_optimal_route(graph, origin, destination, edge_costs, heuristic):
+    adjacency = graph["adjacency"]
+    num_nodes = len(adjacency)
+    best_travel_time = [math.inf] * num_nodes # lowest travel time found so far from the origin to each node
+    predecessor = [-1] * num_nodes # node before each node on the best path found so far
+    closed = [False] * num_nodes # nodes whose lowest travel time is final
+
+    # Initialize the queue with the origin
+    best_travel_time[origin] = 0
+    queue = [(heuristic[origin], 0, origin)]
+    num_pushed = 1 # insertion number, so that routes with the same total cost are checked in the order they were found
 
     # Run A* algorithm until queue is empty or destination is reached
     while queue:
-        # Check if the current route reaches the destination
-        if queue[0]["path"][-1] == destination:
-            optimal_path = queue[0]["path"]
-            optimal_travel_time = queue[0]["travel time"]
-            return optimal_path, optimal_travel_time
-
-        # Iterate through the A* algorithm on the current route
-        queue = iterate_A_star(queue[0], queue, nodes, edges, time, heuristic_constant, distance_matrix, destination)
+        _, _, node = heapq.heappop(queue)
+        if closed[node]:
+            continue
+
+        # Check if the destination is reached; if so, follow the predecessors back to the origin
+        if node == destination:
+            optimal_path = [node]
+            while optimal_path[-1] != origin:
+                optimal_path.append(predecessor[optimal_path[-1]])
+            optimal_path.reverse()
+            return optimal_path, float(best_travel_time[node])
+
+        closed[node] = True
+        travel_time = best_travel_time[node]
+
+        # For each neighbor of the node, check if going through this node is faster than the best route found to the neighbor so far
+        for neighbor, edge in adjacency[node]:
+            if closed[neighbor]:
+                continue
+            new_travel_time = travel_time + edge_costs[edge]
+            if new_travel_time < best_travel_time[neighbor]:
+                best_travel_time[neighbor] = new_travel_time
+                predecessor[neighbor] = node
+                heapq.heappush(queue, (new_travel_time + heuristic[neighbor], num_pushed, neighbor))
+                num_pushed += 1
 
     # If the queue is empty, no path to the destination was found
     return None, None
 
+## Shortest path tree towards a destination: Dijkstra's algorithm run backwards from the destination over the incoming edges of each node
+## Returns the lowest travel time from each node to the destination and the next node on the shortest path from each node (-1 if the destination cannot be reached),
+## so that the optimal path of every car going to this destination follows from the successors without another search
+## The paths are the exact shortest paths, also when the heuristic of A* overestimates the travel time (as heuristic_constant * distance_matrix can), so they can differ
+## from the routes of A*; they are the same when the heuristic never overestimates (e.g. the landmark heuristic), up to routes with the same travel time
+def shortest_path_tree(graph, destination, edge_costs):
+    reverse_adjacency = graph["reverse adjacency"]
+    num_nodes = len(reverse_adjacency)
+    travel_time_to_destination = [math.inf] * num_nodes # lowest travel time found so far from each node to the destination
+    successor = [-1] * num_nodes # node after each node on the best path found so far
+    closed = [False] * num_nodes # nodes whose lowest travel time is final
+
+    # Initialize the queue with the destination
+    travel_time_to_destination[destination] = 0
+    queue = [(0, destination)]
+
+    # Run Dijkstra's algorithm until the queue is empty
+    while queue:
+        travel_time, node = heapq.heappop(queue)
+        if closed[node]:
+            continue
+        closed[node] = True
+
+        # For each node with an edge to this node, check if going through this node is faster than the best route found from that node so far
+        for predecessor, edge in reverse_adjacency[node]:
+            if closed[predecessor]:
+                continue
+            new_travel_time = travel_time + edge_costs[edge]
+            if new_travel_time < travel_time_to_destination[predecessor]:
+                travel_time_to_destination[predecessor] = new_travel_time
+                successor[predecessor] = node
+                heapq.heappush(queue, (new_travel_time, predecessor))
+
+    return travel_time_to_destination, successor
+
+## The longest travel time at free flow (tt_0 on every edge) of a trip from one of the origins to one of the destinations (arrays of node ids, all nodes if None),
+## or with origins and destinations of the same length, of the trips origins[i] → destinations[i]; trips that cannot be made are left out
+def longest_free_flow_trip(graph, origins=None, destinations=None):
+    num_nodes = len(graph["adjacency"])
+    if destinations is None:
+        destinations = np.arange(num_nodes)
+    longest_trip = 0
+    for destination in np.unique(destinations).tolist():
+        travel_time_to_destination = np.array(shortest_path_tree(graph, destination, graph["tt_0"].tolist())[0])
+        if origins is None:
+            trips = travel_time_to_destination
+        else:
+            trips = travel_time_to_destination[np.unique(origins[destinations == destination])]
+        trips = trips[np.isfinite(trips)]
+        if len(trips) > 0:
+            longest_trip = max(longest_trip, float(trips.max()))
+    return longest_trip
+
+## Follow the successors of the shortest path tree from the origin to the destination; returns the optimal path as a list of node ids and its travel time,
+## the travel time is summed from the origin onwards, the same way as in find_optimal_route
+def route_from_tree(graph, successor, origin, destination, edge_costs):
+    if origin != destination and successor[origin] == -1:
+        return None, None
+    edge_lookup = graph["edge lookup"]
+    optimal_path = [origin]
+    optimal_travel_time = 0
+    while optimal_path[-1] != destination:
+        next_node = successor[optimal_path[-1]]
+        optimal_travel_time += edge_costs[edge_lookup[(optimal_path[-1], next_node)]]
+        optimal_path.append(next_node)
+    return optimal_path, float(optimal_travel_time)
+
+## Determine the optimal path (list of node names) and its travel time for a car using the nodes and edges dictionaries
+## With landmarks (see utils/landmarks.py) the landmark heuristic is used instead of heuristic_constant * distance_matrix
+def determine_optimal_route(car, nodes, edges, time, heuristic_constant, distance_matrix, graph=None, distances=None, landmarks=None):
+    if graph is None:
+        graph = compile_graph(nodes, edges)
+    if distances is None:
+        distances = compile_distance_matrix(graph, distance_matrix)
+
+    origin = graph["node ids"][car["origin"]]
+    destination = graph["node ids"][car["destination"]]
+    cars_on_edge = np.array([edges[edge]["cars on edge"][time] for edge in graph["edge names"]])
+    travel_time = np.array([edges[edge]["travel time"][time] for edge in graph["edge names"]])
+    heuristic = landmark_heuristic(landmarks, destination) if landmarks is not None else (heuristic_constant * distances[:, destination]).tolist()
+
+    optimal_path, optimal_travel_time = find_optimal_route(graph, origin, destination, a_star_edge_costs(graph, cars_on_edge, travel_time).tolist(), heuristic)
+
+    if optimal_path is None:
+        return None, None
+    return node_names_of(graph, optimal_path), optimal_travel_time
+
 # Find the node after a certain node in the trajectory
 def find_next_node(node_list, target_node):
     for i in range(len(node_list) - 1):
@@ -232,14 +278,17 @@ def switch_x_y(nodes):
 
     return new_nodes
 # Saving the simulation results to a CSV file
-def save_simulation_results(cars, nodes, edges, distance_matrix, heuristic_constant, filename="simulation_results.csv"):
+def save_simulation_results(cars, nodes, edges, distance_matrix, heuristic_constant, filename="simulation_results.csv", graph=None):
     # Prepare data for each car
     car_data = []
 
+    if graph is None:
+        graph = compile_graph(nodes, edges)
+    distances = compile_distance_matrix(graph, distance_matrix)
+
     # Optimal path and travel time if the system were empty
-    # Temporarily set all edges' travel times to their minimum (tt_0) values
-    empty_edges = {edge: {**properties, "travel time": [properties["tt_0"]] * len(properties["travel time"])}
-                       for edge, properties in edges.items()}
+    # All edges' travel times are set to their minimum (tt_0) values
+    cars_on_edge = [edges[edge]["cars on edge"] for edge in graph["edge names"]]
     
     # Cache for storing computed optimal paths and travel times for each unique (origin, destination)
     optimal_path_cache = {}
@@ -256,9 +305,12 @@ def save_simulation_results(cars, nodes, edges, distance_matrix, heuristic_const
             optimal_path_empty, optimal_travel_time_empty = optimal_path_cache[(origin, destination)]
         else:
             # Compute the optimal path and travel time if the system were empty
-            optimal_path_empty, optimal_travel_time_empty = determine_optimal_route(
-                car, nodes, empty_edges, car["time spawned"], heuristic_constant, distance_matrix
-            )
+            cars_on_edge_now = np.array([cars_on_edge[edge][car["time spawned"]] for edge in range(len(cars_on_edge))])
+            edge_costs = a_star_edge_costs(graph, cars_on_edge_now, graph["tt_0"])
+            destination_id = graph["node ids"][destination]
+            optimal_path_empty, optimal_travel_time_empty = find_optimal_route(graph, graph["node ids"][origin], destination_id, edge_costs.tolist(), (heuristic_constant * distances[:, destination_id]).tolist())
+            if optimal_path_empty is not None:
+                optimal_path_empty = node_names_of(graph, optimal_path_empty)
             
             # Cache the result for this (origin, destination) pair
             optimal_path_cache[(origin, destination)] = (optimal_path_empty, optimal_travel_time_empty)
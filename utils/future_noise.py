@@ -0,0 +1,48 @@
+import numpy as np
+from utils.rng import keyed_standard_normal
+
+# Fixed noise of the predicted travel times of the modified A* algorithm: the noise of the BPR function is drawn once for each (edge, minute),
+# instead of again every time a car is booked on the edge. Booking a car then changes the predicted travel times only through the number of cars,
+# so bookings can only make the predicted travel times higher.
+# The noise is drawn per block of block_size minutes of an edge, when the block is first needed. With rng (see utils/rng.py) the block is drawn with
+# keyed_standard_normal from the "future edge noise" stream with the key (edge, block), so it does not depend on the order the blocks are needed in;
+# without rng it is drawn from np.random. The reservation table (see utils/reservations.py) keeps its noise in the same way.
+
+# Create the fixed noise, without any blocks drawn yet
+def create_future_noise(sigma, rng=None, block_size=1024):
+    return {
+        "sigma": sigma,
+        "rng": rng,
+        "block size": block_size,
+        "noise": {} # (edge, block of minutes) → noise of the BPR function at each minute of the block
+    }
+
+# The noise of an edge at each minute of a block
+def noise_block(noise, edge, block):
+    if (edge, block) not in noise["noise"]:
+        if noise["rng"] is not None:
+            standard_normal = keyed_standard_normal(noise["rng"], "future edge noise", (edge, block), noise["block size"])
+        else:
+            standard_normal = np.random.standard_normal(noise["block size"])
+        noise["noise"][(edge, block)] = (noise["sigma"]**2 * standard_normal).tolist()
+    return noise["noise"][(edge, block)]
+
+# The noise of an edge at a minute
+def noise_at(noise, edge, minute):
+    block, offset = divmod(minute, noise["block size"])
+    return noise_block(noise, edge, block)[offset]
+
+# The noise of an edge from minute start up to (but not including) minute end, as an array
+def noise_slice(noise, edge, start, end):
+    block_size = noise["block size"]
+    values = []
+    for block in range(start // block_size, (end - 1) // block_size + 1):
+        block_start = block * block_size
+        values += noise_block(noise, edge, block)[max(start - block_start, 0):end - block_start]
+    return np.array(values)
+
+# Forget the blocks of minutes that have passed at the given minute
+def discard_noise(noise, time):
+    block_size = noise["block size"]
+    for key in [key for key in noise["noise"] if (key[1] + 1) * block_size <= time]:
+        del noise["noise"][key]
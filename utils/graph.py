@@ -0,0 +1,92 @@
+import numpy as np
+
+# Compiled version of the road network: nodes and edges get an integer id (their position in the nodes and edges dictionaries)
+# and all edge properties are stored in NumPy arrays indexed by edge id.
+# The outgoing edges of each node are stored in CSR form: the outgoing edges of node n are
+# graph["out edges"][graph["indptr"][n]:graph["indptr"][n + 1]], leading to graph["neighbors"][graph["indptr"][n]:graph["indptr"][n + 1]].
+# The outgoing edges of a node are in the same order as the "neighboring nodes" of the node (the order of the edges dictionary).
+# The incoming edges of each node are stored in the same way ("in indptr", "in edges", "predecessors"), for searches that run backwards from a destination.
+# Node and edge names are only needed to translate from and to the dictionaries, e.g. when reading the model or saving the results.
+
+# Compile the nodes and edges dictionaries (after add_properties_to_edges) to a graph with integer ids
+def compile_graph(nodes, edges):
+    node_names = list(nodes)
+    edge_names = list(edges)
+    node_ids = {node: i for i, node in enumerate(node_names)}
+    edge_ids = {edge: i for i, edge in enumerate(edge_names)}
+    num_nodes = len(node_names)
+
+    source = np.array([node_ids[edge.split(" → ")[0]] for edge in edge_names], dtype=np.int32)
+    target = np.array([node_ids[edge.split(" → ")[1]] for edge in edge_names], dtype=np.int32)
+
+    # Outgoing edges of each node (CSR)
+    out_edges = np.argsort(source, kind="stable").astype(np.int32)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(source, minlength=num_nodes))
+
+    # Incoming edges of each node (CSR)
+    in_edges = np.argsort(target, kind="stable").astype(np.int32)
+    in_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    in_indptr[1:] = np.cumsum(np.bincount(target, minlength=num_nodes))
+
+    graph = {
+        "node names": node_names,
+        "edge names": edge_names,
+        "node ids": node_ids,
+        "edge ids": edge_ids,
+        "edge lookup": {(int(source[edge]), int(target[edge])): edge for edge in range(len(edge_names))}, # (from node id, to node id) → edge id
+        "edge source": source,
+        "edge target": target,
+        "indptr": indptr,
+        "out edges": out_edges,
+        "neighbors": target[out_edges],
+        "adjacency": adjacency_lists(indptr, out_edges, target), # (neighbor, edge) pairs of each node, for the routing loops
+        "in indptr": in_indptr,
+        "in edges": in_edges,
+        "predecessors": source[in_edges],
+        "reverse adjacency": adjacency_lists(in_indptr, in_edges, source), # (predecessor, edge) pairs of each node
+        "length": np.array([edges[edge]["length"] for edge in edge_names], dtype=np.float64),
+        "lanes": np.array([edges[edge]["lanes"] for edge in edge_names], dtype=np.int32),
+        "tt_0": np.array([edges[edge].get("tt_0", np.nan) for edge in edge_names], dtype=np.float64),
+        "capacity": np.array([edges[edge].get("capacity", 0) for edge in edge_names], dtype=np.int64)
+    }
+
+    return graph
+
+# Lists of (node at the other end, edge) pairs of each node from the CSR arrays, e.g. (neighbor, edge) pairs from indptr, out edges and edge target
+def adjacency_lists(indptr, csr_edges, other_end):
+    return [list(zip(other_end[csr_edges[indptr[node]:indptr[node + 1]]].tolist(), csr_edges[indptr[node]:indptr[node + 1]].tolist())) for node in range(len(indptr) - 1)]
+
+# The nodes of the road network in the order they first appear in the edges dictionary (for when only the edges are known)
+def nodes_of_edges(edges):
+    nodes = {}
+    for edge in edges:
+        for node in edge.split(" → "):
+            nodes[node] = None
+    return nodes
+
+# Convert the distance matrix of the form {"A → B": distance} to an array where entry [a, b] is the distance from node id a to node id b
+def compile_distance_matrix(graph, distance_matrix):
+    node_names = graph["node names"]
+    num_nodes = len(node_names)
+    distances = np.full((num_nodes, num_nodes), np.inf)
+    for a in range(num_nodes):
+        for b in range(num_nodes):
+            distances[a, b] = distance_matrix.get(node_names[a] + " → " + node_names[b], np.inf)
+    return distances
+
+# Convert a path of node names to a route of edge ids
+def route_from_path(graph, path):
+    edge_lookup = graph["edge lookup"]
+    node_ids = graph["node ids"]
+    return np.array([edge_lookup[(node_ids[path[i]], node_ids[path[i + 1]])] for i in range(len(path) - 1)], dtype=np.int32)
+
+# Convert a path of node ids to a route of edge ids
+def route_from_node_ids(graph, path):
+    edge_lookup = graph["edge lookup"]
+    return np.array([edge_lookup[(path[i], path[i + 1])] for i in range(len(path) - 1)], dtype=np.int32)
+
+# Convert a list of node ids to a list of node names
+def node_names_of(graph, node_ids):
+    node_names = graph["node names"]
+    return [node_names[node] for node in node_ids]
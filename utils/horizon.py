@@ -0,0 +1,78 @@
+import numpy as np
+from utils.edge_store import create_edge_store, TIME_SERIES
+from utils.functional_extended import longest_free_flow_trip
+
+# Sliding window over the future minutes of the edges for the modified A* algorithm: A* only reads the minutes from the current minute up to
+# the end of the longest trip, so instead of keeping every minute of the run, the window keeps length minutes in a ring buffer.
+# Minute t is stored in slot t % length of the arrays of an edge store (see utils/edge_store.py). When the simulation moves on,
+# the slots of the minutes that have passed are reset (0 cars, travel time tt_0) and reused for the minutes at the far end of the window,
+# so the memory does not depend on the length of the run.
+# Reading or writing a minute outside the window (beyond its far end, or a minute that has passed) raises the same IndexError, as the window does not know
+# the cars at those minutes. check_horizon_length checks before the run that every trip fits in the window at free flow; trips take longer in traffic,
+# so the window needs room on top of that.
+
+# Create a window of length minutes starting at minute 0
+def create_horizon(tt_0, length, count_dtype=np.int32, travel_time_dtype=np.float64):
+    horizon = create_edge_store(tt_0, length, count_dtype, travel_time_dtype)
+    horizon["tt_0"] = np.asarray(tt_0, dtype=travel_time_dtype)
+    horizon["length"] = length
+    horizon["start"] = 0 # first minute in the window
+    return horizon
+
+# Move the start of the window to the given minute, resetting the slots of the minutes that have passed
+def advance_horizon(horizon, time):
+    passed = np.arange(horizon["start"], min(time, horizon["start"] + horizon["length"])) % horizon["length"]
+    horizon["cars on edge"][:, passed] = 0
+    horizon["travel time"][:, passed] = horizon["tt_0"][:, None]
+    horizon["start"] = max(horizon["start"], time)
+
+# Raise a ValueError if length minutes are not more than the longest trip of the cars (origin and destination arrays of node ids) at free flow
+# The trips take longer in traffic, so the horizon needs some room on top of this
+def check_horizon_length(graph, origins, destinations, length):
+    longest_trip = longest_free_flow_trip(graph, origins, destinations)
+    if length <= longest_trip:
+        raise ValueError(f"The future horizon of {length} minutes is not longer than the longest trip at free flow ({longest_trip:.1f} minutes)")
+
+# The slot ranges (at most two, as the window wraps around the end of the arrays) of the minutes from start up to (but not including) end
+def horizon_slots(horizon, start, end):
+    length = horizon["length"]
+    if start < horizon["start"] or end > horizon["start"] + length:
+        raise IndexError(f"Minutes {start} to {end} are outside the future horizon (minutes {horizon['start']} to {horizon['start'] + length}); use a longer future horizon")
+    if end <= start:
+        return []
+    first_slot = start % length
+    if first_slot + (end - start) <= length:
+        return [(first_slot, first_slot + (end - start))]
+    return [(first_slot, length), (0, end - start - (length - first_slot))]
+
+# One time series ("cars on edge" or "travel time") of one edge in the window, indexed by minute (or a slice of minutes) like the rows of the edge store
+class HorizonRow:
+    def __init__(self, horizon, key, edge):
+        self.horizon = horizon
+        self.key = key
+        self.edge = edge
+
+    def __getitem__(self, minute):
+        array = self.horizon[self.key]
+        if isinstance(minute, slice):
+            return np.concatenate([array[self.edge, start:end] for start, end in horizon_slots(self.horizon, minute.start, minute.stop)] or [array[self.edge, :0]])
+        slot = horizon_slots(self.horizon, minute, minute + 1)[0][0]
+        return array[self.edge, slot]
+
+    def __setitem__(self, minute, value):
+        array = self.horizon[self.key]
+        if isinstance(minute, slice):
+            value = np.broadcast_to(value, (minute.stop - minute.start,))
+            filled = 0
+            for start, end in horizon_slots(self.horizon, minute.start, minute.stop):
+                array[self.edge, start:end] = value[filled:filled + end - start]
+                filled += end - start
+        else:
+            slot = horizon_slots(self.horizon, minute, minute + 1)[0][0]
+            array[self.edge, slot] = value
+
+# Make the time series of each edge a window row, like attach_edge_store does with the rows of an edge store
+def attach_horizon(edges, horizon):
+    for edge, properties in enumerate(edges.values()):
+        for key in TIME_SERIES:
+            properties[key] = HorizonRow(horizon, key, edge)
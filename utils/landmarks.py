@@ -0,0 +1,69 @@
+import heapq
+import math
+import numpy as np
+
+# Landmark (ALT) heuristic for the A* algorithms, as an alternative to heuristic_constant * distance_matrix (a distance in degrees, not in minutes).
+# For a few landmark nodes the free-flow travel time (tt_0) from the landmark to every node and from every node to the landmark is calculated once.
+# By the triangle inequality, for every landmark L the travel time from node v to destination t is at least
+#   tt(L, t) - tt(L, v)   and   tt(v, L) - tt(t, L),
+# and the heuristic of v is the largest of these lower bounds over all landmarks (in minutes).
+# The travel times used by the simulations are at least tt_0 (apart from the noise of the BPR function), so the heuristic does not overestimate the travel time.
+
+# Free-flow travel times from a node to every node (reverse=False) or from every node to a node (reverse=True), using Dijkstra's algorithm on tt_0
+def free_flow_travel_times(graph, node, reverse=False):
+    adjacency = graph["reverse adjacency"] if reverse else graph["adjacency"]
+    tt_0 = graph["tt_0"].tolist()
+    num_nodes = len(adjacency)
+    travel_times = [math.inf] * num_nodes
+    closed = [False] * num_nodes
+
+    travel_times[node] = 0
+    queue = [(0, node)]
+    while queue:
+        travel_time, current_node = heapq.heappop(queue)
+        if closed[current_node]:
+            continue
+        closed[current_node] = True
+        for neighbor, edge in adjacency[current_node]:
+            new_travel_time = travel_time + tt_0[edge]
+            if new_travel_time < travel_times[neighbor]:
+                travel_times[neighbor] = new_travel_time
+                heapq.heappush(queue, (new_travel_time, neighbor))
+
+    return np.array(travel_times)
+
+# Choose the landmarks and calculate the free-flow travel times from and to each landmark
+# The landmarks are chosen one by one as the node that is furthest (travel time there and back) from the landmarks chosen so far, starting from the given node
+def compute_landmarks(graph, num_landmarks=4, start_node=0):
+    num_nodes = len(graph["node names"])
+    num_landmarks = min(num_landmarks, num_nodes)
+    landmarks = []
+    from_landmark = np.zeros((num_landmarks, num_nodes)) # [l, v] is the free-flow travel time from landmark l to node v
+    to_landmark = np.zeros((num_landmarks, num_nodes)) # [l, v] is the free-flow travel time from node v to landmark l
+
+    # Distance of each node to the closest landmark so far (unreachable nodes are never chosen)
+    round_trip = free_flow_travel_times(graph, start_node) + free_flow_travel_times(graph, start_node, reverse=True)
+    closest = np.where(np.isinf(round_trip), -1, round_trip)
+
+    for l in range(num_landmarks):
+        landmark = int(np.argmax(closest))
+        landmarks.append(landmark)
+        from_landmark[l] = free_flow_travel_times(graph, landmark)
+        to_landmark[l] = free_flow_travel_times(graph, landmark, reverse=True)
+
+        round_trip = from_landmark[l] + to_landmark[l]
+        closest = np.minimum(closest, np.where(np.isinf(round_trip), -1, round_trip))
+
+    return {"landmarks": landmarks, "from landmark": from_landmark, "to landmark": to_landmark}
+
+# The landmark heuristic of each node for the given destination, as a list indexed by node id (like heuristic_constant * distances[:, destination])
+def landmark_heuristic(landmarks, destination):
+    from_landmark = landmarks["from landmark"]
+    to_landmark = landmarks["to landmark"]
+
+    with np.errstate(invalid="ignore"):
+        lower_bounds = np.concatenate([from_landmark[:, [destination]] - from_landmark, to_landmark - to_landmark[:, [destination]]])
+
+    # Lower bounds that involve an unreachable node say nothing about the travel time
+    lower_bounds = np.where(np.isnan(lower_bounds) | np.isinf(lower_bounds), 0, lower_bounds)
+    return np.maximum(lower_bounds.max(axis=0), 0).tolist()
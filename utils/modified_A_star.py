@@ -1,84 +1,161 @@
-import numpy as np
-from utils.functional import travel_time_bpr
-
-# Run modified A* algorithm
-def run_A_mod(nodes, edges, car, heuristic_constant, distance_matrix, num_minutes):
-
-    # Initialize the queue of checked routes
-    queue = [{
-        "trajectory": [(car["origin"], car["time spawned"])],
-        "travel time": 0,
-        "heuristic": heuristic_constant * distance_matrix.get(car["origin"] + " → " + car["destination"], float('inf')),
-        "total cost": heuristic_constant * distance_matrix.get(car["origin"] + " → " + car["destination"], float('inf'))
-    }]
+import heapq
+import math
+from utils.functional import travel_time_bpr_vectorized, bpr_noise
+from utils.graph import compile_graph, compile_distance_matrix, nodes_of_edges
+from utils.landmarks import landmark_heuristic
+from utils.reservations import reserve_trajectory, reserved_travel_times
+from utils.future_noise import noise_slice
+
+# The modified A* algorithm works on the compiled graph (see utils/graph.py): nodes and edges are integer ids,
+# travel_time[edge][t] is the (expected) travel time of an edge at time t and the heuristic of each node is an array.
+# A trajectory is a list of the form [(first node on path, time entered edge after node), (second node on path, time entered edge after node), ...]
+# The predicted travel times only cover a limited number of minutes (the horizon of the edge store, the future horizon or the window of the reservation table).
+# Planning or booking a trajectory that reaches beyond them raises an IndexError that says which minute was needed, instead of failing partway with a bare index error
+# or silently booking only part of the trajectory.
+
+# The error raised when a trajectory reaches a minute that the predicted travel times do not cover
+def beyond_horizon(minute):
+    return IndexError(f"The trajectory reaches minute {minute}, beyond the minutes covered by the predicted travel times; use a longer horizon (the horizon of add_properties_to_edges or the future horizon)")
+
+# Run modified A* algorithm on the nodes and edges dictionaries; returns the trajectory with node names
+# With landmarks (see utils/landmarks.py) the landmark heuristic is used instead of heuristic_constant * distance_matrix
+# With a reservation table (see utils/reservations.py) the predicted travel times of the reservation table are used instead of those of the edges
+def run_A_mod(nodes, edges, car, heuristic_constant, distance_matrix, num_minutes, graph=None, distances=None, landmarks=None, reservations=None):
+    if graph is None:
+        graph = compile_graph(nodes, edges)
+    if distances is None:
+        distances = compile_distance_matrix(graph, distance_matrix)
+
+    origin = graph["node ids"][car["origin"]]
+    destination = graph["node ids"][car["destination"]]
+    if reservations is not None:
+        travel_time = reserved_travel_times(reservations)
+    else:
+        travel_time = [edges[edge]["travel time"] for edge in graph["edge names"]]
+
+    heuristic = landmark_heuristic(landmarks, destination) if landmarks is not None else (heuristic_constant * distances[:, destination]).tolist()
+
+    trajectory = find_optimal_trajectory(graph, origin, destination, car["time spawned"], travel_time, heuristic)
+
+    if trajectory is None:
+        return None
+    node_names = graph["node names"]
+    return [(node_names[node], time) for node, time in trajectory]
+
+# Run modified A* algorithm on node and edge ids; returns the trajectory with node ids
+# The travel time of an edge depends on the time the car enters it: travel_time[edge][t] with t the (rounded) minute the car reaches the start of the edge.
+# The queue is a binary heap of (total cost, insertion number, node). Every node keeps the earliest arrival found so far (as travel time since spawning) and
+# the node it was reached from, and a node is closed once it has been taken from the queue. Closing a node at its earliest arrival is exact as long as
+# arriving at an edge later never means leaving it earlier (FIFO), which holds for the BPR travel times up to their noise.
+# So the trajectories are not guaranteed to be the same as those of the earlier search over lists of partial routes: they can differ when the noise
+# breaks FIFO, when the heuristic overestimates the travel time, or when two routes have the same total cost.
+def find_optimal_trajectory(graph, origin, destination, time_spawned, travel_time, heuristic):
+    adjacency = graph["adjacency"]
+    num_nodes = len(adjacency)
+    best_travel_time = [math.inf] * num_nodes # earliest arrival at each node found so far, as travel time since the car spawned
+    predecessor = [-1] * num_nodes # node before each node on the best trajectory found so far
+    closed = [False] * num_nodes # nodes whose earliest arrival is final
+
+    # Initialize the queue with the origin
+    best_travel_time[origin] = 0
+    queue = [(heuristic[origin], 0, origin)]
+    num_pushed = 1 # insertion number, so that routes with the same total cost are checked in the order they were found
 
     # Run modified A* algorithm until queue is empty or destination is reached
     while queue:
-
-        # Check if the current route reaches the destination
-        if queue[0]["trajectory"][-1][0] == car["destination"]:
-            # If so, return this optimal trajectory
-            optimal_trajectory = queue[0]["trajectory"]
+        _, _, node = heapq.heappop(queue)
+        if closed[node]:
+            continue
+
+        # Check if the destination is reached; if so, follow the predecessors back to the origin and add the time the car reaches each node
+        if node == destination:
+            path = [node]
+            while path[-1] != origin:
+                path.append(predecessor[path[-1]])
+            path.reverse()
+            optimal_trajectory = [(origin, time_spawned)] + [(node, time_spawned + best_travel_time[node]) for node in path[1:]]
             return optimal_trajectory
-        else:
-            # If not,iterate the modified A* algorithm
-            queue = iterate_A_mod(queue, nodes, edges, car, heuristic_constant, distance_matrix, num_minutes)
+
+        closed[node] = True
+        route_travel_time = best_travel_time[node]
+        minute = round(time_spawned + route_travel_time) # the minute the car enters the next edge
+
+        # For each neighbor, the new travel time is the travel time to this node plus the travel time of the edge at the minute the car enters it
+        try:
+            for neighbor, edge in adjacency[node]:
+                if closed[neighbor]:
+                    continue
+                new_travel_time = route_travel_time + travel_time[edge][minute]
+                if new_travel_time < best_travel_time[neighbor]:
+                    best_travel_time[neighbor] = new_travel_time
+                    predecessor[neighbor] = node
+                    heapq.heappush(queue, (new_travel_time + heuristic[neighbor], num_pushed, neighbor))
+                    num_pushed += 1
+        except IndexError as error:
+            raise beyond_horizon(minute) from error
 
     # If the queue is empty, no path to the destination was found
     return None
 
-# Iterate the modified A* algorithm
-def iterate_A_mod(current_queue, nodes, edges, car, heuristic_constant, distance_matrix, num_minutes):
-
-    best_route = current_queue[0] # the route with the lowest total cost so far
-    travel_time = best_route["travel time"] # the travel time of this route
-    last_node_of_path = best_route["trajectory"][-1][0] # the last node of this route
-    neighboring_nodes = nodes[last_node_of_path]["neighboring nodes"] # list of the neighboring nodes of the last node of this route
-
-    # For each neighbor of the last node of the route, make a new route which is the old route plus this neighbor
-    for neighbor in neighboring_nodes:
-
-        new_travel_time = travel_time + edges[last_node_of_path + " → " + neighbor]["travel time"][round(car["time spawned"] + travel_time)] # the new travel time is the old travel time plus the travel time of the new edge at time t = (time the car is spawned) + (time it took the car to get to the last node of the route)
-        new_trajectory = best_route["trajectory"] + [(neighbor, car["time spawned"] + new_travel_time)] # the new trajectory
-        new_heuristic = heuristic_constant * distance_matrix.get(neighbor + " → " + car["destination"], float('inf')) # the heuristic is proportional to the distance from the neighbor to the destination
-        new_total_cost = new_heuristic + new_travel_time # the total cost is the travel time plus the heuristic
-
-        new_route = {
-            "trajectory": new_trajectory,
-            "travel time": new_travel_time,
-            "heuristic": new_heuristic,
-            "total cost": new_total_cost
-        }
-
-        # Add the new route to the queue
-        current_queue.append(new_route)
-    
-    # Remove the route with the lowest total cost from the queue
-    current_queue.pop(0)
-
-    # Sort the queue by total cost
-    current_queue.sort(key=lambda x: x["total cost"])
-
-    # Remove routes with higher total cost going to the same node
-    seen_nodes = set()
-    for route in current_queue:
-        if route["trajectory"][-1][0] in seen_nodes:
-            current_queue.remove(route)
-        else:
-            seen_nodes.add(route["trajectory"][-1][0])
-
-    return current_queue
+# The trajectory (with node ids) along the same nodes, timed with the given travel times the way find_optimal_trajectory times it
+def retime_trajectory(graph, travel_time, trajectory):
+    edge_lookup = graph["edge lookup"]
+    time_spawned = trajectory[0][1]
+    route_travel_time = 0
+    retimed = [trajectory[0]]
+    for i in range(len(trajectory) - 1):
+        edge = edge_lookup[(trajectory[i][0], trajectory[i + 1][0])]
+        minute = round(time_spawned + route_travel_time)
+        try:
+            route_travel_time = route_travel_time + travel_time[edge][minute]
+        except IndexError as error:
+            raise beyond_horizon(minute) from error
+        retimed.append((trajectory[i + 1][0], time_spawned + route_travel_time))
+    return retimed
+
+# Whether the retimed trajectory passes any node more than tolerance minutes earlier or later than the planned trajectory,
+# so whether the travel time of any edge of the trajectory has changed by more than tolerance since it was planned
+def trajectory_moved(trajectory, retimed, tolerance):
+    return max(abs(retimed_time - planned_time) for (_, retimed_time), (_, planned_time) in zip(retimed, trajectory)) > tolerance
+
+# Update the number of cars on each edge in the future based on the trajectory (with node names)
+# With a reservation table (see utils/reservations.py) the trajectory is reserved in the reservation table instead of booked on the edges
+def update_future_edges(edges, trajectory, alpha, beta, sigma, graph=None, rng=None, reservations=None):
+    if graph is None:
+        graph = compile_graph(nodes_of_edges(edges), edges)
+
+    if reservations is not None:
+        reserve_trajectory(reservations, graph, [(graph["node ids"][node], time) for node, time in trajectory])
+        return
+
+    cars_on_edge = [edges[edge]["cars on edge"] for edge in graph["edge names"]]
+    travel_time = [edges[edge]["travel time"] for edge in graph["edge names"]]
+    book_trajectory(graph, cars_on_edge, travel_time, [(graph["node ids"][node], time) for node, time in trajectory], alpha, beta, sigma, rng)
+
+# Update the number of cars on each edge in the future based on the trajectory (with node ids); cars_on_edge and travel_time are indexed by edge id
+# and hold an array for each edge (e.g. rows of the edge store, see utils/edge_store.py). The car is added to each edge of the trajectory for all minutes
+# it is on the edge at once, after which the travel times of these minutes are recalculated in one go. A trajectory that does not fit in the arrays raises an IndexError
+# before the edge is booked, so the number of cars and the noise always cover the same minutes.
+# The noise of the predicted travel times is drawn again for every booking, from the "future edge noise" stream of rng if given (see utils/rng.py),
+# or with noise it is the fixed noise of each (edge, minute) (see utils/future_noise.py)
+def book_trajectory(graph, cars_on_edge, travel_time, trajectory, alpha, beta, sigma, rng=None, noise=None):
+    edge_lookup = graph["edge lookup"]
+    tt_0 = graph["tt_0"]
+    capacity = graph["capacity"]
 
-# Update the number of cars on each edge in the future based on the trajectory
-def update_future_edges(edges, trajectory, alpha, beta, sigma):
-    
     # Iterate over all nodes in the trajectory
     for i in range(len(trajectory) - 1):
-        edge = trajectory[i][0] + " → " + trajectory[i + 1][0] # the edge between the two nodes
-        times_on_edge = list(range(round(trajectory[i][1]), int(trajectory[i + 1][1]))) # the times the car was on this edge
-
-        # Update the number of cars on this edge for each time
-        for time in times_on_edge:
-            edges[edge]["cars on edge"][time] += 1
-            edges[edge]["travel time"][time] = travel_time_bpr(edges[edge]["tt_0"], edges[edge]["cars on edge"][time], edges[edge]["capacity"], alpha, beta, sigma)
-        
\ No newline at end of file
+        edge = edge_lookup[(trajectory[i][0], trajectory[i + 1][0])] # the edge between the two nodes
+        start, end = round(trajectory[i][1]), int(trajectory[i + 1][1]) # the car is on this edge from minute start up to (but not including) minute end
+        if end <= start:
+            continue
+
+        # Update the number of cars on this edge and the travel time for each time
+        if len(cars_on_edge[edge][start:end]) < end - start:
+            raise beyond_horizon(end - 1)
+        cars_on_edge[edge][start:end] += 1
+        if noise is None:
+            edge_noise = bpr_noise(capacity[edge:edge + 1], sigma, end - start, rng, "future edge noise")[0]
+        else:
+            edge_noise = noise_slice(noise, edge, start, end) if capacity[edge] != 0 else 0 # like bpr_noise, edges without capacity have no noise
+        travel_time[edge][start:end] = travel_time_bpr_vectorized(tt_0[edge], cars_on_edge[edge][start:end], capacity[edge], alpha, beta, edge_noise)
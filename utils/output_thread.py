@@ -0,0 +1,44 @@
+import queue
+import threading
+
+# Background thread for the output of the simulations (writing result chunks and checkpoints), so the simulation does not wait for the disk.
+# The simulation hands off a function and its arguments; the output thread calls them one by one, in the order they were handed off.
+# The queue holds at most max_size tasks: when the output thread falls behind, handing off a task waits until there is room again.
+# The arguments must not be changed by the simulation after they are handed off (copy arrays that the simulation keeps changing).
+# An error in the output thread is raised in the simulation the next time a task is handed off, or when the thread is closed.
+
+# Start the output thread
+def create_output_thread(max_size=16):
+    output = {"queue": queue.Queue(maxsize=max_size), "error": None}
+    output["thread"] = threading.Thread(target=output_loop, args=(output,), name="simulation output", daemon=True)
+    output["thread"].start()
+    return output
+
+# Call the tasks until the thread is closed; after an error, the remaining tasks are skipped
+def output_loop(output):
+    while True:
+        task = output["queue"].get()
+        if task is None:
+            return
+        function, args = task
+        if output["error"] is None:
+            try:
+                function(*args)
+            except BaseException as error:
+                output["error"] = error
+
+# Hand off function(*args) to the output thread, or call it right away without an output thread
+def submit(output, function, *args):
+    if output is None:
+        function(*args)
+        return
+    if output["error"] is not None:
+        raise output["error"]
+    output["queue"].put((function, args))
+
+# Wait until all tasks are done and stop the output thread
+def close_output_thread(output):
+    output["queue"].put(None)
+    output["thread"].join()
+    if output["error"] is not None:
+        raise output["error"]
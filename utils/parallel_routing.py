@@ -0,0 +1,149 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from utils.graph import adjacency_lists
+from utils.functional_extended import find_optimal_route, shortest_path_tree, route_from_tree
+from utils.modified_A_star import find_optimal_trajectory
+
+# Routing the cars spawning in a minute with a pool of worker processes. All routes of a minute use the same edge costs, so they can be calculated independently.
+# The graph, the heuristic of each node for each destination and the edge costs of the current minute are put in shared memory once,
+# so only the (origin, destination) pairs and the resulting paths are sent between the processes.
+# Every minute the edge costs are written to shared memory and the (origin, destination) pairs are sent to the workers grouped by destination;
+# the routes are matched back to their pairs, so the results are the same as routing the pairs one by one.
+#
+# For the modified A* algorithm the predicted travel times (future travel time, an array of shape (number of edges, minutes)) are kept in shared memory as well:
+# the main process books the trajectories in it and the workers plan trajectories for a batch of cars against it while no bookings are made (see plan_in_pool).
+# simulate_A_mod then books the trajectories in the order the cars spawn. Each trajectory is timed again with the current predictions (retime_trajectory) and booked
+# if it passes every node at most speculation_tolerance minutes earlier or later than planned; otherwise the car is re-planned in the main process. The noise of the
+# predictions is the same as without workers (future_noise of simulate_A_mod), so adding workers does not change the model. With fixed noise (future_noise="fixed",
+# see utils/future_noise.py) the bookings of the cars before a car can only make the predicted travel times higher, so the routes the car did not take are at least
+# as slow as when it was planned and a booked trajectory is at most speculation_tolerance minutes slower than the fastest one (up to the noise breaking FIFO);
+# with speculation_tolerance=0 the results are the same as planning the cars one by one with fixed noise. With noise drawn again for every booking, a booking can
+# also make the routes a car did not take faster, so this bound does not hold.
+#
+# Re-planning is serial, so the pool only speeds up planning when few cars are re-planned. How many cars are re-planned depends on how much the bookings of
+# a batch change the predicted travel times on the edges of the other cars compared with speculation_tolerance: with speculation_tolerance=0 nearly every car
+# is re-planned and the pool gives no speedup. simulate_A_mod prints how many cars were re-planned at the end of the run.
+
+GRAPH_ARRAYS = ("edge source", "edge target", "indptr", "out edges", "in indptr", "in edges")
+
+# State of a worker process: the shared arrays, the graph rebuilt from them and the routing backend
+worker = {}
+
+# A pool of num_workers worker processes, used for all worker processes of the simulations (also by utils/sweep.py, utils/replications.py and utils/scenarios.py).
+# The workers are started with fork where possible: the model scripts are not protected by if __name__ == "__main__", so workers started with spawn would run them again.
+# With fork the workers also inherit the arguments of initializer without pickling them.
+def create_process_pool(num_workers, initializer=None, initargs=()):
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(start_method).Pool(num_workers, initializer=initializer, initargs=initargs)
+
+# Put a copy of an array in a new block of shared memory
+def share_array(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    shared[:] = array
+    return block, shared
+
+# Attach to an array in shared memory
+def attach_array(name, shape, dtype):
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+# Start the worker processes; heuristics[destination] is the heuristic of each node for that destination
+# With future_travel_time, the pool gets a shared copy of it (routing_pool["future travel time"]) that the main process should book the trajectories in from then on
+def create_routing_pool(graph, heuristics, num_workers, routing="A*", future_travel_time=None):
+    arrays = {key: graph[key] for key in GRAPH_ARRAYS}
+    arrays["heuristics"] = np.asarray(heuristics, dtype=np.float64)
+    arrays["edge costs"] = np.zeros(len(graph["edge names"]))
+    if future_travel_time is not None:
+        arrays["future travel time"] = future_travel_time
+
+    blocks = {}
+    shared = {}
+    for key, array in arrays.items():
+        blocks[key], shared[key] = share_array(array)
+    specs = {key: (blocks[key].name, array.shape, array.dtype.str) for key, array in arrays.items()}
+
+    pool = create_process_pool(num_workers, initializer=init_worker, initargs=(specs, routing))
+
+    return {"pool": pool, "blocks": blocks, "edge costs": shared["edge costs"], "future travel time": shared.get("future travel time"), "num workers": num_workers}
+
+# Attach a worker process to the shared arrays and rebuild the parts of the graph that are used for routing
+def init_worker(specs, routing):
+    worker["blocks"] = {}
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        worker["blocks"][key], arrays[key] = attach_array(name, shape, dtype)
+
+    worker["graph"] = {
+        "adjacency": adjacency_lists(arrays["indptr"], arrays["out edges"], arrays["edge target"]),
+        "reverse adjacency": adjacency_lists(arrays["in indptr"], arrays["in edges"], arrays["edge source"]),
+        "edge lookup": {(int(source), int(target)): edge for edge, (source, target) in enumerate(zip(arrays["edge source"], arrays["edge target"]))}
+    }
+    worker["heuristics"] = arrays["heuristics"]
+    worker["edge costs"] = arrays["edge costs"]
+    worker["routing"] = routing
+    if "future travel time" in arrays:
+        worker["future travel time"] = list(arrays["future travel time"]) # a row for each edge, like the "travel time" of the future edges
+
+# Route the cars from each of the origins to the destination (in a worker process); returns (optimal path, optimal travel time) for each origin
+def route_to_destination(task):
+    destination, origins = task
+    graph = worker["graph"]
+    edge_costs = worker["edge costs"].tolist()
+
+    if worker["routing"] == "shortest path tree":
+        successor = shortest_path_tree(graph, destination, edge_costs)[1]
+        return [route_from_tree(graph, successor, origin, destination, edge_costs) for origin in origins]
+
+    heuristic = worker["heuristics"][destination].tolist()
+    return [find_optimal_route(graph, origin, destination, edge_costs, heuristic) for origin in origins]
+
+# Route the (origin, destination) pairs with the given edge costs; returns {(origin, destination): (optimal path, optimal travel time)}
+def route_in_pool(routing_pool, edge_costs, od_pairs):
+    routing_pool["edge costs"][:] = edge_costs
+
+    # Group the pairs by destination, so that the heuristic (or shortest path tree) of a destination is only needed by one task
+    origins_to = {}
+    for origin, destination in od_pairs:
+        origins_to.setdefault(destination, []).append(origin)
+    tasks = list(origins_to.items())
+
+    results = routing_pool["pool"].map(route_to_destination, tasks, chunksize=max(1, len(tasks) // (4 * routing_pool["num workers"])))
+
+    routes = {}
+    for (destination, origins), routes_to_destination in zip(tasks, results):
+        for origin, route in zip(origins, routes_to_destination):
+            routes[(origin, destination)] = route
+    return routes
+
+# Plan the trajectories of cars with the modified A* algorithm (in a worker process); a task is a list of (origin, destination, time spawned)
+def plan_trajectories(task):
+    graph = worker["graph"]
+    travel_time = worker["future travel time"]
+    heuristics = {}
+
+    results = []
+    for origin, destination, time_spawned in task:
+        if destination not in heuristics:
+            heuristics[destination] = worker["heuristics"][destination].tolist()
+        trajectory = find_optimal_trajectory(graph, origin, destination, time_spawned, travel_time, heuristics[destination])
+        results.append(trajectory)
+    return results
+
+# Plan the trajectories of a batch of cars, given as (origin, destination, time spawned), against the current predicted travel times; the results are in the order of the cars
+def plan_in_pool(routing_pool, cars):
+    num_workers = routing_pool["num workers"]
+    chunk_size = max(1, -(-len(cars) // num_workers))
+    tasks = [cars[i:i + chunk_size] for i in range(0, len(cars), chunk_size)]
+    return [result for results in routing_pool["pool"].map(plan_trajectories, tasks) for result in results]
+
+# Stop the worker processes and free the shared memory
+# The results are collected before the pool is closed, so the workers are terminated instead of waiting for them:
+# after Ctrl-C or an error, a worker can still be busy with a task (or be interrupted itself) and would never finish
+def close_routing_pool(routing_pool):
+    routing_pool["pool"].terminate()
+    routing_pool["pool"].join()
+    for block in routing_pool["blocks"].values():
+        block.close()
+        block.unlink()
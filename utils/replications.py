@@ -0,0 +1,181 @@
+import copy
+from statistics import NormalDist
+import numpy as np
+from utils.rng import create_rng, normal
+from utils.edge_store import edge_store_of
+from utils.parallel_routing import create_process_pool
+from utils.simulate import simulate_and_visualize
+from utils.simulate_extended import simulate_A_star, simulate_A_mod
+
+# scipy is only needed for the Student t quantiles of the confidence intervals; without it the normal quantiles are used
+try:
+    from scipy import stats
+except ImportError:
+    stats = None
+
+# Replications of a simulation with different seeds, to see how much the results vary between runs.
+# A replication is run(seed), which returns a summary of the run: a dictionary of metrics, each a number or an array (e.g. the congestion of each edge).
+# The replications are run by a pool of worker processes, batch_size replications at a time, and the summaries are added to an aggregator one by one
+# (in the order of the seeds, so the results do not depend on the number of workers). The aggregator keeps the running mean and sum of squared deviations
+# of each metric (Welford's algorithm), so the summaries do not have to be kept. The replications stop early when the half-width of the confidence interval
+# of each target metric is below its target (for an array, the largest half-width of its entries); no new batch is started after that.
+# The replication functions of the engines (replicate_A_star, replicate_A_mod, replicate_probabilistic) are used with functools.partial, e.g.
+# run_replications(partial(replicate_A_star, nodes=nodes, edges=edges, cars=cars, ...), {"mean travel time": 0.5}, num_workers=4).
+# By default every replication has the same cars and only the random numbers of the run change, so the confidence interval is that of the mean over
+# the noise of the model for this demand. With demand="resample" the demand of each replication is drawn as well (see resample_demand), so the
+# confidence interval also covers the variation of the demand. The travel times of the A* engines only vary between seeds through the noise of the
+# travel times, which is often too small to change the whole minutes the cars move in; run_replications raises an error when all replications give
+# the same results, instead of reporting a confidence interval of width 0.
+
+# Create an empty aggregator
+def create_aggregator():
+    return {"count": 0, "mean": {}, "M2": {}}
+
+# Add the summary of one replication to the aggregator
+def add_summary(aggregator, summary):
+    aggregator["count"] += 1
+    count = aggregator["count"]
+    for metric, value in summary.items():
+        value = np.asarray(value, dtype=np.float64)
+        if count == 1:
+            aggregator["mean"][metric] = value.copy()
+            aggregator["M2"][metric] = np.zeros_like(value)
+            continue
+        delta = value - aggregator["mean"][metric]
+        aggregator["mean"][metric] = aggregator["mean"][metric] + delta / count
+        aggregator["M2"][metric] = aggregator["M2"][metric] + delta * (value - aggregator["mean"][metric])
+
+# The sample variance of a metric (nan with fewer than 2 replications)
+def sample_variance(aggregator, metric):
+    if aggregator["count"] < 2:
+        return np.full_like(aggregator["mean"][metric], np.nan)
+    return aggregator["M2"][metric] / (aggregator["count"] - 1)
+
+# The half-width of the confidence interval of the mean of a metric
+def half_width(aggregator, metric, confidence=0.95):
+    count = aggregator["count"]
+    if count < 2:
+        return np.full_like(aggregator["mean"][metric], np.inf)
+    if stats is not None:
+        quantile = stats.t.ppf((1 + confidence) / 2, count - 1)
+    else:
+        quantile = NormalDist().inv_cdf((1 + confidence) / 2)
+    return quantile * np.sqrt(sample_variance(aggregator, metric) / count)
+
+# Whether the confidence intervals of all target metrics are narrow enough; target_half_widths is {metric: target half-width}
+def converged(aggregator, target_half_widths, confidence=0.95):
+    return all(np.nanmax(half_width(aggregator, metric, confidence)) <= target for metric, target in target_half_widths.items())
+
+# Whether all replications so far gave the same results (with at least 2 replications)
+def identical_replications(aggregator):
+    return aggregator["count"] >= 2 and all(np.all(np.nan_to_num(M2) == 0) for M2 in aggregator["M2"].values())
+
+# State of a worker process: the function that runs a replication
+replication = {}
+
+def init_replication(run):
+    replication["run"] = run
+
+def run_replication(seed):
+    return replication["run"](seed)
+
+# Run replications with the seeds first_seed, first_seed + 1, ... until the target half-widths are reached (after at least min_replications)
+# or max_replications have been run; returns the aggregator with the mean, half-width and number of replications of each metric
+# With workers, the replications are run in batches of batch_size (by default the number of workers)
+def run_replications(run, target_half_widths=None, num_workers=None, min_replications=5, max_replications=100, confidence=0.95, first_seed=0, batch_size=None):
+    aggregator = create_aggregator()
+    seeds = range(first_seed, first_seed + max_replications)
+
+    def add(summary):
+        add_summary(aggregator, summary)
+        print(f"Replication {aggregator['count']}: " + ", ".join(f"{metric} {float(value):.4g}" for metric, value in summary.items() if np.ndim(value) == 0))
+        return target_half_widths is not None and aggregator["count"] >= min_replications and converged(aggregator, target_half_widths, confidence)
+
+    if num_workers is None or num_workers <= 1:
+        for seed in seeds:
+            if add(run(seed)):
+                break
+    else:
+        # The summaries of a batch are added in the order of the seeds; the rest of the batch is not used once the targets are reached
+        batch_size = num_workers if batch_size is None else batch_size
+        with create_process_pool(num_workers, initializer=init_replication, initargs=(run,)) as pool:
+            for start in range(0, len(seeds), batch_size):
+                if any(add(summary) for summary in pool.map(run_replication, seeds[start:start + batch_size])):
+                    break
+
+    if identical_replications(aggregator):
+        raise ValueError(f"All {aggregator['count']} replications gave the same results, so the seed does not change the run (e.g. draw the demand of each replication with demand=\"resample\")")
+    aggregator["half width"] = {metric: half_width(aggregator, metric, confidence) for metric in aggregator["mean"]}
+    return aggregator
+
+# Summary of a run of simulate_A_star or simulate_A_mod: the mean travel time and number of arrivals of the cars spawned after the warm-up,
+# and the mean congestion (cars on the edge divided by its capacity) of each edge after the warm-up
+def summarize_A_star(cars, edges, num_minutes, warmup_steps=0):
+    num_minutes, warmup_steps = int(num_minutes), int(warmup_steps) # the model scripts give warmup_steps as a float (2.5*60)
+    car_store = cars.car_store
+    arrived = (car_store["time arrived"] >= 0) & (car_store["time spawned"] >= warmup_steps)
+    travel_times = car_store["time arrived"][arrived] - car_store["time spawned"][arrived]
+
+    cars_on_edge = edge_store_of(edges)["cars on edge"][:, warmup_steps:num_minutes]
+    capacity = np.array([properties["capacity"] for properties in edges.values()], dtype=np.float64)
+    congestion = np.divide(cars_on_edge.mean(axis=1), capacity, out=np.full(len(capacity), np.nan), where=capacity != 0)
+
+    return {
+        "mean travel time": float(travel_times.mean()) if len(travel_times) > 0 else np.nan,
+        "arrivals": int(arrived.sum()),
+        "congestion": congestion
+    }
+
+# The cars of a replication: with demand="resample" the demand is drawn around the cars with resample_demand, with demand=None the cars themselves are used
+# and otherwise demand(seed) gives the cars
+def replication_cars(seed, cars, demand, rng):
+    if demand == "resample":
+        return resample_demand(cars, rng)
+    if demand is None:
+        return cars
+    return demand(seed)
+
+# Draw new cars around the given cars: the number of cars of each (origin, destination, minute spawned) with n cars becomes round(n + sqrt(n) * z), at least 0,
+# with z from the "demand" stream of rng (the normal approximation of a Poisson number of cars with mean n). The new cars are copies of the first car of
+# their (origin, destination, minute) with the ids 0, 1, ...; an (origin, destination, minute) without cars stays without cars.
+def resample_demand(cars, rng):
+    groups = {}
+    for car in cars:
+        key = (car["origin"], car["destination"], car["time spawned"])
+        if key not in groups:
+            groups[key] = [car, 0]
+        groups[key][1] += 1
+
+    counts = np.array([count for _, count in groups.values()], dtype=np.float64)
+    new_counts = np.maximum(np.round(counts + np.sqrt(counts) * normal(rng, "demand", 0, 1, len(counts))), 0).astype(int)
+
+    new_cars = []
+    for (car, _), count in zip(groups.values(), new_counts.tolist()):
+        for _ in range(count):
+            new_cars.append(dict(car, id=len(new_cars)))
+    return new_cars
+
+# Replication of simulate_A_star with the given seed; by default with the given cars, with demand="resample" with demand drawn around them (see replication_cars)
+def replicate_A_star(seed, nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, warmup_steps=0, demand=None, **kwargs):
+    rng = create_rng(seed)
+    cars = replication_cars(seed, cars, demand, rng)
+    new_cars, new_edges = simulate_A_star(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, rng=rng, animate=False, results_filename=None, **kwargs)
+    return summarize_A_star(new_cars, new_edges, num_minutes, warmup_steps)
+
+# Replication of simulate_A_mod with the given seed
+def replicate_A_mod(seed, nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, warmup_steps=0, demand=None, **kwargs):
+    rng = create_rng(seed)
+    cars = replication_cars(seed, cars, demand, rng)
+    new_cars, new_edges, _ = simulate_A_mod(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, rng=rng, results_filename=None, **kwargs)
+    return summarize_A_star(new_cars, new_edges, num_minutes, warmup_steps)
+
+# Replication of the probabilistic route choice model (simulate_and_visualize) with the given seed, on copies of the cars and edges
+def replicate_probabilistic(seed, cars, edges, node_positions, num_minutes, warmup_steps=120, demand=None, **kwargs):
+    if demand is not None:
+        cars = demand(seed)
+    car_reach_times, avg_congestion = simulate_and_visualize(copy.deepcopy(cars), copy.deepcopy(edges), node_positions, num_minutes, warmup_steps=warmup_steps, animate=False, rng=create_rng(seed), **kwargs)
+    return {
+        "mean travel time": float(np.mean(car_reach_times)) if len(car_reach_times) > 0 else np.nan,
+        "arrivals": len(car_reach_times),
+        "congestion": np.array([avg_congestion[edge] for edge in edges])
+    }
@@ -0,0 +1,159 @@
+import math
+import numpy as np
+from utils.future_noise import noise_at, discard_noise
+
+# Reservation table for the modified A* algorithm: the number of cars that are predicted to be on each edge at each future minute.
+# Booking a trajectory adds 1 to a range of minutes of each edge on it and A* asks for the travel time of an edge at a single minute,
+# so each edge keeps a Fenwick tree (binary indexed tree) over the changes in its number of cars: a range update is two point updates and
+# the number of cars at a minute is a prefix sum, both O(log horizon) however long the car stays on the edge.
+# The travel time at a minute is only calculated (with the BPR function) when it is asked for. The noise of the BPR function is fixed for each
+# (edge, minute): the table keeps it like the fixed noise of utils/future_noise.py (with the same keys), so it does not depend on the order of the queries.
+# Minutes without reserved cars have travel time tt_0, like the future edges before any car is booked on them. Reading or reserving a minute outside the window
+# (beyond its far end, or a minute that has passed) raises the same IndexError, as the table does not know the cars at those minutes.
+#
+# The table covers a window of horizon minutes that moves along with the simulation (see advance_reservations), like utils/horizon.py:
+# minute t is kept in slot t % horizon. When a minute has passed, its change is added to the change of the next minute, so that the change in
+# the slot of the first minute of the window is the number of cars at that minute, and the slot is reused for the minute at the far end of the window.
+
+# Create an empty reservation table for the edges of the compiled graph (see utils/graph.py)
+def create_reservation_table(graph, horizon, alpha, beta, sigma, rng=None, block_size=1024):
+    num_edges = len(graph["edge names"])
+    return {
+        "tree": np.zeros((num_edges, horizon + 1), dtype=np.int32), # Fenwick tree of each edge, position i + 1 belongs to slot i
+        "horizon": horizon,
+        "start": 0, # first minute in the window
+        "tt_0": graph["tt_0"].tolist(),
+        "capacity": graph["capacity"].tolist(),
+        "alpha": alpha,
+        "beta": beta,
+        "sigma": sigma,
+        "rng": rng,
+        "block size": block_size,
+        "noise": {}, # (edge, block of minutes) → noise of the BPR function at each minute of the block
+        "end": 0 # the minute after the last reserved minute
+    }
+
+# Add value to the change in the number of cars at the given slot; tree is the Fenwick tree of one edge,
+# or of all edges (the transpose of the table's trees, so tree[index] has an entry for each edge) with a value for each edge
+def fenwick_add(tree, slot, value, horizon):
+    index = slot + 1
+    while index <= horizon:
+        tree[index] += value
+        index += index & -index
+
+# Sum of the changes in the number of cars up to and including the given slot (0 for slot -1)
+def fenwick_prefix_sum(tree, slot):
+    index = slot + 1
+    total = 0
+    while index > 0:
+        total = total + tree[index]
+        index -= index & -index
+    return total
+
+# Check that the minutes from start up to (but not including) end are in the window of the table
+def check_window(table, start, end):
+    if start < table["start"] or end > table["start"] + table["horizon"]:
+        raise IndexError(f"Minutes {start} to {end} are outside the horizon of the reservation table (minutes {table['start']} to {table['start'] + table['horizon']}); use a longer future horizon")
+
+# Reserve an edge for one car from minute start up to (but not including) minute end
+# The car leaves the edge at minute end, which has to be in the window as well
+def reserve(table, edge, start, end):
+    horizon = table["horizon"]
+    check_window(table, start, end + 1)
+    tree = table["tree"][edge]
+    fenwick_add(tree, start % horizon, 1, horizon)
+    fenwick_add(tree, end % horizon, -1, horizon)
+    table["end"] = max(table["end"], end)
+
+# The number of cars reserved on an edge at a minute: the sum of the changes from the first minute of the window up to the minute
+def reserved_cars(table, edge, minute):
+    check_window(table, minute, minute + 1)
+    horizon = table["horizon"]
+    tree = table["tree"][edge]
+    first_slot = table["start"] % horizon
+    slot = minute % horizon
+
+    cars = fenwick_prefix_sum(tree, slot) - fenwick_prefix_sum(tree, first_slot - 1)
+    if slot < first_slot:
+        cars += fenwick_prefix_sum(tree, horizon - 1)
+    return int(cars)
+
+# Move the start of the window to the given minute: the change of each minute that has passed is moved to the next minute
+def advance_reservations(table, time):
+    horizon = table["horizon"]
+    tree = table["tree"].T
+    for minute in range(table["start"], time):
+        slot = minute % horizon
+        change = fenwick_prefix_sum(tree, slot) - fenwick_prefix_sum(tree, slot - 1)
+        if change.any():
+            fenwick_add(tree, slot, -change, horizon)
+            fenwick_add(tree, (minute + 1) % horizon, change, horizon)
+    table["start"] = max(table["start"], time)
+
+    # The noise of blocks of minutes that have passed is not needed anymore
+    discard_noise(table, table["start"])
+
+# The predicted travel time of an edge at a minute, calculated from the number of reserved cars with the BPR function
+def predicted_travel_time(table, edge, minute):
+    N_e = reserved_cars(table, edge, minute)
+    if N_e == 0:
+        return table["tt_0"][edge]
+    C_e = table["capacity"][edge]
+    if C_e == 0:
+        return math.inf
+    return max(0, table["tt_0"][edge] * (1 + table["alpha"] * (N_e / C_e) ** table["beta"]) + noise_at(table, edge, minute)) # The max is to avoid negative travel times
+
+# Reserve the edges of a trajectory (with node ids), for the minutes the car is on each edge (the same minutes as book_trajectory)
+def reserve_trajectory(table, graph, trajectory):
+    edge_lookup = graph["edge lookup"]
+    for i in range(len(trajectory) - 1):
+        edge = edge_lookup[(trajectory[i][0], trajectory[i + 1][0])]
+        start, end = round(trajectory[i][1]), int(trajectory[i + 1][1])
+        if end > start:
+            reserve(table, edge, start, end)
+
+# Predicted travel times of one edge, indexed by minute like the "travel time" of an edge
+class ReservedTravelTimes:
+    def __init__(self, table, edge):
+        self.table = table
+        self.edge = edge
+
+    def __getitem__(self, minute):
+        return predicted_travel_time(self.table, self.edge, minute)
+
+# The predicted travel times of all edges, so that travel_time[edge][minute] can be used by find_optimal_trajectory
+def reserved_travel_times(table):
+    return [ReservedTravelTimes(table, edge) for edge in range(len(table["tree"]))]
+
+# The change in the number of cars of each edge at each of the first num_slots slots, as an array of shape (number of edges, num_slots)
+# Each Fenwick tree entry is the sum of its own change and the entries of its children (which come before it), so subtracting the entries of the children gives the changes back
+def fenwick_changes(tree, num_slots):
+    tree = tree[:, :num_slots + 1].astype(np.int64)
+    changes = tree.copy()
+    index = np.arange(1, num_slots + 1)
+    lowest_bit = index & -index
+    for bit in np.unique(lowest_bit):
+        children = index[(lowest_bit == bit) & (index + bit <= num_slots)]
+        changes[:, children + bit] -= tree[:, children]
+    return changes[:, 1:]
+
+# The number of reserved cars of each edge at each minute from the start of the window up to the last reserved minute, as an array of shape (number of edges, minutes)
+def reserved_cars_array(table):
+    horizon = table["horizon"]
+    first_slot = table["start"] % horizon
+    num_minutes = max(0, min(table["end"], table["start"] + horizon) - table["start"])
+    if first_slot + num_minutes <= horizon:
+        # The slots before the first slot of the window have no changes, so the sum can start at slot 0
+        changes = fenwick_changes(table["tree"], first_slot + num_minutes)[:, first_slot:]
+    else:
+        changes = np.roll(fenwick_changes(table["tree"], horizon), -first_slot, axis=1)[:, :num_minutes]
+    return np.cumsum(changes, axis=1)
+
+# Write the reserved cars and predicted travel times of the window to the time series of the edges (e.g. the future edges); other minutes keep their values
+def export_reservations(table, edges):
+    counts = reserved_cars_array(table)
+    start, end = table["start"], table["start"] + counts.shape[1]
+    for edge, properties in enumerate(edges.values()):
+        properties["cars on edge"][start:end] = counts[edge]
+        for minute in np.nonzero(counts[edge])[0]:
+            properties["travel time"][start + int(minute)] = predicted_travel_time(table, edge, start + int(minute))
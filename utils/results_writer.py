@@ -0,0 +1,186 @@
+import os
+import glob
+import numpy as np
+from utils.output_thread import submit
+from utils.functional_extended import shortest_path_tree, route_from_tree
+
+# pyarrow is optional: without it the results are written as chunks of .npz files
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Streaming writer of the results of the A* simulations: a record is written for each car when it arrives (and at the end of the run for the cars
+# that did not arrive), instead of building a list of all cars after the run like save_simulation_results does.
+# The records are collected in chunks of chunk_size cars; a full chunk is written to a Parquet file (one row group per chunk) if pyarrow is installed,
+# otherwise to its own .npz file in the results directory (chunk_00000.npz, chunk_00001.npz, ...). So the memory of the writer does not grow with the number of cars.
+# The columns are integers and floats: nodes are node ids of the compiled graph (see utils/graph.py) and the path of a car is the sequence of node ids it passes,
+# stored one after another with the offset of each car (a list column in Parquet). Cars routed by the modified A* algorithm also have the planned time at each node.
+# Like the CSV file of save_simulation_results, each car also has the optimal path and travel time of its trip if the road network were empty (free flow, tt_0 on every edge),
+# computed once per (origin, destination) pair from one shortest path tree per destination. (The CSV file uses A* and adds the penalty of the edges that were full
+# when the first car of the pair spawned, so its "empty system" paths can differ.)
+# read_results reads the columns back, from either format.
+# Without an extension, the Parquet file gets the extension .parquet (read_results finds it without the extension as well).
+# With an output thread (see utils/output_thread.py), the chunks are collected by the simulation and written to disk by the output thread.
+
+RESULT_COLUMNS = {
+    "car id": np.int64,
+    "origin": np.int32,
+    "destination": np.int32,
+    "time spawned": np.int32,
+    "time arrived": np.int32, # -1 if the car did not arrive
+    "optimal travel time": np.float64, # nan for cars routed by the modified A* algorithm
+    "free-flow travel time": np.float64 # nan if the destination cannot be reached
+}
+LIST_COLUMNS = (("path", "path offsets"), ("trajectory times", "trajectory offsets"), ("free-flow path", "free-flow path offsets"))
+
+# Create a writer for the results at path: a Parquet file, or a directory of .npz chunks (also when format is "npz")
+def create_results_writer(path, graph, chunk_size=65536, format=None, output=None):
+    if format is None:
+        format = "parquet" if pa is not None else "npz"
+    if format == "parquet" and pa is None:
+        raise ImportError("Writing Parquet files needs pyarrow")
+    if format == "parquet" and os.path.splitext(path)[1] == "":
+        path += ".parquet"
+    if format == "npz":
+        os.makedirs(path, exist_ok=True)
+        for old_chunk in glob.glob(os.path.join(path, "chunk_*.npz")):
+            os.remove(old_chunk)
+
+    writer = {
+        "path": path,
+        "format": format,
+        "graph": graph,
+        "edge target": graph["edge target"],
+        "tt_0": graph["tt_0"].tolist(),
+        "free-flow trees": {}, # destination → next node of each node on its free-flow path to the destination
+        "free-flow routes": {}, # (origin, destination) → free-flow path and travel time
+        "chunk size": chunk_size,
+        "chunks written": 0,
+        "parquet writer": None,
+        "output": output
+    }
+    clear_chunk(writer)
+    return writer
+
+# Start an empty chunk
+def clear_chunk(writer):
+    writer["columns"] = {column: [] for column in RESULT_COLUMNS}
+    writer["paths"] = []
+    writer["trajectory times"] = []
+    writer["free-flow paths"] = []
+
+# The optimal path (node ids) and travel time of a trip if the road network were empty, computed once per (origin, destination) pair
+def free_flow_route(writer, origin, destination):
+    if (origin, destination) not in writer["free-flow routes"]:
+        if destination not in writer["free-flow trees"]:
+            writer["free-flow trees"][destination] = shortest_path_tree(writer["graph"], destination, writer["tt_0"])[1]
+        path, travel_time = route_from_tree(writer["graph"], writer["free-flow trees"][destination], origin, destination, writer["tt_0"])
+        writer["free-flow routes"][(origin, destination)] = (np.zeros(0, dtype=np.int32) if path is None else np.array(path, dtype=np.int32), np.nan if travel_time is None else travel_time)
+    return writer["free-flow routes"][(origin, destination)]
+
+# Add the record of a car to the chunk, writing the chunk when it is full
+def write_car(writer, car_store, car):
+    columns = writer["columns"]
+    columns["car id"].append(car_store["id"][car])
+    columns["origin"].append(car_store["origin"][car])
+    columns["destination"].append(car_store["destination"][car])
+    columns["time spawned"].append(car_store["time spawned"][car])
+    columns["time arrived"].append(car_store["time arrived"][car])
+    columns["optimal travel time"].append(car_store["optimal travel time"][car])
+    free_flow_path, free_flow_travel_time = free_flow_route(writer, int(car_store["origin"][car]), int(car_store["destination"][car]))
+    columns["free-flow travel time"].append(free_flow_travel_time)
+    writer["free-flow paths"].append(free_flow_path)
+
+    route = car_store["route"][car]
+    if route is None:
+        writer["paths"].append(np.zeros(0, dtype=np.int32))
+    else:
+        writer["paths"].append(np.concatenate(([car_store["origin"][car]], writer["edge target"][route])).astype(np.int32))
+    trajectory_times = car_store["trajectory times"][car]
+    writer["trajectory times"].append(np.zeros(0) if trajectory_times is None else np.asarray(trajectory_times, dtype=np.float64))
+
+    if len(columns["car id"]) >= writer["chunk size"]:
+        write_chunk(writer)
+
+# Add the records of the cars that have not been written because they did not arrive
+def write_unfinished(writer, car_store):
+    for car in np.nonzero(car_store["time arrived"] < 0)[0].tolist():
+        write_car(writer, car_store, car)
+
+# Offsets of a list of arrays stored one after another
+def offsets_of(arrays):
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int32)
+    np.cumsum([len(array) for array in arrays], out=offsets[1:])
+    return offsets
+
+# Hand off the cars in the chunk to be written
+def write_chunk(writer):
+    if len(writer["columns"]["car id"]) == 0:
+        return
+
+    columns = {column: np.array(values, dtype=RESULT_COLUMNS[column]) for column, values in writer["columns"].items()}
+    lists = {
+        "path": (np.concatenate(writer["paths"]).astype(np.int32), offsets_of(writer["paths"])),
+        "trajectory times": (np.concatenate(writer["trajectory times"]), offsets_of(writer["trajectory times"])),
+        "free-flow path": (np.concatenate(writer["free-flow paths"]).astype(np.int32), offsets_of(writer["free-flow paths"]))
+    }
+
+    submit(writer["output"], save_chunk, writer, writer["chunks written"], columns, lists)
+    writer["chunks written"] += 1
+    clear_chunk(writer)
+
+# Write a chunk to the Parquet file or to its own .npz file
+# lists has the values and offsets of each list column
+def save_chunk(writer, chunk_number, columns, lists):
+    if writer["format"] == "parquet":
+        arrays = [pa.array(values) for values in columns.values()]
+        arrays += [pa.ListArray.from_arrays(pa.array(offsets), pa.array(values)) for values, offsets in lists.values()]
+        table = pa.Table.from_arrays(arrays, names=list(columns) + list(lists))
+        if writer["parquet writer"] is None:
+            writer["parquet writer"] = pq.ParquetWriter(writer["path"], table.schema)
+        writer["parquet writer"].write_table(table)
+    else:
+        chunk_path = os.path.join(writer["path"], f"chunk_{chunk_number:05d}.npz")
+        list_arrays = {}
+        for column, offsets_column in LIST_COLUMNS:
+            list_arrays[column], list_arrays[offsets_column] = lists[column]
+        np.savez_compressed(chunk_path, **columns, **list_arrays)
+
+# Write the last chunk and close the file
+def close_results_writer(writer):
+    write_chunk(writer)
+    submit(writer["output"], close_parquet_file, writer)
+
+# Close the Parquet file (if any chunk has been written to it)
+def close_parquet_file(writer):
+    if writer["parquet writer"] is not None:
+        writer["parquet writer"].close()
+        writer["parquet writer"] = None
+
+# Read the results written by a results writer: each column as an array, and the paths, trajectory times and free-flow paths as a flat array with the offset of each car
+def read_results(path):
+    if not os.path.exists(path) and os.path.exists(path + ".parquet"):
+        path += ".parquet"
+    if os.path.isdir(path):
+        chunks = []
+        for chunk_path in sorted(glob.glob(os.path.join(path, "chunk_*.npz"))):
+            with np.load(chunk_path) as chunk:
+                chunks.append({key: chunk[key] for key in chunk.files})
+        results = {column: np.concatenate([chunk[column] for chunk in chunks]) if chunks else np.zeros(0, dtype=dtype) for column, dtype in RESULT_COLUMNS.items()}
+        for values, offsets in LIST_COLUMNS:
+            results[values] = np.concatenate([chunk[values] for chunk in chunks]) if chunks else np.zeros(0)
+            lengths = np.concatenate([np.diff(chunk[offsets]) for chunk in chunks]) if chunks else np.zeros(0, dtype=np.int64)
+            results[offsets] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        return results
+
+    if pa is None:
+        raise ImportError("Reading Parquet files needs pyarrow")
+    table = pq.read_table(path)
+    results = {column: table.column(column).to_numpy() for column in RESULT_COLUMNS}
+    for column, offsets in LIST_COLUMNS:
+        values = table.column(column).combine_chunks()
+        results[column] = values.flatten().to_numpy()
+        results[offsets] = values.offsets.to_numpy().astype(np.int64) - values.offsets[0].as_py()
+    return results
@@ -0,0 +1,85 @@
+import zlib
+import numpy as np
+
+# Random numbers for the simulations, as an alternative to the global np.random state.
+# The random numbers come from independent named streams (e.g. "demand", "bpr noise", "route choice", "future edge noise"), so drawing more numbers
+# for one purpose does not change the numbers drawn for another. Each stream hands out pre-generated blocks of block_size numbers:
+# block b of a stream is generated by its own numpy.random.Generator, seeded with SeedSequence(seed, spawn_key=(stream, kind, b)).
+# The i-th number of a stream therefore only depends on the seed, the stream name and i. A run that is split over several workers
+# (each skipping to the position where its part starts, see skip_to) draws exactly the same numbers as the serial run.
+
+KINDS = {"normal": 0, "uniform": 1}
+
+# Create the random number service
+def create_rng(seed=42, block_size=4096):
+    return {
+        "seed": seed,
+        "block size": block_size,
+        "streams": {} # (stream name, kind) → {"position": number of values drawn, "block index": index of the current block, "block": the current block}
+    }
+
+# Id of a stream name that is the same in every run and every process (Python's hash of a string is not)
+def stream_id(stream):
+    return zlib.crc32(stream.encode())
+
+# Generate block block_index of a stream
+def generate_block(rng, stream, kind, block_index):
+    seed_sequence = np.random.SeedSequence(rng["seed"], spawn_key=(stream_id(stream), KINDS[kind], block_index))
+    generator = np.random.Generator(np.random.PCG64(seed_sequence))
+    if kind == "normal":
+        return generator.standard_normal(rng["block size"])
+    return generator.random(rng["block size"])
+
+# The position and current block of a stream, created when the stream is first used
+def stream_state(rng, stream, kind):
+    if (stream, kind) not in rng["streams"]:
+        rng["streams"][(stream, kind)] = {"position": 0, "block index": -1, "block": None}
+    return rng["streams"][(stream, kind)]
+
+# Take the next size values of a stream, generating new blocks when needed
+def draw(rng, stream, kind, size):
+    state = stream_state(rng, stream, kind)
+    block_size = rng["block size"]
+    values = np.empty(size)
+    filled = 0
+    while filled < size:
+        block_index, offset = divmod(state["position"], block_size)
+        if block_index != state["block index"]:
+            state["block"] = generate_block(rng, stream, kind, block_index)
+            state["block index"] = block_index
+        num_values = min(size - filled, block_size - offset)
+        values[filled:filled + num_values] = state["block"][offset:offset + num_values]
+        filled += num_values
+        state["position"] += num_values
+    return values
+
+# Standard normal values that only depend on the seed, the stream and the key (a tuple of integers, e.g. (edge, block of minutes)), not on what was drawn before
+def keyed_standard_normal(rng, stream, key, size):
+    seed_sequence = np.random.SeedSequence(rng["seed"], spawn_key=(stream_id(stream), KINDS["normal"]) + tuple(key))
+    return np.random.Generator(np.random.PCG64(seed_sequence)).standard_normal(size)
+
+# Continue a stream from the given position (the number of values drawn before), e.g. for a worker that simulates the second half of a run
+def skip_to(rng, stream, kind, position):
+    stream_state(rng, stream, kind)["position"] = position
+
+# Normally distributed values with mean loc and standard deviation scale; a single float if size is None (like np.random.normal)
+def normal(rng, stream, loc, scale, size=None):
+    values = loc + scale * draw(rng, stream, "normal", 1 if size is None else int(np.prod(size)))
+    return float(values[0]) if size is None else values.reshape(size)
+
+# Choose one of the options with the given probabilities (like np.random.choice with p)
+def choice(rng, stream, options, p):
+    cumulative = np.cumsum(p)
+    u = draw(rng, stream, "uniform", 1)[0] * cumulative[-1]
+    return options[min(int(np.searchsorted(cumulative, u, side="right")), len(options) - 1)]
+
+# The state of the random number service that is needed to continue it later (the seed, block size and the position of each stream); saved in checkpoints (see utils/checkpoint.py)
+def rng_state(rng):
+    return {"seed": rng["seed"], "block size": rng["block size"], "positions": {key: state["position"] for key, state in rng["streams"].items()}}
+
+# Recreate the random number service from its state
+def restore_rng(state):
+    rng = create_rng(state["seed"], state["block size"])
+    for (stream, kind), position in state["positions"].items():
+        skip_to(rng, stream, kind, position)
+    return rng
@@ -0,0 +1,52 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+# Cache of optimal routes for the A* simulation: the travel times of the edges often change only slightly from minute to minute,
+# so a route found in an earlier minute can be reused as long as the network looks the same.
+# A route is stored under (origin, destination, network state), where the network state is a hash of the A* edge costs rounded down to
+# multiples of the tolerance. With a tolerance of 0 the edge costs have to be exactly the same.
+# When the cache is full, the route that has not been used for the longest time is removed (least recently used).
+# A reused route keeps the optimal travel time it had when it was calculated.
+
+# Create an empty route cache
+def create_route_cache(max_size=10000, tolerance=0):
+    return {
+        "entries": OrderedDict(), # (origin, destination, network state) → (route, optimal travel time), the most recently used entry last
+        "max size": max_size,
+        "tolerance": tolerance,
+        "hits": 0,
+        "misses": 0
+    }
+
+# The hash of the edge costs rounded down to multiples of the tolerance; computed once per minute, as the edge costs are the same for all cars
+# The hash is the same in every process (Python's hash of bytes is not), so the cache can be saved in a checkpoint (see utils/checkpoint.py)
+def network_state(route_cache, edge_costs):
+    edge_costs = np.asarray(edge_costs, dtype=np.float64)
+    if route_cache["tolerance"] > 0:
+        edge_costs = np.floor(edge_costs / route_cache["tolerance"])
+    return int.from_bytes(hashlib.blake2b(edge_costs.tobytes(), digest_size=8).digest(), "little")
+
+# Look up the route from origin to destination in the given network state; returns (route, optimal travel time) or None if the route is not in the cache
+def lookup_route(route_cache, origin, destination, state):
+    key = (origin, destination, state)
+    entries = route_cache["entries"]
+    if key not in entries:
+        route_cache["misses"] += 1
+        return None
+    route_cache["hits"] += 1
+    entries.move_to_end(key)
+    return entries[key]
+
+# Store the route from origin to destination in the given network state, removing the least recently used route if the cache is full
+def store_route(route_cache, origin, destination, state, route, optimal_travel_time):
+    entries = route_cache["entries"]
+    entries[(origin, destination, state)] = (route, optimal_travel_time)
+    entries.move_to_end((origin, destination, state))
+    while len(entries) > route_cache["max size"]:
+        entries.popitem(last=False)
+
+# The fraction of lookups that found a route in the cache
+def hit_rate(route_cache):
+    lookups = route_cache["hits"] + route_cache["misses"]
+    return route_cache["hits"] / lookups if lookups > 0 else 0
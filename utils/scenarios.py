@@ -0,0 +1,68 @@
+from utils.edge_store import copy_edges
+from utils.parallel_routing import create_process_pool
+from utils.simulate_extended import simulate_A_star
+
+# Scenarios that share the same warm-up: the warm-up is simulated once and saved as a checkpoint (see utils/checkpoint.py) at its last minute,
+# and every scenario continues from that checkpoint with its own changes, instead of simulating the warm-up again.
+# A scenario is a dictionary with the arguments of the engine (simulate_A_star or simulate_A_mod) that differ from the warm-up:
+# "edges" (e.g. with other capacities, made with scale_capacity), "cars" (another demand; the cars that spawned during the warm-up have to be the same),
+# "alpha", "beta", "sigma" or any keyword argument of the engine.
+# All scenarios continue with the random numbers of the warm-up, so they use common random numbers.
+# The scenarios are run side by side by num_workers worker processes; the results come back in the order of the scenarios.
+# With more than one worker, summarize is required: the full results (the cars and the time series of every edge) are too large to send back from the workers.
+# The engine, the arguments of all scenarios and summarize are given to the worker processes once, when the pool starts (see create_process_pool in utils/parallel_routing.py); with fork they are inherited without pickling,
+# so the cars and edges are not sent with every scenario. With spawn, summarize has to be a function of the module level (or a functools.partial of one).
+
+# Copy of the edges with the capacity of the given edges (all edges if None) multiplied by multiplier
+def scale_capacity(edges, multiplier, edge_names=None):
+    new_edges = copy_edges(edges)
+    for edge in (new_edges if edge_names is None else edge_names):
+        new_edges[edge]["capacity"] = int(new_edges[edge]["capacity"] * multiplier)
+    return new_edges
+
+# The arguments of the engine for a scenario: the arguments of the warm-up with the changes of the scenario
+def scenario_arguments(arguments, scenario):
+    arguments = dict(arguments)
+    if "cars" in scenario:
+        arguments.pop("spawn_index", None) # the spawn index of the other cars is made by the engine
+    arguments.update(scenario)
+    return arguments
+
+# Run one scenario from the warm-up checkpoint; returns the results of the engine, or summarize(results) if summarize is given
+def run_branch(engine, arguments, summarize):
+    results = engine(**arguments)
+    return results if summarize is None else summarize(*results)
+
+# The engine, the arguments of each scenario and summarize in a worker process
+branch = {}
+
+def init_branch(engine, branch_arguments, summarize):
+    branch["engine"] = engine
+    branch["scenario arguments"] = branch_arguments
+    branch["summarize"] = summarize
+
+def run_branch_in_worker(scenario):
+    return run_branch(branch["engine"], branch["scenario arguments"][scenario], branch["summarize"])
+
+# Simulate the warm-up (the first warmup_steps minutes) once and continue each scenario from it for the remaining minutes;
+# returns the results of each scenario (or what summarize makes of them)
+def simulate_scenarios(engine, nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, warmup_steps, scenarios, num_workers=None, snapshot_path="warmup_snapshot.npz", summarize=None, **kwargs):
+    warmup_steps = int(warmup_steps)
+    if num_workers is not None and num_workers > 1 and len(scenarios) > 1 and summarize is None:
+        raise ValueError("Running the scenarios with more than one worker needs summarize")
+    arguments = dict(nodes=nodes, edges=edges, cars=cars, alpha=alpha, beta=beta, sigma=sigma, distance_matrix=distance_matrix, heuristic_constant=heuristic_constant, results_filename=None, **kwargs)
+    if engine is simulate_A_star:
+        arguments["animate"] = False
+
+    # The warm-up, saved at its last minute
+    print(f"Simulating the warm-up of {warmup_steps} minutes")
+    engine(num_minutes=warmup_steps, checkpoint_every=warmup_steps, checkpoint_path=snapshot_path, **arguments)
+
+    # The scenarios, continued from the end of the warm-up
+    arguments.update(num_minutes=num_minutes, resume_from=snapshot_path)
+    branch_arguments = [scenario_arguments(arguments, scenario) for scenario in scenarios]
+    if num_workers is None or num_workers <= 1 or len(scenarios) <= 1:
+        return [run_branch(engine, arguments_of_branch, summarize) for arguments_of_branch in branch_arguments]
+
+    with create_process_pool(min(num_workers, len(scenarios)), initializer=init_branch, initargs=(engine, branch_arguments, summarize)) as pool:
+        return pool.map(run_branch_in_worker, range(len(scenarios)), chunksize=1)
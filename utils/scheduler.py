@@ -0,0 +1,18 @@
+import heapq
+
+# Event calendar of the simulation: a car is only handled in the minutes it needs attention (entering its first edge, finishing an edge,
+# waiting for the next edge to become free or arriving at its destination) instead of every minute.
+# The events are (minute, car id) pairs kept in a binary heap, so cars that need attention in the same minute come out in order of their id.
+
+# Create an empty scheduler
+def create_scheduler():
+    return []
+
+# Make sure a car is handled again in the given minute
+def schedule_car(scheduler, minute, car):
+    heapq.heappush(scheduler, (minute, car))
+
+# Give the cars that need attention in the given minute, including cars that are scheduled for this minute while iterating
+def cars_due(scheduler, minute):
+    while scheduler and scheduler[0][0] <= minute:
+        yield heapq.heappop(scheduler)[1]
@@ -2,11 +2,14 @@ from tqdm import tqdm
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from utils.functional import choose_next_edge, travel_time_bpr, reset_car_states
+from utils.functional import choose_next_edge, travel_time_bpr
 from utils.visualization import initialize_plot, update_plot
+from utils.rng import create_rng
+from utils.sweep import run_scenario, run_sweep, draw_seed
 
 # Simulation and visualization combined
-def simulate_and_visualize(cars, edges, node_positions, num_minutes, warmup_steps=120, most_congested_edge=None, track_most_congested=True, capacity_multiplier=1.0, animate=False, alpha=0.15, beta=4, sigma=2, bg_image=None, lat_min=None, lat_max=None, lon_min=None, lon_max=None, starting_city="City 1", ending_city="City 2"):
+# The random route choices and travel time noise come from np.random, or from the streams of rng when given (see utils/rng.py)
+def simulate_and_visualize(cars, edges, node_positions, num_minutes, warmup_steps=120, most_congested_edge=None, track_most_congested=True, capacity_multiplier=1.0, animate=False, alpha=0.15, beta=4, sigma=2, bg_image=None, lat_min=None, lat_max=None, lon_min=None, lon_max=None, starting_city="City 1", ending_city="City 2", rng=None):
     fig, ax, edge_texts, timestep_text, edge_lines = initialize_plot(edges, node_positions, bg_image, lat_min, lat_max, lon_min, lon_max)
 
     # Initialize vehicle counts on each edge
@@ -54,7 +57,7 @@ def simulate_and_visualize(cars, edges, node_positions, num_minutes, warmup_step
 
             # Choose the next edge if the car is at a node
             if car["location"] in [node for node in all_nodes if node not in [ending_city]]:
-                next_edge = choose_next_edge(car["location"], vehicle_counts, edges, cars, all_nodes, starting_city, ending_city)
+                next_edge = choose_next_edge(car["location"], vehicle_counts, edges, cars, all_nodes, starting_city, ending_city, rng)
 
                 if not next_edge:
                     continue
@@ -63,7 +66,7 @@ def simulate_and_visualize(cars, edges, node_positions, num_minutes, warmup_step
                 tt_0 = edges[next_edge]["tt_0"]
                 N_e = vehicle_counts[next_edge][0]
                 C_e = edges[next_edge]["current_capacity"]
-                travel_time = travel_time_bpr(tt_0, N_e, C_e, alpha, beta, sigma)
+                travel_time = travel_time_bpr(tt_0, N_e, C_e, alpha, beta, sigma, rng)
 
                 # Update the car's left- and arrived_at_node and assign a new route
                 car["left_at_node"] = t - car["start_time"]
@@ -104,27 +107,41 @@ def simulate_and_visualize(cars, edges, node_positions, num_minutes, warmup_step
     return car_reach_times, avg_congestion
 
 # Run the function multiple times with different capacity values
-def simulate_and_compare(cars, edges, node_positions, num_minutes, warmup_steps, deltas, alpha=0.15, beta=4, sigma=2, bg_image=None, lat_min=None, lat_max=None, lon_min=None, lon_max=None, starting_city="City 1", ending_city="City 2"):
+# Each run works on its own copy of the cars and edges. With num_workers, the runs of the capacity multipliers are done side by side in worker processes (see utils/sweep.py)
+# and are not animated. With a seed, every run gets an rng made with that seed, so all runs use common random numbers.
+# With num_workers and without a seed, a seed is drawn (and printed) for the runs, as runs in worker processes cannot continue the random numbers of np.random.
+def simulate_and_compare(cars, edges, node_positions, num_minutes, warmup_steps, deltas, alpha=0.15, beta=4, sigma=2, bg_image=None, lat_min=None, lat_max=None, lon_min=None, lon_max=None, starting_city="City 1", ending_city="City 2", num_workers=None, seed=None):
     # Ask the user if it wants the traffic simulation to be animated
-    animate = input("Do you want to animate the traffic simulation in real-time? You will have to close the plots for the code to continue if a full simulation is done. (y/n): ").lower() == "y"
+    animate = False
+    if num_workers is None or num_workers <= 1:
+        animate = input("Do you want to animate the traffic simulation in real-time? You will have to close the plots for the code to continue if a full simulation is done. (y/n): ").lower() == "y"
+    elif seed is None:
+        # The runs in worker processes share one base seed for common random numbers; it is printed so that the comparison can be run again with it
+        seed = draw_seed()
+        print(f"Seed of the runs: {seed}")
+
+    # The arguments of a run with its own rng
+    def scenario(**kwargs):
+        if seed is not None:
+            kwargs["rng"] = create_rng(seed)
+        return kwargs
 
     # Initial run to find the most congested edge
     print(f"Running simulation with capacity multiplier: 1.0")
 
-    car_reach_times, avg_congestion = simulate_and_visualize(cars.copy(), edges.copy(), node_positions, num_minutes, warmup_steps=warmup_steps, animate=animate, bg_image=bg_image, lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max, starting_city=starting_city, ending_city=ending_city)
+    car_reach_times, avg_congestion = run_scenario((simulate_and_visualize, cars, edges, (node_positions, num_minutes), scenario(warmup_steps=warmup_steps, animate=animate, bg_image=bg_image, lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max, starting_city=starting_city, ending_city=ending_city), seed))
     most_congested_edge = max(avg_congestion, key=avg_congestion.get)
     print(f"Most congested edge: {most_congested_edge}")
 
     all_car_reach_times = [(1.0, car_reach_times)]
 
     # Run the simulation multiple times with different capacity multipliers
-    for delta in deltas:
-        # Reset vehicle counts and car states before running the simulation
-        reset_car_states(cars)
+    print(f"Running simulations with capacity multipliers: {', '.join(str(delta) for delta in deltas)}")
+    scenarios = [scenario(most_congested_edge=most_congested_edge, capacity_multiplier=delta, warmup_steps=warmup_steps, animate=animate, alpha=alpha, beta=beta, sigma=sigma, starting_city=starting_city, ending_city=ending_city) for delta in deltas]
+    results, _ = run_sweep(simulate_and_visualize, cars, edges, (node_positions, num_minutes), scenarios, num_workers, seed)
 
-        print(f"Running simulation with capacity multiplier: {delta}")
-        car_reach_times, avg_congestion = simulate_and_visualize(cars.copy(), edges.copy(), node_positions, num_minutes, most_congested_edge=most_congested_edge, capacity_multiplier=delta, warmup_steps=warmup_steps, animate=animate, alpha=alpha, beta=beta, sigma=sigma, starting_city=starting_city, ending_city=ending_city)
-        print(f"Most congested edge: {max(avg_congestion, key=avg_congestion.get)}")
+    for delta, (car_reach_times, avg_congestion) in zip(deltas, results):
+        print(f"Most congested edge with capacity multiplier {delta}: {max(avg_congestion, key=avg_congestion.get)}")
         all_car_reach_times.append((delta, car_reach_times))
         print(f"Simulation with capacity multiplier {delta} completed.")
 
@@ -4,259 +4,514 @@ from tqdm import tqdm
 # import tqdm
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import copy
+import math
+import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from utils.functional import travel_time_bpr
+from utils.functional import travel_time_bpr_vectorized, bpr_noise
 from utils.visualization_extended import initialize_plot, update_plot
-from utils.functional_extended import determine_optimal_route, find_next_node, convert_nodes, save_simulation_results
-from utils.modified_A_star import run_A_mod, update_future_edges
+from utils.functional_extended import a_star_edge_costs, find_optimal_route, shortest_path_tree, route_from_tree, convert_nodes, save_simulation_results
+from utils.modified_A_star import find_optimal_trajectory, retime_trajectory, trajectory_moved, book_trajectory
+from utils.car_store import create_car_store, create_spawn_index, cars_spawning, set_route, CarsView
+from utils.graph import compile_graph, compile_distance_matrix, route_from_node_ids
+from utils.reservations import create_reservation_table, reserve_trajectory, reserved_travel_times, advance_reservations, export_reservations
+from utils.future_noise import create_future_noise, discard_noise
+from utils.horizon import check_horizon_length, create_horizon, advance_horizon, attach_horizon
+from utils.parallel_routing import create_routing_pool, route_in_pool, plan_in_pool, close_routing_pool
+from utils.edge_store import copy_edges, copy_edge_properties, edge_store_of, attach_edge_store
+from utils.scheduler import create_scheduler, schedule_car, cars_due
+from utils.landmarks import landmark_heuristic
+from utils.route_cache import network_state, lookup_route, store_route, hit_rate
+from utils.output_thread import create_output_thread, close_output_thread
+from utils.results_writer import create_results_writer, write_car, write_unfinished, close_results_writer
+from utils.trajectory_archive import create_trajectory_archive, open_trajectory_archive, rewind_trajectory_archive, append_trajectory, flush_trajectory_archive, close_trajectory_archive
+from utils.checkpoint import simulation_state, restore_simulation_state, future_state, restore_future_state, save_checkpoint, load_checkpoint
 
 # Each iteration of the simulation the following things are done:
-# 1. The number of cars on each edge is determined and the travel time of each edge is updated
-# 2. Cars that have reached their destination are removed and have their arrival time added
-# 3. New cars are spawned at their origin and their optimal path is calculated
-# 4. All cars in the system try to move according to their predetermined path:
+# 1. Cars that have reached their destination are removed and have their arrival time added
+# 2. New cars are spawned at their origin and their optimal path is calculated
+# 3. The cars that need attention this minute try to move according to their predetermined path:
 #    A car is either travelling on an edge, or waiting at the end of the edge (or waiting at its origin) until the next edge on its path becomes free
 #   - If a car is on its origin, check if the first edge on its path is free. If so, enter the edge. If not, wait on the origin.
-#   - If a car had not finished its edge (if it was still travelling), check if it has finished its edge now. 
-#   - If a car has finished its edge (if it is waiting at the end), check if the next edge in its path is free. If so, enter the edge. If not, continue waiting on the edge.
+#   - If a car has finished its edge (the minute it finishes is determined by the travel time of the edge when it entered), check if the next edge in its path is free. If so, enter the edge. If not, continue waiting on the edge.
+# 4. The number of cars on each edge is stored and the travel time of each edge is updated
+#
+# Cars are only handled in the minutes they need attention (see utils/scheduler.py): a car travelling on an edge is not touched until the minute it finishes the edge.
+# The number of cars on each edge is kept up to date while cars enter and leave edges, and a car can enter an edge if this number is below the capacity of the edge.
+# This number includes all cars on the edge, so an edge never has more cars than its capacity. (The original simulation counted the cars on an edge while it moved
+# the cars one by one, so a car only saw the cars that had been moved before it in that minute, and an edge could get more cars than its capacity.)
 #
 # The simulation returns the travel time of each car. Cars that did not reach their destination and cars spawned during the warmup steps are ignored.
+# The cars are kept in a car store (see utils/car_store.py); the returned cars are a view that exports each car as a dictionary.
+#
+# Options (the details are in the modules they refer to):
+# - routing: "A*", or "shortest path tree" to route the cars of each destination from one backwards search (see shortest_path_tree in utils/functional_extended.py)
+# - landmarks: the landmark heuristic instead of heuristic_constant * distance_matrix (see utils/landmarks.py, made with compute_landmarks)
+# - route_cache: reuse the routes of simulate_A_star while the A* edge costs have not changed (see utils/route_cache.py, made with create_route_cache)
+# - rng: the streams of the noise, "bpr noise" for the simulation and "future edge noise" for the predictions, instead of np.random (see utils/rng.py)
+# - future_backend: the predictions of simulate_A_mod on a copy of the edges ("edge store") or in a reservation table (see utils/reservations.py)
+# - future_horizon: keep only the predictions of the coming future_horizon minutes (see utils/horizon.py)
+# - future_noise: the noise of the predictions drawn again for every booking (default) or fixed for each (edge, minute) (see utils/future_noise.py);
+#   with fixed noise and speculation_tolerance=0, speculative planning gives the same results as planning the cars one by one
+# - num_workers, speculation_batch, speculation_tolerance: route or plan with a pool of worker processes (see utils/parallel_routing.py)
+# - animate: whether simulate_A_star animates the simulation; it asks when animate is None
+# - results_path, results_format: stream a record of each car to results_path during the run (see utils/results_writer.py); results_filename saves the CSV file at the end
+# - background_output: write the results and checkpoints from a background thread (see utils/output_thread.py)
+# - checkpoint_every, checkpoint_path, resume_from: save checkpoints and continue from one (see utils/checkpoint.py)
+# - trajectory_archive: write the trajectories of simulate_A_mod to a memory-mapped archive (see utils/trajectory_archive.py)
+
+# The heuristic of A* for each destination: heuristic_constant * distances, or the landmark heuristic when landmarks are given (see utils/landmarks.py)
+# Returns heuristic_to(destination), which gives the heuristic of each node (by node id) and computes it once per destination
+def heuristic_function(distances, heuristic_constant, landmarks=None):
+    heuristics = {}
+    def heuristic_to(destination):
+        if destination not in heuristics:
+            if landmarks is not None:
+                heuristics[destination] = landmark_heuristic(landmarks, destination)
+            else:
+                heuristics[destination] = (heuristic_constant * distances[:, destination]).tolist()
+        return heuristics[destination]
+    return heuristic_to
+
+# Start the output thread (with background_output, if there are results or checkpoints to write) and the streaming results writer (unless results_path is None);
+# returns both, None for the ones not started. When continuing from a checkpoint, the cars that arrived before it are written first.
+def open_results(graph, car_store, results_path, results_format, background_output, checkpoint_every):
+    output = None
+    if background_output and (results_path is not None or checkpoint_every is not None):
+        output = create_output_thread()
+    results_writer = None
+    try:
+        if results_path is not None:
+            results_writer = create_results_writer(results_path, graph, format=results_format, output=output)
+            for car in np.nonzero(car_store["time arrived"] >= 0)[0].tolist():
+                write_car(results_writer, car_store, car)
+    except BaseException:
+        if results_writer is not None:
+            close_results_writer(results_writer)
+        if output is not None:
+            close_output_thread(output)
+        raise
+    return output, results_writer
+
+# Write the results that are still in memory and wait for the output thread to write everything to disk
+def close_results(output, results_writer):
+    if results_writer is not None:
+        close_results_writer(results_writer)
+    if output is not None:
+        close_output_thread(output)
+
+# Handle a car that needs attention in this minute: it is on its origin, has just finished its edge, is waiting at the end of its edge or arrives at its destination
+# Returns True if the car has arrived
+def handle_car(car_store, car, time, scheduler, occupancy, travel_time, capacity):
+    location = car_store["location"][car]
+    cursor = car_store["cursor"][car]
+    route = car_store["route"][car]
+
+    if location < 0 and cursor == len(route):
+        # The origin of the car is its destination (an empty route): the car stays at its origin, like in the original simulation
+        return False
+
+    if location >= 0 and car_store["finished edge"][car] and cursor == len(route):
+        # The car has finished the edge to its destination in the previous minute, so it has arrived
+        car_store["time arrived"][car] = time
+        car_store["active"][car] = False
+        car_store["location"][car] = -1
+        return True
+
+    if location >= 0 and not car_store["finished edge"][car]:
+        # The car has finished its edge
+        car_store["finished edge"][car] = True
+
+        # If this was the edge to its destination, the car leaves the edge and arrives the next minute
+        if cursor == len(route):
+            occupancy[location] -= 1
+            schedule_car(scheduler, time + 1, car)
+            return False
+
+    # The car is on its origin or at the end of its edge: check if the next edge on its path is free. If so, enter the edge. If not, try again next minute
+    next_edge = route[cursor]
+    if occupancy[next_edge] < capacity[next_edge]:
+        if location >= 0:
+            occupancy[location] -= 1
+        occupancy[next_edge] += 1
+
+        car_store["location"][car] = next_edge
+        car_store["time entered last edge"][car] = time
+        car_store["finished edge"][car] = False
+        car_store["cursor"][car] = cursor + 1
+
+        # The car finishes the edge in the first minute in which the travel time of the edge (when it entered) has passed
+        travel_time_on_edge = travel_time[next_edge, time]
+        if not math.isinf(travel_time_on_edge):
+            schedule_car(scheduler, time + math.ceil(travel_time_on_edge), car)
+    else:
+        schedule_car(scheduler, time + 1, car)
+    return False
 
-def simulate_A_star(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, bg_image=None, lat_min=None, lat_max=None, lon_min=None, lon_max=None):
-    # Cars and edges after the simulation; a copy is made so that the original cars and edges are not changed and can be used for the normal A* simulation
-    new_cars = copy.deepcopy(cars) 
-    new_edges = copy.deepcopy(edges)
+def simulate_A_star(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, bg_image=None, lat_min=None, lat_max=None, lon_min=None, lon_max=None, spawn_index=None, route_cache=None, routing="A*", landmarks=None, rng=None, num_workers=None, animate=None, results_filename=None, checkpoint_every=None, checkpoint_path="A_star_checkpoint.npz", resume_from=None, results_path=None, results_format=None, background_output=True):
+    # The road network with integer node and edge ids, and the distance matrix as an array indexed by node ids
+    graph = compile_graph(nodes, edges)
+    distances = compile_distance_matrix(graph, distance_matrix)
 
-    # Ask the user if it wants the traffic simulation to be animated
-    animate = input("Do you want to animate the traffic simulation in real-time? Code wil run slower. (y/n): ").lower() == "y"
+    # Cars and edges after the simulation; the car store and a copy of the edges are made so that the original cars and edges are not changed and can be used for the normal A* simulation
+    car_store = create_car_store(cars, graph)
+    new_edges = copy_edges(edges)
 
-    # Converting the nodes database from the format used in the simulation to the format used in the visualization
-    nodes_visualization = convert_nodes(nodes)
+    # The cars bucketed by the minute they spawn (normally made once in the model script)
+    if spawn_index is None:
+        spawn_index = create_spawn_index(cars, num_minutes)
 
-    if animate:
-        # Initializing the visualization
-        fig, ax, edge_texts, timestep_text, edge_lines = initialize_plot(edges, nodes_visualization, bg_image, lat_min, lat_max, lon_min, lon_max)
+    # The edge properties used when moving the cars, indexed by edge id; cars_on_edge[edge, time] and travel_time[edge, time] are the arrays of the edge store of the new edges
+    edge_store = edge_store_of(new_edges)
+    cars_on_edge = edge_store["cars on edge"]
+    travel_time = edge_store["travel time"]
+    capacity = graph["capacity"].tolist()
+    num_edges = len(capacity)
 
-    def update(time):
-        ## Removing all cars that have reached their destination
-        for car in new_cars:
-            if car["location"] != None:
-                if car["location"].split(" → ")[-1] == car["destination"] and car["finished edge"] == True: # If a car is on the edge to its destination and it has finished that edge ...
-                    car["time arrived"] = time
-                    car["active"] = False
-                    car["location"] = None
-        
-        ## Spawning new cars at their origin and calculating their optimal path
-        for car in new_cars:
-            if car["time spawned"] == time:
-                car["optimal path"], car["optimal travel time"] = determine_optimal_route(car, nodes, new_edges, time, heuristic_constant, distance_matrix)
-                
-                if car["optimal path"] is None:
-                    car["active"] = False  # No route available
-                else:
-                    car["active"] = True
-                    car["location"] = car["origin"]
-                    car["next edge"] = car["optimal path"][0] + " → " + car["optimal path"][1] if len(car["optimal path"]) > 1 else None
-        
-        ## Moving all active cars according to their predetermined optimal path
-        for car in new_cars:
-            # Checking if the car is in the system (active)
-            if car["active"]:
-
-                # If a car is on its origin, check if the first edge on its path is free. If so, enter the edge. If not, wait on the origin
-                if car["location"] == car["origin"] and car["next edge"] is not None:
-                    cars_on_next_edge = new_edges[car["next edge"]]["cars on edge"][time]
-                    capacity_of_next_edge = new_edges[car["next edge"]]["capacity"]
-
-                    if cars_on_next_edge < capacity_of_next_edge:
-                        car["location"] = car["next edge"]
-                        car["time entered last edge"] = time
-
-                        # If this first edge immediately leads to the cars destination, the 'next edge' property should be None
-                        if car["optimal path"][1] == car["destination"]:
-                            car["next edge"] = None
-                        else:
-                            car["next edge"] = car["optimal path"][1] + " → " + car["optimal path"][2]
+    if routing not in ("A*", "shortest path tree"):
+        raise ValueError(f"Unknown routing: {routing}")
 
-                        # Add one to the number of cars on the edge where this car is located
-                        new_edges[car["location"]]["cars on edge"][time] += 1
-                    else:
-                        continue
-                
-                # If a car had not finished its edge (if it was still travelling), check if it has finished its edge now
-                if not car["finished edge"]:
-                    if time - car["time entered last edge"] >= new_edges[car["location"]]["travel time"][time]:
-                        car["finished edge"] = True
-                    else:
-                        # Add one to the number of cars on the edge where this car is located
-                        new_edges[car["location"]]["cars on edge"][time] += 1
-                
-                # If a car has finished its edge (if it is waiting at the end), check if the next edge in its path is free. If so, enter the edge. If not, continue waiting on the edge
-                if car["finished edge"] == True and car["next edge"] is not None:
-                    cars_on_next_edge = new_edges[car["next edge"]]["cars on edge"][time]
-                    capacity_of_next_edge = new_edges[car["next edge"]]["capacity"]
-                    
-                    # Check if the next edge is free
-                    if cars_on_next_edge < capacity_of_next_edge:
-                        car["location"] = car["next edge"]
-                        car["time entered last edge"] = time
-                        car["finished edge"] = False
-
-                        # Some code to determine the next edge from the optimal path
-                        node_just_passed = car["location"].split(" → ")[0]
-                        next_node = car["optimal path"][car["optimal path"].index(node_just_passed) + 1]
-                        if next_node == car["destination"]:
-                            car["next edge"] = None
-                        else:
-                            car["next edge"] = next_node + " → " + car["optimal path"][car["optimal path"].index(node_just_passed) + 2]
+    # The heuristic of A* for each destination
+    heuristic_to = heuristic_function(distances, heuristic_constant, landmarks)
+
+    # The cars that need attention in the coming minutes and the number of cars currently on each edge
+    scheduler = create_scheduler()
+    occupancy = [0] * num_edges
 
-                        # Add one to the number of cars on the edge where this car is located
-                        new_edges[car["location"]]["cars on edge"][time] += 1
+    # The worker processes, the output thread and the results writer are made inside the try below, so they are closed when the setup fails or is interrupted
+    routing_pool = None
+    output = None
+    results_writer = None
+    first_minute = 0
+
+    def update(time):
+        ## Spawning new cars at their origin and calculating their optimal path
+        spawning_cars = cars_spawning(spawn_index, time)
+        if len(spawning_cars) > 0:
+            # The cost of each edge used by A* in this minute
+            edge_costs = a_star_edge_costs(graph, cars_on_edge[:, time], travel_time[:, time])
+            if route_cache is not None:
+                state = network_state(route_cache, edge_costs)
+
+            # With a routing pool, the (origin, destination) pairs that are not in the route cache are routed by the worker processes first
+            if routing_pool is not None:
+                od_pairs = dict.fromkeys(zip(car_store["origin"][spawning_cars].tolist(), car_store["destination"][spawning_cars].tolist()))
+                if route_cache is not None:
+                    od_pairs = [od_pair for od_pair in od_pairs if od_pair + (state,) not in route_cache["entries"]]
+                pooled_routes = route_in_pool(routing_pool, edge_costs, od_pairs)
+            edge_costs = edge_costs.tolist()
+
+        # The edge costs are the same for all cars spawning in this minute, so cars with the same origin and destination get the same route:
+        # the route is calculated once for each (origin, destination) pair and shared by all cars of the pair
+        routes = {}
+        trees = {} # shortest path tree towards each destination in this minute (when routing with shortest path trees)
+        for car in spawning_cars:
+            origin, destination = int(car_store["origin"][car]), int(car_store["destination"][car])
+            if (origin, destination) not in routes:
+                # Use the route from the route cache if the network looked the same when it was calculated
+                cached = None if route_cache is None else lookup_route(route_cache, origin, destination, state)
+                if cached is None:
+                    if routing_pool is not None and (origin, destination) in pooled_routes:
+                        optimal_path, optimal_travel_time = pooled_routes[(origin, destination)]
+                    elif routing == "shortest path tree":
+                        if destination not in trees:
+                            trees[destination] = shortest_path_tree(graph, destination, edge_costs)[1]
+                        optimal_path, optimal_travel_time = route_from_tree(graph, trees[destination], origin, destination, edge_costs)
                     else:
-                        # Add one to the number of cars on the edge where this car is located
-                        new_edges[car["location"]]["cars on edge"][time] += 1
-                
+                        optimal_path, optimal_travel_time = find_optimal_route(graph, origin, destination, edge_costs, heuristic_to(destination))
+                    route = None if optimal_path is None else route_from_node_ids(graph, optimal_path)
+                    if route_cache is not None:
+                        store_route(route_cache, origin, destination, state, route, optimal_travel_time)
+                    cached = (route, optimal_travel_time)
+                routes[(origin, destination)] = cached
+            route, optimal_travel_time = routes[(origin, destination)]
+            
+            if route is None:
+                car_store["active"][car] = False  # No route available
             else:
-                continue
+                set_route(car_store, car, route, optimal_travel_time=optimal_travel_time)
+                car_store["active"][car] = True
+                schedule_car(scheduler, time, int(car))
+        
+        ## Removing the cars that have reached their destination and moving the cars that need attention according to their predetermined optimal path
+        for car in cars_due(scheduler, time):
+            if handle_car(car_store, car, time, scheduler, occupancy, travel_time, capacity) and results_writer is not None:
+                write_car(results_writer, car_store, car)
+
+        ## Storing the number of cars on each edge
+        cars_on_edge[:, time] = occupancy
     
         ## Based on the number of cars on each edge, calculate the travel time of each edge
-        for edge, properties in new_edges.items():
-            properties["travel time"][time] = travel_time_bpr(properties["tt_0"], properties["cars on edge"][time], properties["capacity"], alpha, beta, sigma)
-
-        # Determining the vehicle_counts dictionary used in the visualization
-        vehicle_counts = {edge: [new_edges[edge]["cars on edge"][time]] for edge in edges}
+        travel_time[:, time] = travel_time_bpr_vectorized(graph["tt_0"], cars_on_edge[:, time], graph["capacity"], alpha, beta, bpr_noise(graph["capacity"], sigma, rng=rng))
 
         if animate:
+            # Determining the vehicle_counts dictionary used in the visualization
+            vehicle_counts = {edge: [cars_on_edge[graph["edge ids"][edge], time]] for edge in edges}
+
             # Update the visualization
             update_plot(time, edges, vehicle_counts, edge_texts, timestep_text, num_minutes, edge_lines)
 
-    if animate:
-        # Animate the plot over time
-        anim = FuncAnimation(fig, update, frames=range(num_minutes), repeat=False, interval=100)
+        ## Saving a checkpoint every checkpoint_every minutes
+        if checkpoint_every is not None and (time + 1) % checkpoint_every == 0:
+            save_checkpoint(checkpoint_path, simulation_state(time, car_store, edge_store, occupancy, scheduler, rng, route_cache), output)
 
-        try: 
-            # Save as GIF
-            anim.save("A_star_simulation.gif", writer="pillow", fps=20)
-            print("Animation saved as A_star_simulation.gif")
-        except Exception as e:
-            print("Error saving animation as gif:", e)
+    try:
+        # With more than one worker, the routes of each minute are calculated by a pool of worker processes (see utils/parallel_routing.py)
+        if num_workers is not None and num_workers > 1:
+            routing_pool = create_routing_pool(graph, [heuristic_to(destination) for destination in range(len(graph["node names"]))], num_workers, routing)
 
-        plt.show()
-        plt.close(fig)
-    else:
-        # Run the simulation without animation using tqdm for a progress bar
-        for t in tqdm(range(num_minutes), desc=f"Simulating A*"):
-            update(t)
+        # Continuing from a checkpoint, which has the state at the end of the minute it was saved
+        if resume_from is not None:
+            checkpoint_time, rng = restore_simulation_state(load_checkpoint(resume_from), car_store, edge_store, occupancy, scheduler, route_cache)
+            first_minute = checkpoint_time + 1
+
+        # The output thread that writes the results and checkpoints in the background and the streaming results writer
+        output, results_writer = open_results(graph, car_store, results_path, results_format, background_output, checkpoint_every)
+
+        # Ask the user if it wants the traffic simulation to be animated (unless animate is given)
+        if animate is None:
+            animate = input("Do you want to animate the traffic simulation in real-time? Code wil run slower. (y/n): ").lower() == "y"
+
+        if animate:
+            # Converting the nodes database from the format used in the simulation to the format used in the visualization, and initializing the visualization
+            fig, ax, edge_texts, timestep_text, edge_lines = initialize_plot(edges, convert_nodes(nodes), bg_image, lat_min, lat_max, lon_min, lon_max)
+
+            # Animate the plot over time
+            anim = FuncAnimation(fig, update, frames=range(first_minute, num_minutes), repeat=False, interval=100)
+
+            try: 
+                # Save as GIF
+                anim.save("A_star_simulation.gif", writer="pillow", fps=20)
+                print("Animation saved as A_star_simulation.gif")
+            except Exception as e:
+                print("Error saving animation as gif:", e)
+
+            plt.show()
+            plt.close(fig)
+        else:
+            # Run the simulation without animation using tqdm for a progress bar
+            for t in tqdm(range(first_minute, num_minutes), desc=f"Simulating A*"):
+                update(t)
+
+        # The cars that did not arrive are written at the end of the run
+        if results_writer is not None:
+            write_unfinished(results_writer, car_store)
+    finally:
+        # Stop the worker processes and write the results that are still in memory, also when the simulation is interrupted
+        if routing_pool is not None:
+            close_routing_pool(routing_pool)
+        close_results(output, results_writer)
+
+    if route_cache is not None:
+        print(f"Route cache: {route_cache['hits']} hits, {route_cache['misses']} misses (hit rate {hit_rate(route_cache):.2%})")
 
     # Call to save the simulation results after the loop ends
-    save_simulation_results(new_cars, nodes, new_edges, distance_matrix, heuristic_constant, filename="A_star_simulation_results.csv")
+    new_cars = CarsView(car_store)
+    if results_filename is not None:
+        save_simulation_results(new_cars, nodes, new_edges, distance_matrix, heuristic_constant, filename=results_filename, graph=graph)
 
     return new_cars, new_edges
 
 # Simulate the modified A* algorithm
-def simulate_A_mod(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant):
+def simulate_A_mod(nodes, edges, cars, alpha, beta, sigma, num_minutes, distance_matrix, heuristic_constant, spawn_index=None, landmarks=None, rng=None, future_backend="edge store", future_horizon=None, num_workers=None, speculation_batch=256, speculation_tolerance=0.5, future_noise="per booking", results_filename=None, checkpoint_every=None, checkpoint_path="A_star_mod_checkpoint.npz", resume_from=None, results_path=None, results_format=None, background_output=True, trajectory_archive=None):
+    # The road network with integer node and edge ids, and the distance matrix as an array indexed by node ids
+    graph = compile_graph(nodes, edges)
+    distances = compile_distance_matrix(graph, distance_matrix)
+
     # Cars and edges after the simulation
-    new_cars = copy.deepcopy(cars) 
-    new_edges = copy.deepcopy(edges)
+    car_store = create_car_store(cars, graph)
+    new_edges = copy_edges(edges)
+
+    # The cars bucketed by the minute they spawn (normally made once in the model script)
+    if spawn_index is None:
+        spawn_index = create_spawn_index(cars, num_minutes)
+
+    # The edge properties used when moving the cars, indexed by edge id; cars_on_edge[edge, time] and travel_time[edge, time] are the arrays of the edge store of the new edges
+    edge_store = edge_store_of(new_edges)
+    cars_on_edge = edge_store["cars on edge"]
+    travel_time = edge_store["travel time"]
+    capacity = graph["capacity"].tolist()
+    num_edges = len(capacity)
+
+    # The heuristic of A* for each destination
+    heuristic_to = heuristic_function(distances, heuristic_constant, landmarks)
+
+    # The cars that need attention in the coming minutes and the number of cars currently on each edge
+    scheduler = create_scheduler()
+    occupancy = [0] * num_edges
 
     # An extra copy of edges that the modified A* algorithm will use to predict travel times in the future
-    future_edges = copy.deepcopy(edges)
-
-    # Iteration of the simulation
-    for time in tqdm(range(num_minutes), desc=f"Simulating A* Mod"):
-        ## Removing all cars that have reached their destination
-        for car in new_cars:
-            if car["location"] != None:
-                if car["location"].split(" → ")[-1] == car["destination"] and car["finished edge"] == True: # If a car is on the edge to its destination and it has finished that edge ...
-                    car["time arrived"] = time
-                    car["active"] = False
-                    car["location"] = None
-        
-        ## Spawning new cars at their origin and calculating their optimal path
-        for car in new_cars:
-            if car["time spawned"] == time:
-                car["trajectory"] = run_A_mod(nodes, future_edges, car, heuristic_constant, distance_matrix, num_minutes)
-
-                # Updating the future edge occupation and travel times
-                update_future_edges(future_edges, car["trajectory"], alpha, beta, sigma)
-                
-                if car["trajectory"] is None:
-                    car["active"] = False  # No route available
+    # With a future horizon, the future edges only keep the minutes from the current minute up to future_horizon minutes ahead (see utils/horizon.py)
+    if future_horizon is None:
+        future_edges = copy_edges(edges)
+        future_horizon = len(future_edges[graph["edge names"][0]]["travel time"])
+        horizon = None
+    else:
+        check_horizon_length(graph, car_store["origin"], car_store["destination"], future_horizon)
+        future_edges = copy_edge_properties(edges)
+        horizon = create_horizon(graph["tt_0"], future_horizon)
+        attach_horizon(future_edges, horizon)
+
+    if future_backend == "reservation table":
+        reservations = create_reservation_table(graph, future_horizon, alpha, beta, sigma, rng)
+        future_travel_time = reserved_travel_times(reservations)
+    elif future_backend == "edge store":
+        future_cars_on_edge = [future_edges[edge]["cars on edge"] for edge in graph["edge names"]]
+        future_travel_time = [future_edges[edge]["travel time"] for edge in graph["edge names"]]
+    else:
+        raise ValueError(f"Unknown future backend: {future_backend}")
+
+    # The noise of the predicted travel times is drawn again for every booking (future_noise="per booking", the model's default) or fixed for each (edge, minute)
+    # (future_noise="fixed", see utils/future_noise.py), with or without worker processes. The reservation table always has fixed noise.
+    if future_noise not in ("per booking", "fixed"):
+        raise ValueError(f"Unknown future noise: {future_noise}")
+    prediction_noise = create_future_noise(sigma, rng) if future_noise == "fixed" and future_backend == "edge store" else None
+
+    # The arrays behind the predictions of the future edges (with a future horizon, the arrays are those of the horizon)
+    future_edge_store = edge_store_of(future_edges) if future_backend == "edge store" and horizon is None else None
+
+    # Continuing from a checkpoint, which has the state at the end of the minute it was saved
+    first_minute = 0
+    if resume_from is not None:
+        checkpoint = load_checkpoint(resume_from)
+        checkpoint_time, rng = restore_simulation_state(checkpoint, car_store, edge_store, occupancy, scheduler)
+        restore_future_state(checkpoint, future_edge_store, horizon, reservations if future_backend == "reservation table" else None, prediction_noise)
+        if future_backend == "reservation table":
+            reservations["rng"] = rng
+        if prediction_noise is not None:
+            prediction_noise["rng"] = rng
+        first_minute = checkpoint_time + 1
+
+    # The workers read the predicted travel times from one shared array, which only the edge store without a future horizon has
+    if num_workers is not None and num_workers > 1 and future_edge_store is None:
+        raise ValueError("Speculative planning needs future_backend=\"edge store\" without a future horizon")
+
+    # The output thread, the results writer, the trajectory archive and the worker processes are made inside the try below, so they are closed when the setup fails or is interrupted
+    output = None
+    results_writer = None
+    archive = None
+    routing_pool = None
+    num_planned = 0
+    num_replanned = 0
+
+    try:
+        # The output thread that writes the results and checkpoints in the background and the streaming results writer
+        output, results_writer = open_results(graph, car_store, results_path, results_format, background_output, checkpoint_every)
+
+        # The archive of the planned trajectories; when continuing from a checkpoint, the trajectories planned after it are added again
+        if trajectory_archive is not None:
+            if resume_from is not None:
+                if "archive/used" not in checkpoint:
+                    raise ValueError(f"The checkpoint {resume_from} was saved without a trajectory archive, so it cannot be continued with one")
+                archive = open_trajectory_archive(trajectory_archive, mode="r+")
+                rewind_trajectory_archive(archive, int(checkpoint["archive/used"]), car_store["time spawned"] > checkpoint_time)
+            else:
+                archive = create_trajectory_archive(trajectory_archive, len(car_store["id"]))
+
+        # The pool of worker processes that plan the trajectories speculatively; the future edges are moved to the shared copy of their travel times, which the workers read
+        if num_workers is not None and num_workers > 1:
+            routing_pool = create_routing_pool(graph, [heuristic_to(destination) for destination in range(len(graph["node names"]))], num_workers, future_travel_time=future_edge_store["travel time"])
+            future_edge_store["travel time"] = routing_pool["future travel time"]
+            attach_edge_store(future_edges, future_edge_store)
+            future_travel_time = list(future_edge_store["travel time"])
+
+        # Iteration of the simulation
+        for time in tqdm(range(first_minute, num_minutes), desc=f"Simulating A* Mod"):
+            ## Discarding the predictions for the minutes that have passed
+            if future_backend == "reservation table":
+                advance_reservations(reservations, time)
+            if horizon is not None:
+                advance_horizon(horizon, time)
+            if prediction_noise is not None:
+                discard_noise(prediction_noise, time)
+
+            ## Spawning new cars at their origin and calculating their optimal path
+            spawning = cars_spawning(spawn_index, time).tolist()
+            planned = {}
+            for i, car in enumerate(spawning):
+                origin, destination = int(car_store["origin"][car]), int(car_store["destination"][car])
+                if routing_pool is None:
+                    trajectory = find_optimal_trajectory(graph, origin, destination, time, future_travel_time, heuristic_to(destination))
                 else:
-                    car["active"] = True
-                    car["location"] = car["origin"]
-                    car["next edge"] = car["trajectory"][0][0] + " → " + car["trajectory"][1][0] if len(car["trajectory"]) > 1 else None
-
-        ## Moving all active cars according to their predetermined trajectory
-        for car in new_cars:
-            # Checking if the car is in the system (active)
-            if car["active"]:
-
-                # If a car is on its origin, check if the first edge on its trajectory is free. If so, enter the edge. If not, wait on the origin
-                if car["location"] == car["origin"] and car["next edge"] is not None:
-                    cars_on_next_edge = new_edges[car["next edge"]]["cars on edge"][time]
-                    capacity_of_next_edge = new_edges[car["next edge"]]["capacity"]
-
-                    if cars_on_next_edge < capacity_of_next_edge:
-                        car["location"] = car["next edge"]
-                        car["time entered last edge"] = time
-
-                        # If this first edge immediately leads to the cars destination, the 'next edge' property should be None
-                        if car["trajectory"][1][0] == car["destination"]:
-                            car["next edge"] = None
+                    # Planning the trajectories of the next batch of cars against the current predictions
+                    if car not in planned:
+                        batch = spawning[i:i + speculation_batch]
+                        planned = dict(zip(batch, plan_in_pool(routing_pool, [(int(car_store["origin"][other]), int(car_store["destination"][other]), time) for other in batch])))
+                    trajectory = planned[car]
+                    num_planned += 1
+
+                    # The trajectory is timed again with the predictions after the bookings of the cars before it, and the car is re-planned
+                    # if it now passes any node more than speculation_tolerance minutes earlier or later than planned
+                    if trajectory is not None:
+                        retimed = retime_trajectory(graph, future_travel_time, trajectory)
+                        if trajectory_moved(trajectory, retimed, speculation_tolerance):
+                            trajectory = find_optimal_trajectory(graph, origin, destination, time, future_travel_time, heuristic_to(destination))
+                            num_replanned += 1
                         else:
-                            car["next edge"] = car["trajectory"][1][0] + " → " + car["trajectory"][2][0]
+                            trajectory = retimed
 
-                        # Add one to the number of cars on the edge where this car is located
-                        new_edges[car["location"]]["cars on edge"][time] += 1
-                    else:
-                        continue
-                        
-                # If a car had not finished its edge (if it was still travelling), check if it has finished its edge now
-                if not car["finished edge"]:
-                    if time - car["time entered last edge"] >= new_edges[car["location"]]["travel time"][time]:
-                        car["finished edge"] = True
+                if trajectory is None:
+                    car_store["active"][car] = False  # No route available
+                else:
+                    # Updating the future edge occupation and travel times
+                    if future_backend == "reservation table":
+                        reserve_trajectory(reservations, graph, trajectory)
                     else:
-                        # Add one to the number of cars on the edge where this car is located
-                        new_edges[car["location"]]["cars on edge"][time] += 1
-                
-                # If a car has finished its edge (if it is waiting at the end), check if the next edge in its path is free. If so, enter the edge. If not, continue waiting on the edge
-                if car["finished edge"] == True and car["next edge"] is not None:
-                    cars_on_next_edge = new_edges[car["next edge"]]["cars on edge"][time]
-                    capacity_of_next_edge = new_edges[car["next edge"]]["capacity"]
-                    
-                    # Check if the next edge is free
-                    if cars_on_next_edge < capacity_of_next_edge:
-                        car["location"] = car["next edge"]
-                        car["time entered last edge"] = time
-                        car["finished edge"] = False
-
-                        # Some code to determine the next edge from the optimal path
-                        node_just_passed = car["location"].split(" → ")[0]
-                        next_node = find_next_node(car["trajectory"], node_just_passed)
-                        
-                        if next_node == car["destination"]:
-                            car["next edge"] = None
-                        else:
-                            car["next edge"] = next_node + " → " + find_next_node(car["trajectory"], next_node)
+                        book_trajectory(graph, future_cars_on_edge, future_travel_time, trajectory, alpha, beta, sigma, rng, prediction_noise)
 
-                        # Add one to the number of cars on the edge where this car is located
-                        new_edges[car["location"]]["cars on edge"][time] += 1
+                    trajectory_nodes = [node for node, _ in trajectory]
+                    if archive is None:
+                        set_route(car_store, car, route_from_node_ids(graph, trajectory_nodes), trajectory_times=np.array([time for _, time in trajectory]))
                     else:
-                        # Add one to the number of cars on the edge where this car is located
-                        new_edges[car["location"]]["cars on edge"][time] += 1
-                
-            else:
-                continue
-    
-        ## Based on the number of cars on each edge, calculate the travel time of each edge
-        for edge, properties in new_edges.items():
-            properties["travel time"][time] = travel_time_bpr(properties["tt_0"], properties["cars on edge"][time], properties["capacity"], alpha, beta, sigma)
+                        append_trajectory(archive, car, origin, destination, trajectory_nodes, [time for _, time in trajectory])
+                        set_route(car_store, car, route_from_node_ids(graph, trajectory_nodes))
+                    car_store["active"][car] = True
+                    schedule_car(scheduler, time, car)
+
+            ## Removing the cars that have reached their destination and moving the cars that need attention according to their predetermined trajectory
+            for car in cars_due(scheduler, time):
+                if handle_car(car_store, car, time, scheduler, occupancy, travel_time, capacity) and results_writer is not None:
+                    write_car(results_writer, car_store, car)
+
+            ## Storing the number of cars on each edge
+            cars_on_edge[:, time] = occupancy
+        
+            ## Based on the number of cars on each edge, calculate the travel time of each edge
+            travel_time[:, time] = travel_time_bpr_vectorized(graph["tt_0"], cars_on_edge[:, time], graph["capacity"], alpha, beta, bpr_noise(graph["capacity"], sigma, rng=rng))
+
+            ## Saving a checkpoint every checkpoint_every minutes
+            if checkpoint_every is not None and (time + 1) % checkpoint_every == 0:
+                state = simulation_state(time, car_store, edge_store, occupancy, scheduler, rng)
+                state.update(future_state(future_edge_store, horizon, reservations if future_backend == "reservation table" else None, prediction_noise))
+                if archive is not None:
+                    state["archive/used"] = np.array(archive["used"])
+                save_checkpoint(checkpoint_path, state, output)
+                if archive is not None:
+                    flush_trajectory_archive(archive)
+
+        # The cars that did not arrive are written at the end of the run
+        if results_writer is not None:
+            write_unfinished(results_writer, car_store)
+    finally:
+        if routing_pool is not None:
+            # The future edges get their own copy of the predicted travel times before the shared memory is freed
+            future_edge_store["travel time"] = routing_pool["future travel time"].copy()
+            attach_edge_store(future_edges, future_edge_store)
+            close_routing_pool(routing_pool)
+        close_results(output, results_writer)
+        if archive is not None:
+            close_trajectory_archive(archive)
+
+    if routing_pool is not None:
+        print(f"Speculative planning: {num_replanned} of {num_planned} cars re-planned")
+
+    # The future edges show the reserved cars and predicted travel times of the reservation table
+    if future_backend == "reservation table":
+        export_reservations(reservations, future_edges)
 
     # Call to save the simulation results after the loop ends
-    save_simulation_results(new_cars, nodes, new_edges, distance_matrix, heuristic_constant, filename="A_star_mod_simulation_results.csv")
+    new_cars = CarsView(car_store)
+    if results_filename is not None:
+        save_simulation_results(new_cars, nodes, new_edges, distance_matrix, heuristic_constant, filename=results_filename, graph=graph)
 
     return new_cars, new_edges, future_edges
-                
\ No newline at end of file
@@ -2,8 +2,9 @@ from tqdm import tqdm
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from utils.functional import choose_next_edge, travel_time_bpr, reset_car_states
+from utils.functional import choose_next_edge, travel_time_bpr
 from utils.visualization import initialize_plot, update_plot
+from utils.sweep import run_scenario, run_sweep, draw_seed
 
 # Simulation and visualization combined
 def simulate_and_visualize(cars, edges, node_positions, num_minutes, warmup_steps=120, most_congested_edge=None, track_most_congested=True, capacity_multiplier=1.0, animate=False, alpha=0.15, beta=4, sigma=2):
@@ -129,27 +130,35 @@ def simulate_and_visualize(cars, edges, node_positions, num_minutes, warmup_step
     return car_reach_times, avg_congestion
 
 # Run the function multiple times with different capacity values
-def simulate_and_compare(cars, edges, node_positions, num_minutes, warmup_steps, deltas, alpha=0.15, beta=4, sigma=2):
+# Each run works on its own copy of the cars and edges. With num_workers, the runs of the capacity multipliers are done side by side in worker processes (see utils/sweep.py)
+# and are not animated. With a seed, np.random is seeded with it at the start of every run, so all runs use common random numbers.
+# With num_workers and without a seed, a seed is drawn (and printed) for the runs, as runs in worker processes cannot continue the random numbers of np.random.
+def simulate_and_compare(cars, edges, node_positions, num_minutes, warmup_steps, deltas, alpha=0.15, beta=4, sigma=2, num_workers=None, seed=None):
     # Ask the user if it wants the traffic simulation to be animated
-    animate = input("Do you want to animate the traffic simulation in real-time? You will have to close the plots for the code to continue if a full simulation is done. (y/n): ").lower() == "y"
+    animate = False
+    if num_workers is None or num_workers <= 1:
+        animate = input("Do you want to animate the traffic simulation in real-time? You will have to close the plots for the code to continue if a full simulation is done. (y/n): ").lower() == "y"
+    elif seed is None:
+        # The runs in worker processes share one base seed for common random numbers; it is printed so that the comparison can be run again with it
+        seed = draw_seed()
+        print(f"Seed of the runs: {seed}")
 
     # Initial run to find the most congested edge
     print(f"Running simulation with capacity multiplier: 1.0")
 
-    car_reach_times, avg_congestion = simulate_and_visualize(cars.copy(), edges.copy(), node_positions, num_minutes, warmup_steps=warmup_steps, animate=animate)
+    car_reach_times, avg_congestion = run_scenario((simulate_and_visualize, cars, edges, (node_positions, num_minutes), dict(warmup_steps=warmup_steps, animate=animate), seed))
     most_congested_edge = max(avg_congestion, key=avg_congestion.get)
     print(f"Most congested edge: {most_congested_edge}")
 
     all_car_reach_times = [(1.0, car_reach_times)]
 
     # Run the simulation multiple times with different capacity multipliers
-    for delta in deltas:
-        # Reset vehicle counts and car states before running the simulation
-        reset_car_states(cars)
+    print(f"Running simulations with capacity multipliers: {', '.join(str(delta) for delta in deltas)}")
+    scenarios = [dict(most_congested_edge=most_congested_edge, capacity_multiplier=delta, warmup_steps=warmup_steps, animate=animate, alpha=alpha, beta=beta, sigma=sigma) for delta in deltas]
+    results, _ = run_sweep(simulate_and_visualize, cars, edges, (node_positions, num_minutes), scenarios, num_workers, seed)
 
-        print(f"Running simulation with capacity multiplier: {delta}")
-        car_reach_times, avg_congestion = simulate_and_visualize(cars.copy(), edges.copy(), node_positions, num_minutes, most_congested_edge=most_congested_edge, capacity_multiplier=delta, warmup_steps=warmup_steps, animate=animate, alpha=alpha, beta=beta, sigma=sigma)
-        print(f"Most congested edge: {max(avg_congestion, key=avg_congestion.get)}")
+    for delta, (car_reach_times, avg_congestion) in zip(deltas, results):
+        print(f"Most congested edge with capacity multiplier {delta}: {max(avg_congestion, key=avg_congestion.get)}")
         all_car_reach_times.append((delta, car_reach_times))
         print(f"Simulation with capacity multiplier {delta} completed.")
 
@@ -0,0 +1,35 @@
+import copy
+import numpy as np
+from utils.parallel_routing import create_process_pool
+
+# Running a simulation for several scenarios (e.g. the capacity multipliers of simulate_and_compare) side by side, each in its own worker process.
+# Every run gets its own deep copy of the cars and edges, so the changes a run makes (the car states, the current capacity of the most congested edge) do not leak into the other runs.
+# With a seed, np.random is seeded with it at the start of every run (and the scenarios can each be given an rng made with the same seed, see utils/rng.py),
+# so all runs use common random numbers and the differences between them come from the scenarios and not from the noise.
+# Without a seed, the runs one after another continue the random numbers of np.random. In worker processes one base seed is drawn for the sweep instead (see draw_seed)
+# and every run starts from it, so the runs in workers use common random numbers as well; run_sweep returns the seed the runs used, so the sweep can be run again with it.
+# The results come back in the order of the scenarios, whatever order the runs finish in.
+
+# Run one scenario (in a worker process): simulate(cars, edges, *args, **kwargs) on copies of the cars and edges
+def run_scenario(task):
+    simulate, cars, edges, args, kwargs, seed = task
+    if seed is not None:
+        np.random.seed(seed)
+    return simulate(copy.deepcopy(cars), copy.deepcopy(edges), *args, **kwargs)
+
+# A base seed drawn from the entropy of the operating system, small enough for np.random.seed
+def draw_seed():
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+# Run simulate(cars, edges, *args, **kwargs) for the kwargs of each scenario with num_workers processes (or one after another without num_workers)
+# Returns the result of each scenario and the seed the runs started from (None for runs one after another without a seed)
+def run_sweep(simulate, cars, edges, args, scenarios, num_workers=None, seed=None):
+    if num_workers is None or num_workers <= 1 or len(scenarios) <= 1:
+        return [run_scenario((simulate, cars, edges, args, kwargs, seed)) for kwargs in scenarios], seed
+
+    if seed is None:
+        seed = draw_seed()
+    tasks = [(simulate, cars, edges, args, kwargs, seed) for kwargs in scenarios]
+
+    with create_process_pool(min(num_workers, len(tasks))) as pool:
+        return pool.map(run_scenario, tasks, chunksize=1), seed
@@ -0,0 +1,111 @@
+import os
+import numpy as np
+
+# Archive of the trajectories planned by the modified A* algorithm, so they do not have to be kept in memory for the whole fleet.
+# The trajectories are stored one after another as (node id, time) records in a memory-mapped file (records.bin in the archive directory),
+# which grows (doubling its size) when it is full. The index (index.npz) has the position and length of the trajectory of each car
+# (by its row in the car store, which is the car id in the model scripts), the origin and destination of each car and
+# the cars of each (origin, destination) pair, so a trajectory or the trajectories of a pair can be read without loading the whole archive.
+# The index is written by flush_trajectory_archive (at each checkpoint, so a run continued from a checkpoint can append to the archive) and when the archive is closed.
+# simulate_A_mod with an archive does not keep the planned times in the car store, so the cars only keep their route (the results show the path of a car instead of its trajectory).
+# When it continues from a checkpoint, the archive goes back to the checkpoint (rewind_trajectory_archive) and the trajectories planned after it are added again.
+
+RECORD = np.dtype([("node", np.int32), ("time", np.float64)])
+
+# Open the records file of an archive with room for capacity records
+def map_records(archive, capacity, mode="r+"):
+    return np.memmap(os.path.join(archive["path"], "records.bin"), dtype=RECORD, mode=mode, shape=(capacity,))
+
+# Create an empty archive in the directory path for num_cars cars
+def create_trajectory_archive(path, num_cars, capacity=65536):
+    os.makedirs(path, exist_ok=True)
+    archive = {
+        "path": path,
+        "used": 0, # number of records in use
+        "start": np.full(num_cars, -1, dtype=np.int64), # position of the first record of each car, -1 if the car has no trajectory
+        "length": np.zeros(num_cars, dtype=np.int32),
+        "origin": np.full(num_cars, -1, dtype=np.int32),
+        "destination": np.full(num_cars, -1, dtype=np.int32),
+        "writable": True
+    }
+    archive["records"] = map_records(archive, capacity, mode="w+")
+    return archive
+
+# Open an existing archive; with mode "r+", trajectories can be added (e.g. when continuing from a checkpoint)
+def open_trajectory_archive(path, mode="r"):
+    with np.load(os.path.join(path, "index.npz")) as index:
+        archive = {key: index[key] for key in ("start", "length", "origin", "destination", "od pairs", "od offsets", "od cars")}
+        archive["used"] = int(index["used"])
+    archive["path"] = path
+    archive["writable"] = mode == "r+"
+    capacity = os.path.getsize(os.path.join(path, "records.bin")) // RECORD.itemsize
+    archive["records"] = map_records(archive, capacity, mode=mode)
+    return archive
+
+# Make the records file larger, so that it has room for at least capacity records
+def grow_records(archive, capacity):
+    capacity = max(capacity, 2 * len(archive["records"]))
+    archive["records"].flush()
+    del archive["records"]
+    os.truncate(os.path.join(archive["path"], "records.bin"), capacity * RECORD.itemsize)
+    archive["records"] = map_records(archive, capacity)
+
+# Add the trajectory of a car: the node ids it passes and the time it is planned to pass each of them
+def append_trajectory(archive, car, origin, destination, nodes, times):
+    used = archive["used"]
+    if used + len(nodes) > len(archive["records"]):
+        grow_records(archive, used + len(nodes))
+
+    records = archive["records"][used:used + len(nodes)]
+    records["node"] = nodes
+    records["time"] = times
+    archive["start"][car] = used
+    archive["length"][car] = len(nodes)
+    archive["origin"][car] = origin
+    archive["destination"][car] = destination
+    archive["used"] = used + len(nodes)
+
+# Go back to the first used records, forgetting the trajectories of the given cars (e.g. the cars that spawned after a checkpoint)
+def rewind_trajectory_archive(archive, used, cars):
+    archive["used"] = used
+    archive["start"][cars] = -1
+    archive["length"][cars] = 0
+    archive["origin"][cars] = -1
+    archive["destination"][cars] = -1
+
+# The trajectory of a car as an array of records (read from the file when it is used), or None if the car has no trajectory
+def trajectory_of(archive, car):
+    if archive["start"][car] < 0:
+        return None
+    return archive["records"][archive["start"][car]:archive["start"][car] + archive["length"][car]]
+
+# The cars with a trajectory from origin to destination
+def cars_between(archive, origin, destination):
+    positions = np.nonzero((archive["od pairs"][:, 0] == origin) & (archive["od pairs"][:, 1] == destination))[0]
+    if len(positions) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return archive["od cars"][archive["od offsets"][positions[0]]:archive["od offsets"][positions[0] + 1]]
+
+# The cars of each (origin, destination) pair: the pairs in sorted order, and the cars of pair i are od_cars[od_offsets[i]:od_offsets[i + 1]]
+def od_index(archive):
+    cars = np.nonzero(archive["start"] >= 0)[0]
+    cars = cars[np.lexsort((cars, archive["destination"][cars], archive["origin"][cars]))]
+    pairs = np.stack((archive["origin"][cars], archive["destination"][cars]), axis=1)
+    new_pair = np.ones(len(cars), dtype=bool)
+    new_pair[1:] = np.any(pairs[1:] != pairs[:-1], axis=1)
+    od_offsets = np.append(np.nonzero(new_pair)[0], len(cars))
+    return pairs[new_pair], od_offsets, cars
+
+# Write the records to disk and write the index
+def flush_trajectory_archive(archive):
+    archive["records"].flush()
+    archive["od pairs"], archive["od offsets"], archive["od cars"] = od_index(archive)
+    temporary_path = os.path.join(archive["path"], "index.tmp.npz")
+    np.savez(temporary_path, **{key: archive[key] for key in ("start", "length", "origin", "destination", "od pairs", "od offsets", "od cars")}, used=np.array(archive["used"]))
+    os.replace(temporary_path, os.path.join(archive["path"], "index.npz"))
+
+# Write everything to disk and close the records file
+def close_trajectory_archive(archive):
+    if archive["writable"]:
+        flush_trajectory_archive(archive)
+    del archive["records"]